@@ -0,0 +1,309 @@
+import datetime
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from storage import PARTITIONING, GameArchive
+
+# Default location of the aggregates, next to the game archive
+AGGREGATES_PATH = 'data/aggregates'
+
+# Version of the aggregate definitions, bumped whenever what is computed changes so stored
+# aggregates of an earlier version are detected as stale
+AGGREGATES_VERSION = 1
+
+# Group keys and summed columns of each aggregate table. Every stored column is either a key,
+# a sum or derived from the sums, so new games are added onto the stored rows
+TABLES = {
+    'records': (['season', 'team_id'], ['games', 'wins', 'losses', 'ties', 'points_for', 'points_against',
+                                        'home_games', 'home_wins', 'away_games', 'away_wins']),
+    'home': (['season'], ['games', 'home_wins']),
+    'scores': (['season', 'pts_win', 'pts_lose'], ['games']),
+}
+
+
+def season_aggregates(games):
+    """
+    Compute the aggregate tables of games. Returns a dict of frames:
+        'records' : per season and team, games, wins, losses, ties, win_pct, points_for,
+                    points_against, point_diff and the home and away games and wins. Ties have
+                    no home team in the game table, so they only count towards games and ties.
+        'home'    : per season, games, home_wins (ties count half) and home_win_rate.
+        'scores'  : per season and final score (pts_win, pts_lose), the number of games.
+
+    Parameters
+    ----------
+    games : pd.DataFrame
+        Games with a season column, i.e. the output of game_data.add_stats().
+    """
+    games = games[games['pts_win'].notna() & games['pts_lose'].notna()]
+    season = games['season'].to_numpy(dtype='int16')
+    pts_win = games['pts_win'].to_numpy(dtype='int32')
+    pts_lose = games['pts_lose'].to_numpy(dtype='int32')
+    home_win = games['home_win'].to_numpy(dtype='float32')
+    tie = pts_win == pts_lose
+    won = ~tie
+
+    # One row per team and game, winners first
+    zero = np.zeros(len(games), dtype=bool)
+    rows = pd.DataFrame({
+        'season': np.concatenate([season, season]),
+        'team_id': np.concatenate([games['winner_id'].astype(str).to_numpy(), games['loser_id'].astype(str).to_numpy()]),
+        'games': 1,
+        'wins': np.concatenate([won, zero]),
+        'losses': np.concatenate([zero, won]),
+        'ties': np.concatenate([tie, tie]),
+        'points_for': np.concatenate([pts_win, pts_lose]),
+        'points_against': np.concatenate([pts_lose, pts_win]),
+        'home_games': np.concatenate([won & (home_win == 1), won & (home_win == 0)]),
+        'home_wins': np.concatenate([won & (home_win == 1), zero]),
+        'away_games': np.concatenate([won & (home_win == 0), won & (home_win == 1)]),
+        'away_wins': np.concatenate([won & (home_win == 0), zero]),
+    })
+    season_games = pd.DataFrame({'season': season, 'games': 1, 'home_wins': home_win})
+    scores = pd.DataFrame({'season': season, 'pts_win': pts_win.astype('int16'), 'pts_lose': pts_lose.astype('int16'),
+                           'games': 1})
+
+    return {name: _sum(name, frame) for name, frame in
+            (('records', rows), ('home', season_games), ('scores', scores))}
+
+
+def _sum(name, frame):
+    """Sum the rows of a table by its keys and derive its other columns."""
+    keys, sums = TABLES[name]
+    df = frame.groupby(keys, sort=True)[sums].sum().reset_index()
+    df['season'] = df['season'].astype('int16')
+    for column in sums:
+        # Ties count half a home win in the season table
+        df[column] = df[column].astype('float32' if (name, column) == ('home', 'home_wins') else 'int32')
+
+    if name == 'records':
+        df['win_pct'] = ((df['wins'] + df['ties'] / 2) / df['games']).astype('float32')
+        df['point_diff'] = df['points_for'] - df['points_against']
+    elif name == 'home':
+        df['home_win_rate'] = (df['home_wins'] / df['games']).astype('float32')
+    return df
+
+
+class AggregateStore:
+    """
+    Season level aggregates of the game archive (records, points for and against, home win rate
+    and score frequencies), stored as parquet partitioned by season with a manifest.
+
+    Every aggregate is a sum by season, so update() adds the aggregates of only the new games
+    onto the stored rows of their seasons and rewrites only those partitions, which costs time
+    in proportion to the new games instead of the whole history.
+
+    The manifest records AGGREGATES_VERSION and, for each season, the fingerprint of the archive
+    files the aggregates were computed from (see GameArchive.fingerprints()). Aggregates of an
+    older version, or of a season that was written to without updating them (e.g. a reparse),
+    are reported by stale_seasons() and recomputed by refresh().
+
+    Parameters
+    ----------
+    path : str, optional
+        Folder the aggregates are kept in.
+    """
+    def __init__(self, path=AGGREGATES_PATH) -> None:
+        self.path = path
+        self.manifest_path = os.path.join(path, 'manifest.json')
+
+    def exists(self):
+        """Return True if aggregates have been stored."""
+        return os.path.exists(self.manifest_path)
+
+    def manifest(self):
+        """Return the manifest, or None if nothing is stored."""
+        if not self.exists():
+            return None
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        manifest['seasons'] = {int(season): tag for season, tag in manifest['seasons'].items()}
+        return manifest
+
+    def current(self):
+        """Return True if aggregates are stored with the current AGGREGATES_VERSION."""
+        manifest = self.manifest()
+        return manifest is not None and manifest['version'] == AGGREGATES_VERSION
+
+    ## ----------- Updates ------------ ##
+    def build(self, archive=None):
+        """
+        Compute the aggregates of every season of the archive, replacing the stored ones.
+
+        Parameters
+        ----------
+        archive : storage.GameArchive, optional
+            Archive the games are read from. Defaults to the default archive.
+        """
+        archive = GameArchive() if archive is None else archive
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        return self.refresh(archive)
+
+    def update(self, games, archive=None):
+        """
+        Add new games to the aggregates of their seasons. Returns the seasons updated.
+
+        Only the stored rows of these seasons are read and rewritten. Pass games right after
+        they were appended to the archive, e.g. the output of GameArchive.new_games(), onto
+        aggregates that were up to date before (see stale_seasons()); games that are already
+        aggregated would be counted twice.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column that aren't aggregated yet.
+        archive : storage.GameArchive, optional
+            Archive the games were appended to, whose fingerprints are recorded. Defaults to
+            the default archive.
+        """
+        archive = GameArchive() if archive is None else archive
+        if not self.current():
+            raise ValueError(f'The aggregates in {self.path} are missing or of an older version, use build().')
+        if not len(games):
+            return []
+
+        delta = season_aggregates(games)
+        seasons = sorted(int(season) for season in delta['home']['season'])
+        stored = {name: self.load(name, seasons=seasons) for name in TABLES}
+
+        # Stored sums plus the sums of the new games
+        tables = {}
+        for name, (keys, sums) in TABLES.items():
+            tables[name] = _sum(name, pd.concat([stored[name][keys + sums], delta[name][keys + sums]], ignore_index=True))
+        self._write(tables, archive.fingerprints(seasons))
+        return seasons
+
+    def stale_seasons(self, archive=None):
+        """
+        Return the seasons whose aggregates are missing or out of date with the archive: every
+        season if the aggregates are of an older version, otherwise the seasons whose archive
+        files changed since they were aggregated.
+
+        Parameters
+        ----------
+        archive : storage.GameArchive, optional
+            Archive to compare with. Defaults to the default archive.
+        """
+        archive = GameArchive() if archive is None else archive
+        fingerprints = archive.fingerprints()
+        manifest = self.manifest()
+        if manifest is None or manifest['version'] != AGGREGATES_VERSION:
+            return sorted(fingerprints)
+
+        stored = manifest['seasons']
+        changed = [season for season, tag in fingerprints.items() if stored.get(season) != tag]
+        removed = [season for season in stored if season not in fingerprints]
+        return sorted(changed + removed)
+
+    def refresh(self, archive=None):
+        """
+        Recompute the aggregates of the stale seasons from the archive. Returns the seasons.
+
+        Parameters
+        ----------
+        archive : storage.GameArchive, optional
+            Archive the games are read from. Defaults to the default archive.
+        """
+        archive = GameArchive() if archive is None else archive
+        if self.exists() and not self.current():
+            shutil.rmtree(self.path)  # Nothing of an older version is kept
+        seasons = self.stale_seasons(archive)
+        if not seasons:
+            return []
+
+        stored = set(archive.seasons())
+        games = archive.load(seasons=[s for s in seasons if s in stored]) if stored & set(seasons) else None
+        tables = season_aggregates(games) if games is not None else {name: None for name in TABLES}
+        self._write(tables, archive.fingerprints(seasons), seasons)
+        return seasons
+
+    def _write(self, tables, fingerprints, replaced=None):
+        """
+        Replace the partitions of the seasons in tables (and of replaced, which may have no
+        games left) and record their fingerprints in the manifest.
+        """
+        replaced = sorted(set(fingerprints) | set(replaced or []))
+        for name, df in tables.items():
+            folder = os.path.join(self.path, name)
+            for season in replaced:
+                if os.path.isdir(os.path.join(folder, f'season={season}')):
+                    shutil.rmtree(os.path.join(folder, f'season={season}'))
+            if df is not None and len(df):
+                ds.write_dataset(pa.Table.from_pandas(df, preserve_index=False), folder, format='parquet',
+                                 partitioning=PARTITIONING, basename_template='part-{i}.parquet',
+                                 existing_data_behavior='overwrite_or_ignore')
+
+        # The manifest is only updated once the tables are on disk
+        manifest = self.manifest() if self.current() else {'version': AGGREGATES_VERSION, 'seasons': {}}
+        for season in replaced:
+            manifest['seasons'].pop(season, None)
+        manifest['seasons'].update(fingerprints)
+        manifest['seasons'] = dict(sorted(manifest['seasons'].items()))
+        manifest['updated'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    ## ----------- Reading ------------ ##
+    def load(self, table, seasons=None, teams=None):
+        """
+        Load an aggregate table, sorted by its keys. Use stale_seasons() to check it is up to
+        date with the archive.
+
+        Parameters
+        ----------
+        table : str
+            'records', 'home' or 'scores'.
+        seasons : int or list of int, optional
+            Seasons to load. Only the folders of these seasons are read.
+        teams : list of str, optional
+            Team ids to load, only for 'records'.
+        """
+        if table not in TABLES:
+            raise ValueError(f'table must be one of {list(TABLES)}, not {table!r}.')
+        if not self.current():
+            raise ValueError(f'The aggregates in {self.path} are missing or of an older version, use build().')
+
+        keys, _ = TABLES[table]
+        folder = os.path.join(self.path, table)
+        if not os.path.isdir(folder):
+            return _sum(table, pd.DataFrame(columns=keys + TABLES[table][1]))
+
+        if isinstance(seasons, (int, float)):
+            seasons = [int(seasons)]
+        predicate = None
+        if seasons is not None:
+            predicate = ds.field('season').isin([int(season) for season in seasons])
+        if teams is not None:
+            team_filter = ds.field('team_id').isin(list(teams))
+            predicate = team_filter if predicate is None else predicate & team_filter
+
+        dataset = ds.dataset(folder, format='parquet', partitioning=PARTITIONING)
+        df = dataset.to_table(filter=predicate).to_pandas()
+        df.insert(0, 'season', df.pop('season'))
+        return df.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def score_frequencies(scores):
+    """
+    All-time score frequency table from the 'scores' aggregate: games ending pts_win to pts_lose,
+    with the first and last season each score happened.
+
+    Parameters
+    ----------
+    scores : pd.DataFrame
+        AggregateStore().load('scores').
+    """
+    grouped = scores.groupby(['pts_win', 'pts_lose'], sort=True)
+    df = grouped.agg(games=('games', 'sum'), first_season=('season', 'min'), last_season=('season', 'max'))
+    return df.sort_values('games', ascending=False, kind='stable').reset_index()
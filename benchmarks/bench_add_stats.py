@@ -0,0 +1,97 @@
+"""
+Benchmark the vectorized add_stats() against the row-wise version it replaced and check that
+both produce the same games.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_add_stats [--rows 100000]
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from game_data import add_stats
+from benchmarks.pages import TEAMS
+
+
+def legacy_add_stats(games):
+    """The row-wise add_stats() that loops over every season."""
+    def ties(row):
+        return 0.5 if row['pts_win']==row['pts_lose'] else row['home_win']
+    games['home_win'] = games.apply(ties, axis=1)
+
+    games['game_date'] = pd.to_datetime(games['game_date'], format='%Y-%m-%d')
+
+    years = games['game_date'].dt.year.unique()
+    seasons = [(datetime.date(yr,8,1), datetime.date(yr+1,3,1)) for yr in years]
+
+    games = games.sort_values('game_date')
+    games.insert(2, 'season', np.nan)
+
+    for season in seasons:
+        games.loc[games.game_date.dt.date.between(season[0], season[1]),'season'] = season[0].year
+    games['season'] = games['season'].astype('int')
+
+    return games
+
+
+def synthetic_games(n_rows, seed=0):
+    """Build n_rows of games shaped like get_data() output (every value a string)."""
+    rng = np.random.default_rng(seed)
+
+    # Game days fall between September and February like real seasons
+    years = rng.integers(1920, 2022, n_rows)
+    offsets = rng.integers(0, 170, n_rows)
+    dates = pd.to_datetime([f'{y}-09-01' for y in years]) + pd.to_timedelta(offsets, unit='D')
+
+    pts_win = rng.integers(0, 50, n_rows)
+    pts_lose = np.minimum(pts_win, rng.integers(0, 40, n_rows))
+    teams = np.array(TEAMS)
+    return pd.DataFrame({
+        'week_num': rng.integers(1, 18, n_rows).astype(str),
+        'game_day_of_week': 'Sun',
+        'game_date': dates.strftime('%Y-%m-%d'),
+        'winner_id': teams[rng.integers(0, len(teams), n_rows)],
+        'winner': 'Winner Team',
+        'home_win': rng.integers(0, 2, n_rows),
+        'loser_id': teams[rng.integers(0, len(teams), n_rows)],
+        'loser': 'Loser Team',
+        'boxscore': [f'/boxscores/{i}.htm' for i in range(n_rows)],
+        'pts_win': pts_win.astype(str),
+        'pts_lose': pts_lose.astype(str),
+        'yards_win': rng.integers(100, 600, n_rows).astype(str),
+        'to_win': rng.integers(0, 6, n_rows).astype(str),
+        'yards_lose': rng.integers(100, 600, n_rows).astype(str),
+        'to_lose': rng.integers(0, 6, n_rows).astype(str),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows in the synthetic game frame')
+    args = parser.parse_args()
+
+    games = synthetic_games(args.rows)
+
+    start = time.perf_counter()
+    legacy = legacy_add_stats(games.copy())
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = add_stats(games)
+    new_time = time.perf_counter() - start
+
+    # Same games in the same order once the legacy string columns get the new dtypes
+    pd.testing.assert_frame_equal(legacy.astype(new.dtypes.to_dict()), new)
+
+    print(f'rows={args.rows}')
+    print(f'legacy  {legacy_time:8.3f} s  {legacy.memory_usage(deep=True).sum() / 1e6:8.1f} MB')
+    print(f'new     {new_time:8.3f} s  {new.memory_usage(deep=True).sum() / 1e6:8.1f} MB')
+    print(f'speedup {legacy_time / new_time:8.1f}x, outputs identical')
+
+
+if __name__ == '__main__':
+    main()
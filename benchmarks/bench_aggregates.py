@@ -0,0 +1,69 @@
+"""
+Compare refreshing the season aggregates after a weekly sync incrementally against recomputing
+them from the whole archive, and check both give the same tables.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_aggregates [--rows 17000] [--week 16]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from aggregates import TABLES, AggregateStore, season_aggregates
+from game_data import add_stats
+from storage import GameArchive
+from benchmarks.bench_add_stats import synthetic_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=17_000, help='Games in the archive')
+    parser.add_argument('--week', type=int, default=16, help='Games added by the sync')
+    args = parser.parse_args()
+
+    games = add_stats(synthetic_games(args.rows))
+    week = games[games['season'] == games['season'].max()].tail(args.week)
+    history = games.drop(week.index)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = GameArchive(os.path.join(tmp, 'games'))
+        archive.write(history)
+        store = AggregateStore(os.path.join(tmp, 'aggregates'))
+
+        start = time.perf_counter()
+        store.build(archive)
+        build = time.perf_counter() - start
+
+        # What game_data.sync() does with the week's games
+        start = time.perf_counter()
+        stale = store.stale_seasons(archive)
+        new = archive.new_games(week)
+        archive.append(new, dedupe=False)
+        append = time.perf_counter() - start
+        start = time.perf_counter()
+        seasons = store.update(new, archive)
+        update = time.perf_counter() - start
+
+        # The same refresh from scratch
+        start = time.perf_counter()
+        full = season_aggregates(archive.load())
+        recompute = time.perf_counter() - start
+
+        for name in TABLES:
+            stored = store.load(name)
+            pd.testing.assert_frame_equal(stored[full[name].columns], full[name])
+        assert not stale and not store.stale_seasons(archive)
+
+    print(f'archive of {len(games)} games, a week of {len(new)} games in seasons {seasons}')
+    print(f'build every season     {build:8.3f} s')
+    print(f'archive append         {append:8.3f} s')
+    print(f'incremental update     {update:8.3f} s')
+    print(f'recompute from archive {recompute:8.3f} s (without writing)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Time the boxscore pipeline on synthetic pages: parsing a page, building the typed tables and
+writing them, and what that means for a full-history backfill at a given request budget.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_boxscores [--pages 500] [--rpm 20] [--history 17000]
+"""
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+
+from boxscores import BoxscoreStore, boxscore_frames, parse_boxscore
+from benchmarks.pages import TEAMS, boxscore_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500, help='Synthetic boxscore pages')
+    parser.add_argument('--rpm', type=float, default=20, help='Request budget of the backfill')
+    parser.add_argument('--history', type=int, default=17_000, help='Boxscores in the full history')
+    args = parser.parse_args()
+
+    site = 'https://www.pro-football-reference.com'
+    pages, games = {}, []
+    for i in range(args.pages):
+        home, vis = TEAMS[i % 32], TEAMS[(i + 7) % 32]
+        url = f'{site}/boxscores/{pd.Timestamp("2000-09-10") + pd.Timedelta(days=i):%Y%m%d}0{home}.htm'
+        pages[url] = boxscore_page(seed=i)
+        games.append({'boxscore': url, 'winner_id': home, 'loser_id': vis})
+    games = pd.DataFrame(games)
+    mb = sum(len(page) for page in pages.values()) / 1e6
+
+    start = time.perf_counter()
+    rows = {}
+    for url, content in pages.items():
+        for name, table in parse_boxscore(url, content).items():
+            rows.setdefault(name, []).extend(table)
+    parse = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames = boxscore_frames(rows, games)
+    build = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        BoxscoreStore(path).append(frames)
+        write = time.perf_counter() - start
+
+    print(f'pages={args.pages} ({mb:.1f} MB) drives={len(frames["drives"])} plays={len(frames["scoring"])}')
+    print(f'parse            {parse:8.3f} s  {args.pages / parse:8.0f} pages/s')
+    print(f'typed frames     {build:8.3f} s')
+    print(f'write            {write:8.3f} s')
+    cpu = (parse + build + write) / args.pages * args.history
+    print(f'backfill of {args.history} boxscores: {cpu / 60:.1f} min of cpu, '
+          f'{args.history / args.rpm / 60:.1f} h at {args.rpm:g} requests/min')
+
+
+if __name__ == '__main__':
+    main()
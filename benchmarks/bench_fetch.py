@@ -0,0 +1,49 @@
+"""
+Benchmark the concurrent fetch engine against a local stub server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fetch [--pages 64] [--latency 0.25] [--directory saved_pages/]
+"""
+import argparse
+import time
+
+from fetch import Fetcher
+from game_data import get_games_per_score
+from benchmarks.pages import StubServer, score_page
+
+
+def run(stub, n_pages, max_workers):
+    """Fetch and parse n_pages score pages and return pages/sec."""
+    # Cycle thru saved pages, otherwise every path gets the default page
+    paths = sorted(stub.pages) or [f'/?page={i}' for i in range(n_pages)]
+    urls = [stub.url + paths[i % len(paths)] for i in range(n_pages)]
+
+    def parse(url, content):
+        return get_games_per_score(url, soup=content)
+
+    start = time.perf_counter()
+    with Fetcher(max_workers=max_workers, requests_per_minute=None, cache=False) as fetcher:
+        rows = sum(len(games) for _, games in fetcher.map(urls, parse=parse))
+    elapsed = time.perf_counter() - start
+
+    return n_pages / elapsed, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=64, help='Number of pages fetched per run')
+    parser.add_argument('--latency', type=float, default=0.25, help='Stub server response latency (s)')
+    parser.add_argument('--directory', default=None, help='Folder of saved score pages to serve')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    default = None if args.directory else score_page()
+    with StubServer(directory=args.directory, default=default, latency=args.latency) as stub:
+        for workers in args.concurrency:
+            rate, rows = run(stub, args.pages, workers)
+            print(f'concurrency={workers:<3} {rate:8.1f} pages/sec  ({rows} rows)')
+
+
+if __name__ == '__main__':
+    main()
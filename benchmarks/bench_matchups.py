@@ -0,0 +1,66 @@
+"""
+Compare the broadcast matchup grid against a loop over the rows of the offense and defense
+frames, for one season and for many seasons stacked.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_matchups [--seasons 20]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from matchups import MatchupGrid, OFFENSE_TABLE, DEFENSE_TABLE
+from projections import _parse_season, _concat_seasons
+from benchmarks.pages import season_page, stats_page, DEFENSE_TABLES
+
+
+def loop_spreads(offense, defense):
+    """Spread of every matchup of a season by looking up both teams' rows for every pair."""
+    average = (offense['points'] / offense['g']).mean()
+    spreads = {}
+    for home, home_off in offense.iterrows():
+        for away, away_off in offense.iterrows():
+            home_def, away_def = defense.loc[home], defense.loc[away]
+            home_points = (home_off['points'] / home_off['g']) * (away_def['points'] / away_def['g']) / average
+            away_points = (away_off['points'] / away_off['g']) * (home_def['points'] / home_def['g']) / average
+            spreads[(home, away)] = home_points - away_points
+    return pd.Series(spreads).unstack()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=20, help='Seasons stacked in the grid')
+    args = parser.parse_args()
+
+    seasons = [_parse_season(2000 + i, season_page(i), stats_page(DEFENSE_TABLES, i))[1] for i in range(args.seasons)]
+    frames = {kind: _concat_seasons([season[kind] for season in seasons]) for kind in ('offense', 'defense')}
+    last = frames['offense'].index.get_level_values('season').max()
+    offense = frames['offense'].loc[last, OFFENSE_TABLE]
+    defense = frames['defense'].loc[last, DEFENSE_TABLE]
+
+    start = time.perf_counter()
+    legacy = loop_spreads(offense, defense)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grid = MatchupGrid.from_seasons(frames)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    spreads = grid.spread()
+    grid_time = time.perf_counter() - start
+
+    # Same spreads for the last season
+    np.testing.assert_allclose(grid.frame(last).loc[legacy.index, legacy.columns].to_numpy(), legacy.to_numpy(), rtol=1e-5, atol=1e-6)
+
+    print(f'seasons={len(grid.seasons)} teams={len(grid.teams)} grid={spreads.shape}')
+    print(f'row loop, one season     {loop_time * 1000:10.2f} ms')
+    print(f'grid build, all seasons  {build_time * 1000:10.2f} ms')
+    print(f'broadcast, all seasons   {grid_time * 1000:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Time every stage of the scrape -> parse -> store -> model pipeline offline, by replaying a
+fixture corpus (see replay.py), and store the timings per commit so runs can be compared.
+
+Without --corpus a synthetic corpus is generated. Run from the repository root:
+
+    python -m benchmarks.bench_pipeline [--corpus fixtures/v1] [--repeat 3] [--compare HEAD~1]
+
+Results are written to benchmarks/results/<commit>.json. --compare takes a commit (or a prefix
+of one) with stored results, and defaults to the most recent other result.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import game_data
+import projections
+from query import GameIndex
+from ratings import Elo
+from replay import replay, Corpus
+from storage import GameArchive
+from benchmarks.pages import synthetic_corpus
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def run_pipeline(corpus_path, seasons, workdir):
+    """Run every stage once against the corpus and return the seconds of each stage."""
+    times = {}
+
+    @contextlib.contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield
+        times[name] = time.perf_counter() - start
+
+    # Each run gets a fresh, empty cache inside replay()
+    with replay(corpus_path), contextlib.redirect_stdout(io.StringIO()):
+        with stage('score_links'):
+            game_data.get_all_game_score_links()
+        with stage('get_data'):
+            games = game_data.get_data(wait_time=0, max_workers=4, marks_path=os.path.join(workdir, 'marks.json'),
+                                       stage_path=os.path.join(workdir, 'scrape'))
+        with stage('add_stats'):
+            games = game_data.add_stats(games)
+
+        archive = GameArchive(os.path.join(workdir, 'games'))
+        with stage('archive_write'):
+            archive.write(games)
+        with stage('archive_load'):
+            games = archive.load()
+
+        with stage('elo_fit'):
+            Elo().fit(games)
+        with stage('index_build'):
+            GameIndex(games)
+
+        # The same games thru sync(), twice. The second run parses every score page again
+        # (its marks are removed) and must not add any game that is already archived
+        options = dict(wait_time=0, archive_path=os.path.join(workdir, 'synced'), csv=False, metrics_path=None,
+                       aggregates_path=os.path.join(workdir, 'aggregates'),
+                       marks_path=os.path.join(workdir, 'sync_marks.json'), stage_path=os.path.join(workdir, 'sync'))
+        with stage('sync'):
+            game_data.sync(**options)
+        os.remove(options['marks_path'])
+        with stage('sync_again'):
+            added = game_data.sync(**options)
+        assert added == 0, f'a second sync added {added} games'
+
+        with stage('season_tables'):
+            for season in seasons:
+                data = projections.GetData(season)
+                data.team_standings()
+                data.team_offense_stats()
+                data.team_defense_stats()
+
+    return times
+
+
+def corpus_seasons(corpus_path):
+    """Seasons whose year and defense pages are in the corpus."""
+    urls = Corpus(corpus_path).urls()
+    seasons = []
+    for url in urls:
+        if url.endswith('/opp.htm'):
+            season = url.rstrip('/').split('/')[-2]
+            if season.isdigit() and url[:-len('opp.htm')] in urls:
+                seasons.append(int(season))
+    return sorted(seasons)
+
+
+def git_commit():
+    """Return (commit, dirty) of the working tree, or ('unknown', True) outside of git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', True
+
+
+def load_result(ref, exclude=None):
+    """Load the stored result of a commit (or prefix), or the most recent one that isn't exclude."""
+    paths = sorted(glob.glob(os.path.join(RESULTS_PATH, '*.json')), key=os.path.getmtime, reverse=True)
+    if ref is not None:
+        try:
+            ref = subprocess.run(['git', 'rev-parse', '--short', ref], capture_output=True, text=True,
+                                 check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            pass
+        paths = [path for path in paths if os.path.basename(path).startswith(ref)]
+    paths = [path for path in paths if os.path.basename(path)[:-len('.json')] != exclude]
+    if not paths:
+        return None
+    with open(paths[0]) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=None, help='Recorded corpus to replay (default: synthetic)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of the pipeline, the fastest is kept')
+    parser.add_argument('--compare', default=None, help='Commit whose stored results are compared')
+    parser.add_argument('--no-save', action='store_true', help="Don't store the results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus_path = args.corpus
+        if corpus_path is None:
+            corpus_path = os.path.join(workdir, 'corpus')
+            synthetic_corpus(corpus_path)
+        seasons = corpus_seasons(corpus_path)
+
+        runs = []
+        for i in range(args.repeat):
+            run_dir = os.path.join(workdir, f'run{i}')
+            os.makedirs(run_dir)
+            runs.append(run_pipeline(corpus_path, seasons, run_dir))
+
+    stages = {name: min(run[name] for run in runs) for name in runs[0]}
+    commit, dirty = git_commit()
+    result = {'commit': commit, 'dirty': dirty, 'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'corpus': args.corpus or 'synthetic', 'python': sys.version.split()[0],
+              'machine': f'{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)', 'stages': stages}
+
+    previous = load_result(args.compare, exclude=None if args.compare else commit)
+    print(f'commit={commit}{" (dirty)" if dirty else ""} corpus={result["corpus"]} seasons={seasons}')
+    header = f'{"stage":<16}{"seconds":>10}'
+    if previous is not None:
+        header += f'{previous["commit"]:>12}{"change":>10}'
+    print(header)
+    for name, seconds in stages.items():
+        line = f'{name:<16}{seconds:>10.3f}'
+        if previous is not None and name in previous['stages']:
+            before = previous['stages'][name]
+            line += f'{before:>12.3f}{(seconds - before) / before:>+10.0%}'
+        print(line)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_PATH, exist_ok=True)
+        path = os.path.join(RESULTS_PATH, f'{commit}.json')
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=1)
+        print(f'results written to {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare GameIndex queries against the boolean masks they replace, and check both return the
+same games.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_query [--rows 17000] [--number 200]
+"""
+import argparse
+import time
+import timeit
+
+import pandas as pd
+
+from game_data import add_stats
+from query import GameIndex
+from benchmarks.bench_add_stats import synthetic_games
+
+
+def naive_queries(games):
+    w, l = games['winner_id'], games['loser_id']
+    return {
+        'team': lambda: games[(w == 'nwe') | (l == 'nwe')],
+        'team + dates': lambda: games[((w == 'nwe') | (l == 'nwe')) & games['game_date'].between('2000-08-01', '2010-03-01')],
+        'head to head': lambda: games[((w == 'nwe') & (l == 'buf')) | ((w == 'buf') & (l == 'nwe'))],
+        'season': lambda: games[games['season'] == 2005],
+        'score': lambda: games[(games['pts_win'] == 20) & (games['pts_lose'] == 17)],
+    }
+
+
+def index_queries(index):
+    return {
+        'team': (lambda: index.team_rows('nwe'), lambda: index.team('nwe')),
+        'team + dates': (lambda: index.team_rows('nwe', '2000-08-01', '2010-03-01'),
+                         lambda: index.team('nwe', '2000-08-01', '2010-03-01')),
+        'head to head': (lambda: index.pair_rows('nwe', 'buf'), lambda: index.head_to_head('nwe', 'buf')),
+        'season': (lambda: index.season_rows(2005), lambda: index.season(2005)),
+        'score': (lambda: index.score_rows(20, 17), lambda: index.score(20, 17)),
+    }
+
+
+def micros(func, number):
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=17_000, help='Games in the synthetic archive')
+    parser.add_argument('--number', type=int, default=200, help='Runs of each query')
+    args = parser.parse_args()
+
+    games = add_stats(synthetic_games(args.rows)).reset_index(drop=True)
+
+    start = time.perf_counter()
+    index = GameIndex(games)
+    print(f'games={len(games)} index built in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    print(f'{"query":<16}{"mask us":>10}{"rows us":>10}{"frame us":>10}{"games":>8}')
+    naive = naive_queries(games)
+    for name, (rows, frame) in index_queries(index).items():
+        # Same games as the mask (the index keeps games in date order)
+        expected = naive[name]()
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), frame().reset_index(drop=True))
+        print(f'{name:<16}{micros(naive[name], args.number):>10.1f}{micros(rows, args.number):>10.1f}'
+              f'{micros(frame, args.number):>10.1f}{len(expected):>8}')
+
+    # Incremental refresh with a week of new games
+    new = add_stats(synthetic_games(16, seed=1)).assign(game_date=games['game_date'].max() + pd.Timedelta(days=7))
+    new['season'] = games['season'].max()
+    start = time.perf_counter()
+    index.extend(new)
+    print(f'extend by {len(new)} games in {(time.perf_counter() - start) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
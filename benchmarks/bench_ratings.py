@@ -0,0 +1,57 @@
+"""
+Time a full-history Elo recompute and a small parameter sweep over synthetic games, and check
+that an update with a late game of the last rated day matches a full recompute.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ratings [--rows 17000]
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from game_data import add_stats
+from ratings import Elo
+from benchmarks.bench_add_stats import synthetic_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=17_000, help='Games in the synthetic history')
+    args = parser.parse_args()
+
+    games = add_stats(synthetic_games(args.rows))
+    print(f'games={len(games)} days={games["game_date"].nunique()}')
+
+    start = time.perf_counter()
+    elo = Elo().fit(games)
+    print(f'full recompute   {time.perf_counter() - start:8.3f} s')
+
+    # Rate the last tenth of the games on top of the first nine tenths
+    split = games['game_date'].iloc[len(games) * 9 // 10]
+    elo = Elo().fit(games[games['game_date'] <= split])
+    start = time.perf_counter()
+    elo.update(games)
+    print(f'incremental 10%  {time.perf_counter() - start:8.3f} s')
+
+    # A late game of the last rated day gives the same ratings as rating everything at once
+    days = games['game_date'].value_counts()
+    day = days[(days > 1) & (days.index <= split)].index.max()
+    history = games[games['game_date'] <= day]
+    late = Elo().fit(history.drop(history.index[history['game_date'] == day][:1]))
+    late.update(history)
+    full = Elo().fit(history)
+    np.testing.assert_allclose(late.ratings.sort_index(), full.ratings.sort_index())
+    np.testing.assert_allclose(late.history.sort_index(), full.history.sort_index())
+
+    grid = list(itertools.product([10, 20, 30], [0, 50, 65], [0, 1/3]))
+    start = time.perf_counter()
+    for k, home_field, revert in grid:
+        Elo(k=k, home_field=home_field, revert=revert).fit(games)
+    print(f'sweep of {len(grid)} fits {time.perf_counter() - start:8.3f} s')
+
+
+if __name__ == '__main__':
+    main()
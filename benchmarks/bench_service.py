@@ -0,0 +1,122 @@
+"""
+Time the query service end to end: load it from a synthetic replay corpus and game archive,
+then send requests from concurrent keep-alive connections and report the latency percentiles
+of each endpoint as the clients see them.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_service [--requests 20000] [--connections 8] [--corpus fixtures/v1 --season 2021]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import game_data
+from replay import replay
+from service import QueryService
+from storage import GameArchive
+from benchmarks.pages import TEAMS, synthetic_corpus
+
+
+def targets(n):
+    """n request targets cycling thru every endpoint and many team pairs."""
+    rng = np.random.default_rng(0)
+    kinds = ['standings', 'team', 'head-to-head', 'projection']
+    for i in range(n):
+        home, away = rng.choice(TEAMS, 2, replace=False)
+        kind = kinds[i % len(kinds)]
+        yield kind, {'standings': '/standings', 'team': f'/teams/{home}',
+                     'head-to-head': f'/head-to-head/{home}/{away}', 'projection': f'/projection/{home}/{away}'}[kind]
+
+
+async def client(port, requests, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for kind, target in requests:
+        start = time.perf_counter()
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b'\r\n':
+                break
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':')[1])
+        await reader.readexactly(length)
+        latencies.setdefault(kind, []).append(time.perf_counter() - start)
+    writer.close()
+
+
+async def status(port, request):
+    """Send a raw request and return the status of the answer."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(request)
+    await writer.drain()
+    line = await reader.readline()
+    writer.close()
+    return int(line.split()[1])
+
+
+async def run(service, n_requests, connections):
+    await service.start(port=0)
+    requests = list(targets(n_requests))
+    latencies = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(service.port, requests[i::connections], latencies) for i in range(connections)))
+    seconds = time.perf_counter() - start
+
+    # Bad requests are answered instead of dropping the connection
+    bad = await status(service.port, b'GET /standings HTTP/1.1\r\nContent-Length: ten\r\n\r\n')
+    assert bad == 400, f'a malformed Content-Length header got a {bad}'
+    await service.stop()
+    return latencies, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20_000, help='Requests sent in total')
+    parser.add_argument('--connections', type=int, default=8, help='Concurrent client connections')
+    parser.add_argument('--corpus', default=None, help='Replay corpus (default: a synthetic one)')
+    parser.add_argument('--season', type=int, default=2021, help='Season served')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = os.path.join(tmp, 'corpus')
+            synthetic_corpus(corpus, seasons=(args.season,))
+        archive = os.path.join(tmp, 'games')
+
+        with replay(corpus):
+            with contextlib.redirect_stdout(io.StringIO()):
+                games = game_data.get_data(wait_time=0, marks_path=os.path.join(tmp, 'marks.json'),
+                                           stage_path=os.path.join(tmp, 'scrape'))
+            GameArchive(archive).write(game_data.add_stats(games))
+            service = QueryService(args.season, archive_path=archive, refresh_interval=None)
+            start = time.perf_counter()
+            service.refresh()
+            load = time.perf_counter() - start
+        latencies, seconds = asyncio.run(run(service, args.requests, args.connections))
+
+    print(f'snapshot of {service.snapshot.games} games loaded in {load:.2f} s')
+    print(f'{args.requests} requests over {args.connections} connections in {seconds:.2f} s '
+          f'({args.requests / seconds:.0f} requests/s)')
+    print(f'{"endpoint":<14}{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+    latencies['all'] = np.concatenate([np.array(values) for values in latencies.values()])
+    for kind, values in latencies.items():
+        values = np.array(values) * 1000
+        print(f'{kind:<14}{np.percentile(values, 50):>10.3f}{np.percentile(values, 99):>10.3f}{values.max():>10.3f}')
+
+    # The clients share the event loop with the service, so their latencies include waiting on
+    # each other. The time the service spends on each request:
+    server = np.array(service.latencies) * 1000
+    print(f'{"server side":<14}{np.percentile(server, 50):>10.3f}{np.percentile(server, 99):>10.3f}{server.max():>10.3f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Time the Monte Carlo season simulator on a synthetic mid-season: 8 games played and 9 weeks
+of 16 games left for 32 teams.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_simulate [--sims 100000] [--processes 4]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from projections import GetData
+from simulation import SeasonSimulator
+from benchmarks.pages import year_page
+
+
+def mid_season(seed=0, weeks_left=9):
+    """Return standings after 8 games, ratings and the remaining schedule."""
+    rng = np.random.default_rng(seed)
+    standings = GetData(2021, year_soup=year_page(seed)).team_standings()
+    standings['wins'] = rng.integers(0, 9, len(standings)).astype('int16')
+    standings['losses'] = (8 - standings['wins']).astype('int16')
+    standings['ties'] = np.zeros(len(standings), dtype='int16')
+
+    ratings = pd.Series(rng.normal(1500, 80, len(standings)), index=standings['id'].astype(str))
+    games = [rng.permutation(standings['id'].astype(str)).reshape(-1, 2) for _ in range(weeks_left)]
+    schedule = pd.DataFrame(np.concatenate(games), columns=['home_id', 'away_id'])
+    return standings, ratings, schedule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sims', type=int, default=100_000, help='Simulated seasons')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: cpu count)')
+    args = parser.parse_args()
+
+    simulator = SeasonSimulator(*mid_season())
+
+    start = time.perf_counter()
+    single = simulator.run(args.sims, processes=1, seed=0)
+    single_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pooled = simulator.run(args.sims, processes=args.processes, seed=0)
+    pooled_time = time.perf_counter() - start
+
+    # The same seed gives the same probabilities however the batches are spread
+    pd.testing.assert_frame_equal(single, pooled)
+
+    print(f'sims={args.sims} games={len(simulator.p_home)}')
+    print(f'1 process    {single_time:8.2f} s')
+    print(f'pool         {pooled_time:8.2f} s')
+    print(pooled.head(8).round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
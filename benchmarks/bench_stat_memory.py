@@ -0,0 +1,70 @@
+"""
+Report the memory of the standings/offense/defense tables of many seasons, built as typed
+columns versus the string object frames built before.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stat_memory [--seasons 20]
+"""
+import argparse
+import re
+import time
+
+import pandas as pd
+
+from projections import GetData
+from tables import iter_tables, team_id
+from benchmarks.pages import year_page, stats_page, OFFENSE_TABLES, DEFENSE_TABLES
+
+
+def legacy_frames(page):
+    """Build every table of a page as nested dicts of strings transposed into a frame."""
+    frames = {}
+    for tbl in iter_tables(page):
+        teams = {}
+        for row, link in zip(tbl.rows(), tbl.links.get('team', [])):
+            if 'team' not in row:
+                continue
+            team = re.sub(r'[^A-Za-z0-9 ]', '', row.pop('team'))
+            teams[team] = {'id': team_id(link), **row}
+        frames[tbl.caption] = pd.DataFrame(teams).T
+    return frames
+
+
+def typed_frames(data):
+    """Build the standings, offense and defense tables of a GetData object."""
+    return {'Standings': data.team_standings(), **data.team_offense_stats(), **data.team_defense_stats()}
+
+
+def frame_bytes(frames):
+    return sum(df.memory_usage(deep=True).sum() for df in frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=20, help='Number of seasons loaded')
+    args = parser.parse_args()
+
+    pages = [(year_page(seed), stats_page(OFFENSE_TABLES, seed), stats_page(DEFENSE_TABLES, seed))
+             for seed in range(args.seasons)]
+
+    start = time.perf_counter()
+    legacy = [df for year, off, dfn in pages for page in (year, off, dfn) for df in legacy_frames(page).values()]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    typed = []
+    for season, (year, off, dfn) in enumerate(pages):
+        data = GetData(season=2000 + season, year_soup=year, off_soup=off, def_soup=dfn)
+        typed.extend(typed_frames(data).values())
+    typed_time = time.perf_counter() - start
+
+    before, after = frame_bytes(legacy), frame_bytes(typed)
+    print(f'seasons={args.seasons} tables={len(typed)}')
+    print(f'object frames {before / 1e6:8.2f} MB  built in {legacy_time:6.2f} s')
+    print(f'typed frames  {after / 1e6:8.2f} MB  built in {typed_time:6.2f} s')
+    print(f'memory reduced {before / after:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark the lxml table extractor against the BeautifulSoup html.parser path it replaced.
+
+Each parser runs in a fresh process so its peak memory can be measured. Run from the
+repository root:
+
+    python -m benchmarks.bench_tables [--rows 1000] [--repeat 5] [--directory saved_pages/]
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import resource
+import time
+
+from bs4 import BeautifulSoup
+
+from game_data import get_games_per_score
+from tables import iter_tables
+from benchmarks.pages import score_page, stats_page, year_page, DEFENSE_TABLES
+
+
+def bs4_games_per_score(content):
+    """The BeautifulSoup version of game_data.get_games_per_score()."""
+    soup = BeautifulSoup(content, 'html.parser')
+    table = soup.find('table', attrs={'id': 'games'})
+
+    games = {}
+    site_stub = 'https://www.pro-football-reference.com'
+    for i, row in enumerate(table.find_all('tr')[1:]):
+        row_dict = {}
+        for col in row.find_all('td'):
+            col_name = col['data-stat']
+            if col_name in ('winner', 'loser'):
+                site = col.find('a').get('href')
+                row_dict[col_name + '_id'] = re.search(r'/teams/([A-Za-z0-9]+)/', site).group(1)
+            elif col_name == 'game_location':
+                row_dict['home_win'] = 0 if r'@' in col.text else 1
+                continue
+            elif col_name == 'boxscore_word':
+                row_dict['boxscore'] = site_stub + col.find('a').get('href')
+                continue
+            row_dict[col_name] = col.text
+        games[i] = row_dict
+    return games
+
+
+def bs4_tables(content):
+    """Walk every cell of every table with BeautifulSoup."""
+    soup = BeautifulSoup(content, 'html.parser')
+    tables = {}
+    for tbl in soup.find_all('table'):
+        columns = {}
+        for td in tbl.find_all(['th', 'td']):
+            stat = td.get('data-stat')
+            if stat is not None:
+                columns.setdefault(stat, []).append(td.text)
+        tables[tbl.get('id')] = columns
+    return tables
+
+
+def lxml_tables(content):
+    """Walk every cell of every table with the streaming extractor."""
+    return {table.id: table.columns for table in iter_tables(content)}
+
+
+PARSERS = {
+    'games': {'bs4': bs4_games_per_score, 'lxml': lambda content: get_games_per_score(None, soup=content)},
+    'tables': {'bs4': bs4_tables, 'lxml': lxml_tables},
+}
+
+
+def _measure(kind, name, content, repeat, queue):
+    parse = PARSERS[kind][name]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(content)
+    elapsed = (time.perf_counter() - start) / repeat
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((elapsed, peak))
+
+
+def measure(kind, name, content, repeat):
+    """Return (seconds per parse, peak memory growth in KB) of a parser run in a fresh process."""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(kind, name, content, repeat, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000, help='Games on the synthetic score page')
+    parser.add_argument('--repeat', type=int, default=5, help='Parses per measurement')
+    parser.add_argument('--directory', default=None, help='Folder of saved pages to parse as well')
+    args = parser.parse_args()
+
+    fixtures = [('games', 'score page', score_page(args.rows)),
+                ('tables', 'season page', year_page()),
+                ('tables', 'defense page', stats_page(DEFENSE_TABLES, commented=False))]
+    if args.directory:
+        for name in sorted(os.listdir(args.directory)):
+            with open(os.path.join(args.directory, name), 'rb') as f:
+                fixtures.append(('tables', name, f.read()))
+
+    print(f'{"fixture":<24}{"parser":<8}{"ms/parse":>10}{"peak KB":>10}')
+    for kind, label, content in fixtures:
+        results = {name: measure(kind, name, content, args.repeat) for name in ('bs4', 'lxml')}
+        for name, (elapsed, peak) in results.items():
+            print(f'{label:<24}{name:<8}{elapsed * 1000:>10.1f}{peak:>10}')
+        print(f'{"":<24}speedup {results["bs4"][0] / results["lxml"][0]:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Helpers for serving pro-football-reference style pages to the benchmarks."""
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEAMS = ['buf', 'mia', 'nwe', 'nyj', 'rav', 'cin', 'cle', 'pit', 'htx', 'clt', 'jax', 'oti',
+         'den', 'kan', 'rai', 'sdg', 'dal', 'nyg', 'phi', 'was', 'chi', 'det', 'gnb', 'min',
+         'atl', 'car', 'nor', 'tam', 'crd', 'ram', 'sfo', 'sea']
+
+
+def score_page(n_games=200, seed=0):
+    """Build a synthetic game-scores page shaped like the 'games' table on pro-football-reference."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_games):
+        win, lose = rng.sample(TEAMS, 2)
+        year = rng.randint(1920, 2021)
+        date = f'{year}-{rng.randint(9, 12):02}-{rng.randint(1, 28):02}'
+        rows.append(
+            '<tr>'
+            f'<th scope="row" class="right" data-stat="ranker">{i+1}</th>'
+            f'<td data-stat="week_num">{rng.randint(1, 17)}</td>'
+            f'<td data-stat="game_day_of_week">Sun</td>'
+            f'<td data-stat="game_date">{date}</td>'
+            f'<td data-stat="winner"><a href="/teams/{win}/{year}.htm">{win.upper()} Team</a></td>'
+            f'<td data-stat="game_location">{"@" if rng.random() < 0.4 else ""}</td>'
+            f'<td data-stat="loser"><a href="/teams/{lose}/{year}.htm">{lose.upper()} Team</a></td>'
+            f'<td data-stat="boxscore_word"><a href="/boxscores/{date.replace("-", "")}0{win}{i}.htm">boxscore</a></td>'
+            f'<td data-stat="pts_win">{rng.randint(10, 40)}</td>'
+            f'<td data-stat="pts_lose">{rng.randint(0, 9)}</td>'
+            f'<td data-stat="yards_win">{rng.randint(200, 500)}</td>'
+            f'<td data-stat="to_win">{rng.randint(0, 4)}</td>'
+            f'<td data-stat="yards_lose">{rng.randint(200, 500)}</td>'
+            f'<td data-stat="to_lose">{rng.randint(0, 4)}</td>'
+            '</tr>'
+        )
+    return (
+        '<html><head><title>Games</title></head><body><div id="content">'
+        '<table class="sortable stats_table" id="games"><caption>Games Table</caption>'
+        '<thead><tr><th data-stat="ranker">Rk</th><th data-stat="week_num">Week</th></tr></thead>'
+        '<tbody>' + ''.join(rows) + '</tbody></table></div></body></html>'
+    ).encode()
+
+
+class StubServer:
+    """
+    Local HTTP server that serves saved pages with an artificial response latency.
+
+    Parameters
+    ----------
+    pages : dict
+        Mapping of request path (including query string) to page bytes.
+    directory : str, optional
+        Folder of saved pages. Every file is served at '/<file name>'.
+    default : bytes, optional
+        Page served for any path that is not found.
+    latency : float, optional
+        Seconds each response is delayed to imitate a remote server.
+    """
+    def __init__(self, pages=None, directory=None, default=None, latency=0.05) -> None:
+        self.pages = dict(pages or {})
+        if directory is not None:
+            for name in os.listdir(directory):
+                with open(os.path.join(directory, name), 'rb') as f:
+                    self.pages['/' + name] = f.read()
+        self.default = default
+        self.latency = latency
+        self.requests = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                body = stub.pages.get(self.path, stub.default)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+DIVISIONS = ['AFC East', 'AFC North', 'AFC South', 'AFC West', 'NFC East', 'NFC North', 'NFC South', 'NFC West']
+
+
+def _stat_row(rng, i, team, stats, team_header=False):
+    if team_header:
+        cells = [f'<th scope="row" data-stat="team"><a href="/teams/{team}/2021.htm">{team.upper()} Team</a></th>']
+    else:
+        cells = [f'<th scope="row" class="right" data-stat="ranker">{i+1}</th>',
+                 f'<td data-stat="team"><a href="/teams/{team}/2021.htm">{team.upper()} Team</a></td>']
+    for stat, kind in stats:
+        if kind == 'pct':
+            value = f'{rng.uniform(20, 80):.1f}%'
+        elif kind == 'time':
+            value = f'{rng.randint(1, 3)}:{rng.randint(0, 59):02}'
+        elif kind == 'float':
+            value = f'{rng.uniform(0, 10):.1f}'
+        else:
+            value = str(rng.randint(0, 600))
+        cells.append(f'<td data-stat="{stat}">{value}</td>')
+    return f'<tr data-row="{i}">' + ''.join(cells) + '</tr>'
+
+
+def stats_table(table_id, caption, stats, seed=0, commented=False):
+    """Build a team stats table (offense or defense) with a summary row at the end. The advanced
+       defense table has the team as the row header instead of a rank."""
+    rng = random.Random(seed)
+    team_header = table_id == 'advanced_defense'
+    rows = [_stat_row(rng, i, team, stats, team_header) for i, team in enumerate(TEAMS)]
+    rows.append('<tr><th data-stat="ranker"></th><td data-stat="team">Avg Team</td>'
+                + ''.join(f'<td data-stat="{stat}">0</td>' for stat, _ in stats) + '</tr>')
+    header = ''.join(f'<th data-stat="{stat}">{stat}</th>' for stat, _ in stats)
+    table = (f'<table class="sortable stats_table" id="{table_id}"><caption>{caption}</caption>'
+             f'<thead><tr><th data-stat="ranker">Rk</th><th data-stat="team">Tm</th>{header}</tr></thead>'
+             '<tbody>' + ''.join(rows) + '</tbody></table>')
+    if commented:
+        table = f'<div class="placeholder"></div>\n<!--\n{table}\n-->'
+    return f'<div class="table_wrapper" id="all_{table_id}">{table}</div>'
+
+
+OFFENSE_TABLES = [
+    ('team_stats', 'Team Offense Table', [('g', 'int'), ('points', 'int'), ('total_yards', 'int'),
+                                           ('plays_offense', 'int'), ('yds_per_play_offense', 'float'),
+                                           ('turnovers', 'int'), ('pass_cmp', 'int'), ('pass_yds', 'int')]),
+    ('passing', 'Team Passing Table', [('g', 'int'), ('pass_cmp', 'int'), ('pass_att', 'int'),
+                                       ('pass_cmp_perc', 'float'), ('pass_yds', 'int'), ('pass_td', 'int')]),
+    ('rushing', 'Team Rushing Table', [('g', 'int'), ('rush_att', 'int'), ('rush_yds', 'int'),
+                                       ('rush_td', 'int'), ('rush_yds_per_att', 'float')]),
+    ('team_conversions', 'Team Conversions Table', [('g', 'int'), ('third_down_att', 'int'),
+                                                     ('third_down_success', 'int'), ('third_down_pct', 'pct')]),
+    ('drives', 'Team Drives Table', [('g', 'int'), ('drives', 'int'), ('play_count_tip', 'float'),
+                                     ('time_avg', 'time'), ('points_avg', 'float')]),
+]
+
+DEFENSE_TABLES = [
+    ('team_stats', 'Team Defense Table', [('g', 'int'), ('points', 'int'), ('total_yards', 'int'),
+                                           ('plays_offense', 'int'), ('yds_per_play_offense', 'float'),
+                                           ('turnovers', 'int')]),
+    ('passing', 'Team Pass Defense Table', [('g', 'int'), ('pass_cmp', 'int'), ('pass_att', 'int'),
+                                            ('pass_cmp_perc', 'float'), ('pass_yds', 'int')]),
+    ('rushing', 'Team Rush Defense Table', [('g', 'int'), ('rush_att', 'int'), ('rush_yds', 'int')]),
+    ('advanced_defense', 'Team Advanced Defense Table', [('g', 'int'), ('pass_att', 'int'), ('blitz_pct', 'pct'),
+                                                         ('pressures_pct', 'pct'), ('sacks', 'float')]),
+]
+
+
+def stats_page(tables, seed=0, commented=True):
+    """Build an offense or defense page. All tables but the first are in comments, like the live site."""
+    body = ''.join(stats_table(table_id, caption, stats, seed=seed + i, commented=commented and i > 0)
+                   for i, (table_id, caption, stats) in enumerate(tables))
+    return f'<html><body><div id="content">{body}</div></body></html>'.encode()
+
+
+def year_page(seed=0):
+    """Build a season page with the AFC and NFC standings tables."""
+    rng = random.Random(seed)
+    tables = []
+    for conf in ['AFC', 'NFC']:
+        rows = []
+        for d, division in enumerate(DIVISIONS):
+            if not division.startswith(conf):
+                continue
+            rows.append(f'<tr class="thead onecell"><td data-stat="onecell" colspan="13">{division}</td></tr>')
+            for team in TEAMS[d * 4:(d + 1) * 4]:
+                wins = rng.randint(0, 17)
+                rows.append(
+                    f'<tr><th data-stat="team"><a href="/teams/{team}/2021.htm">{team.upper()} Team</a>*</th>'
+                    f'<td data-stat="wins">{wins}</td><td data-stat="losses">{17 - wins}</td>'
+                    f'<td data-stat="ties">0</td><td data-stat="win_loss_perc">{wins / 17:.3f}</td>'
+                    f'<td data-stat="points">{rng.randint(200, 500)}</td>'
+                    f'<td data-stat="points_opp">{rng.randint(200, 500)}</td>'
+                    f'<td data-stat="points_diff">{rng.randint(-150, 150)}</td>'
+                    f'<td data-stat="mov">{rng.uniform(-10, 10):.1f}</td></tr>')
+        tables.append(f'<table class="sortable stats_table" id="{conf}"><caption>{conf} Standings Table</caption>'
+                      '<thead><tr><th data-stat="team">Tm</th><th data-stat="wins">W</th></tr></thead>'
+                      '<tbody>' + ''.join(rows) + '</tbody></table>')
+    return ('<html><body><div id="content">' + ''.join(tables) + '</div></body></html>').encode()
+
+
+def season_page(seed=0):
+    """Build a season page holding both the standings and the (commented) offense tables, like the live site."""
+    standings = year_page(seed).replace(b'</div></body></html>', b'')
+    offense = stats_page(OFFENSE_TABLES, seed).replace(b'<html><body><div id="content">', b'')
+    return standings + offense
+
+
+def boxscore_page(seed=0, n_drives=12):
+    """Build a boxscore page with the scoring table and the (commented) game info, team stats and drives tables."""
+    rng = random.Random(seed)
+
+    def table(table_id, rows, commented=True):
+        html = (f'<div class="table_container" id="div_{table_id}"><table class="stats_table" id="{table_id}">'
+                '<thead><tr><th data-stat="header">Header</th></tr></thead><tbody>' + ''.join(rows) + '</tbody></table></div>')
+        return f'<div id="all_{table_id}"><!--\n{html}\n--></div>' if commented else html
+
+    scoring, vis, home = [], 0, 0
+    for quarter in range(1, 5):
+        for play in range(rng.randint(0, 3)):
+            points = rng.choice([3, 7])
+            vis, home = (vis + points, home) if rng.random() < 0.5 else (vis, home + points)
+            scoring.append(f'<tr><th data-stat="quarter">{quarter if play == 0 else ""}</th>'
+                           f'<td data-stat="qtr_time_remain">{rng.randint(0, 14)}:{rng.randint(0, 59):02}</td>'
+                           f'<td data-stat="team">{rng.choice(["Bills", "Chiefs"])}</td>'
+                           f'<td data-stat="description">Play {play} of quarter {quarter}</td>'
+                           f'<td data-stat="vis_team_score">{vis}</td><td data-stat="home_team_score">{home}</td></tr>')
+
+    info = {'Won Toss': 'Chiefs', 'Roof': rng.choice(['outdoors', 'dome']), 'Surface': 'grass',
+            'Duration': f'3:{rng.randint(0, 59):02}', 'Attendance': f'{rng.randint(40, 80)},{rng.randint(0, 999):03}',
+            'Weather': '55 degrees, wind 8 mph', 'Vegas Line': f'Kansas City Chiefs -{rng.randint(1, 20) / 2}',
+            'Over/Under': f'{rng.randint(70, 120) / 2} ({rng.choice(["over", "under"])})'}
+    game_info = [f'<tr><th data-stat="info">{name}</th><td data-stat="stat">{value}</td></tr>' for name, value in info.items()]
+
+    def line(*values):
+        return '-'.join(str(value) for value in values)
+    stats = {'First Downs': lambda: rng.randint(10, 30),
+             'Rush-Yds-TDs': lambda: line(rng.randint(15, 35), rng.randint(-5, 200), rng.randint(0, 3)),
+             'Cmp-Att-Yd-TD-INT': lambda: line(rng.randint(10, 30), rng.randint(25, 45), rng.randint(100, 400),
+                                               rng.randint(0, 4), rng.randint(0, 3)),
+             'Sacked-Yards': lambda: line(rng.randint(0, 5), rng.randint(0, 40)),
+             'Net Pass Yards': lambda: rng.randint(100, 400), 'Total Yards': lambda: rng.randint(200, 550),
+             'Fumbles-Lost': lambda: line(rng.randint(0, 3), rng.randint(0, 2)), 'Turnovers': lambda: rng.randint(0, 4),
+             'Penalties-Yards': lambda: line(rng.randint(2, 12), rng.randint(10, 120)),
+             'Third Down Conv.': lambda: line(rng.randint(2, 8), rng.randint(9, 16)),
+             'Fourth Down Conv.': lambda: line(rng.randint(0, 2), rng.randint(2, 4)),
+             'Time of Possession': lambda: f'{rng.randint(25, 35)}:{rng.randint(0, 59):02}'}
+    team_stats = [f'<tr><th data-stat="stat">{name}</th><td data-stat="vis_stat">{value()}</td>'
+                  f'<td data-stat="home_stat">{value()}</td></tr>' for name, value in stats.items()]
+
+    def drives():
+        return [f'<tr><th data-stat="drive_num">{i + 1}</th><td data-stat="quarter">{1 + i * 4 // n_drives}</td>'
+                f'<td data-stat="time_start">{rng.randint(0, 14)}:{rng.randint(0, 59):02}</td>'
+                f'<td data-stat="start_at">KAN {rng.randint(1, 50)}</td><td data-stat="play_count_tip">{rng.randint(1, 15)}</td>'
+                f'<td data-stat="time_total">{rng.randint(0, 8)}:{rng.randint(0, 59):02}</td>'
+                f'<td data-stat="net_yds">{rng.randint(-10, 80)}</td>'
+                f'<td data-stat="end_event">{rng.choice(["Punt", "Touchdown", "Field Goal", "Interception"])}</td></tr>'
+                for i in range(n_drives)]
+
+    return ('<html><body><div id="content">' + table('scoring', scoring, commented=False) + table('game_info', game_info)
+            + table('team_stats', team_stats) + table('vis_drives', drives()) + table('home_drives', drives())
+            + '</div></body></html>').encode()
+
+
+def game_scores_page(n_scores=20):
+    """Build the game scores page that links to every score page."""
+    rows = []
+    for i in range(n_scores):
+        win, lose = 10 + i % 30, i % 10
+        rows.append(f'<tr><th data-stat="ranker">{i + 1}</th>'
+                    f'<td data-stat="score"><a href="/boxscores/game_scores_find.cgi?pts_win={win}&amp;pts_lose={lose}">'
+                    f'{win}-{lose}</a></td><td data-stat="counter">{100 + i}</td></tr>')
+    return ('<html><body><div id="content"><table class="sortable stats_table" id="game_scores">'
+            '<thead><tr><th data-stat="ranker">Rk</th></tr></thead><tbody>' + ''.join(rows) +
+            '</tbody></table></div></body></html>').encode()
+
+
+def synthetic_corpus(path, n_scores=20, games_per_page=200, seasons=(2019, 2020, 2021)):
+    """Write a replay corpus of synthetic pages at the live urls, for running the scrapers offline."""
+    from replay import Corpus
+
+    site = 'https://www.pro-football-reference.com'
+    corpus = Corpus(path)
+    corpus.add(f'{site}/boxscores/game-scores.htm', game_scores_page(n_scores))
+    for i in range(n_scores):
+        win, lose = 10 + i % 30, i % 10
+        corpus.add(f'{site}/boxscores/game_scores_find.cgi?pts_win={win}&pts_lose={lose}', score_page(games_per_page, seed=i))
+    for season in seasons:
+        corpus.add(f'{site}/years/{season}/', season_page(season))
+        corpus.add(f'{site}/years/{season}/opp.htm', stats_page(DEFENSE_TABLES, season))
+    corpus.save()
+    return corpus
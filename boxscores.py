@@ -0,0 +1,345 @@
+import os
+import re
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from fetch import Fetcher
+from metrics import default_metrics, timed
+from schemas import BOXSCORE_DRIVES, BOXSCORE_GAMES, BOXSCORE_SCORING, BOXSCORE_TEAM_STATS, convert
+from storage import GameArchive, PARTITIONING
+from tables import iter_tables
+
+# Default location of the boxscore tables, relative to where the scrapers are run
+BOXSCORES_PATH = 'data/boxscores'
+
+# Ids of the boxscore page tables, all but the scoring table ship inside HTML comments
+PAGE_TABLES = ('scoring', 'game_info', 'team_stats', 'home_drives', 'vis_drives')
+
+# Stored tables: declared columns and the key of each row
+SCHEMAS = {'games': BOXSCORE_GAMES, 'team_stats': BOXSCORE_TEAM_STATS, 'scoring': BOXSCORE_SCORING,
+           'drives': BOXSCORE_DRIVES}
+KEYS = {'games': ['boxscore'], 'team_stats': ['boxscore', 'side'], 'scoring': ['boxscore', 'play'],
+        'drives': ['boxscore', 'side', 'drive_num']}
+
+# Rows of the game info table and the column they go in
+GAME_INFO = {'Won Toss': 'won_toss', 'Roof': 'roof', 'Surface': 'surface', 'Duration': 'duration_minutes',
+             'Attendance': 'attendance', 'Weather': 'weather', 'Vegas Line': 'vegas_line', 'Over/Under': 'over_under'}
+
+# Rows of the team stats table and the columns their dash separated values go in
+TEAM_STATS = {'First Downs': ['first_downs'], 'Rush-Yds-TDs': ['rush_att', 'rush_yds', 'rush_td'],
+              'Cmp-Att-Yd-TD-INT': ['pass_cmp', 'pass_att', 'pass_yds', 'pass_td', 'pass_int'],
+              'Sacked-Yards': ['sacked', 'sacked_yds'], 'Net Pass Yards': ['net_pass_yds'],
+              'Total Yards': ['total_yds'], 'Fumbles-Lost': ['fumbles', 'fumbles_lost'], 'Turnovers': ['turnovers'],
+              'Penalties-Yards': ['penalties', 'penalties_yds'],
+              'Third Down Conv.': ['third_down_conv', 'third_down_att'],
+              'Fourth Down Conv.': ['fourth_down_conv', 'fourth_down_att'], 'Time of Possession': ['possession']}
+
+# Drive table columns and the names they are stored as
+DRIVE_COLUMNS = {'drive_num': 'drive_num', 'quarter': 'quarter', 'time_start': 'time_start',
+                 'start_at': 'start_at', 'play_count_tip': 'plays', 'time_total': 'duration',
+                 'net_yds': 'net_yds', 'end_event': 'result'}
+
+_BOXSCORE_ID = re.compile(r'/boxscores/(\d{4})(\d{2})(\d{2})\d([a-z0-9]{3})\.htm')
+
+
+def parse_boxscore(url, content):
+    """
+    Extract the scoring plays, game info (with the betting line), team stats and drives of a
+    boxscore page. The tables are read out of the HTML comments, no browser is needed.
+
+    Returns a dict of the 'games', 'team_stats', 'scoring' and 'drives' rows of the page, each
+    row a dict of cell text keyed by column and the boxscore url. Turn them into typed frames
+    with boxscore_frames().
+
+    Boxscore pages are only linked once a game is final, so a page without the scoring table
+    (e.g. an error or placeholder page) gives no rows at all and the boxscore is fetched again
+    by the next scrape.
+
+    Parameters
+    ----------
+    url : str
+        Url of the boxscore page.
+    content : bytes, str or bs4.BeautifulSoup
+        Page content.
+    """
+    start = time.perf_counter()
+    tables = {table.id: table.body() for table in iter_tables(content, ids=PAGE_TABLES)}
+    rows = {'games': [], 'team_stats': [], 'scoring': [], 'drives': []}
+    if 'scoring' not in tables:
+        default_metrics().record_parse('boxscore', 'page', time.perf_counter() - start, 0)
+        return rows
+
+    # One row of game info, with the betting line split into its parts
+    game = {'boxscore': url}
+    for row in _rows(tables.get('game_info')):
+        column = GAME_INFO.get(row.get('info'))
+        if column is not None:
+            game[column] = row.get('stat')
+    if 'vegas_line' in game:
+        line = re.match(r'^(.*\S)\s+(-?\d+(?:\.\d+)?)$', game['vegas_line'].strip())
+        if line is not None:
+            game['favorite'], game['spread'] = line.groups()
+        elif game['vegas_line'].strip() == 'Pick':
+            game['spread'] = '0'
+    if 'over_under' in game:
+        total = re.match(r'^(\d+(?:\.\d+)?)\s*(?:\((\w+)\))?', game['over_under'].strip())
+        if total is not None:
+            game['over_under'], game['over_under_result'] = total.group(1), total.group(2)
+    rows['games'].append(game)
+
+    # Team stats, one row per side
+    sides = {'vis': {'boxscore': url, 'side': 'vis'}, 'home': {'boxscore': url, 'side': 'home'}}
+    for row in _rows(tables.get('team_stats')):
+        columns = TEAM_STATS.get(row.get('stat'))
+        if columns is None:
+            continue
+        for side in sides:
+            # '20--5-0' is 20, -5 and 0
+            text = row.get(f'{side}_stat', '').strip()
+            values = [text] if len(columns) == 1 else re.split(r'(?<=\d)-', text)
+            if len(values) == len(columns):
+                sides[side].update(zip(columns, values))
+    if len(sides['vis']) > 2 or len(sides['home']) > 2:
+        rows['team_stats'].extend(sides.values())
+
+    # Scoring plays, the quarter is only on the first play of each quarter
+    quarter = None
+    for play, row in enumerate(_rows(tables.get('scoring'))):
+        quarter = row.get('quarter') or quarter
+        rows['scoring'].append({'boxscore': url, 'play': str(play), 'quarter': quarter,
+                                'time_remaining': row.get('qtr_time_remain'), 'team': row.get('team'),
+                                'description': row.get('description'), 'vis_score': row.get('vis_team_score'),
+                                'home_score': row.get('home_team_score')})
+
+    # Drives of both teams
+    for side in ('vis', 'home'):
+        for row in _rows(tables.get(f'{side}_drives')):
+            drive = {'boxscore': url, 'side': side}
+            drive.update({name: row.get(stat) for stat, name in DRIVE_COLUMNS.items()})
+            rows['drives'].append(drive)
+
+    default_metrics().record_parse('boxscore', 'page', time.perf_counter() - start,
+                                   sum(len(table) for table in rows.values()))
+    return rows
+
+
+def _rows(table):
+    """Rows of a table with at least one cell, nothing if the page didn't have the table."""
+    if table is None:
+        return []
+    return [row for row in table.rows() if any(value.strip() for value in row.values())]
+
+
+def boxscore_frames(rows, games=None):
+    """
+    Turn the rows of parse_boxscore() into typed frames with the season of each boxscore and
+    the team ids of each side.
+
+    Parameters
+    ----------
+    rows : dict of list
+        Rows of each table, e.g. the parse_boxscore() rows of several pages added together.
+    games : pd.DataFrame, optional
+        Games with boxscore, winner_id and loser_id columns (e.g. GameArchive().load()), used to
+        find the team id of the visitors. The home team id is part of the boxscore url.
+    """
+    frames = {}
+    for name, schema in SCHEMAS.items():
+        table = rows.get(name, [])
+        columns = {column: [row.get(column) for row in table] for column in ['boxscore'] + list(schema)}
+        frame = pd.DataFrame({column: convert(values, schema.get(column, 'str'))
+                              for column, values in columns.items()})
+        frames[name] = frame
+
+    # Date, season and home team are part of the boxscore id
+    for name, frame in frames.items():
+        parts = frame['boxscore'].str.extract(_BOXSCORE_ID)
+        dates = pd.to_datetime(parts[0] + parts[1] + parts[2], format='%Y%m%d', errors='coerce')
+        frame.insert(1, 'season', (dates.dt.year - (dates.dt.month < 8)).astype('Int16'))
+        if name == 'games':
+            frame.insert(2, 'game_date', dates)
+            frame['home_id'] = pd.Categorical(parts[3])
+
+    # The visitors are whichever team of the game isn't home
+    if games is not None and {'boxscore', 'winner_id', 'loser_id'} <= set(games.columns):
+        teams = games.drop_duplicates('boxscore').set_index('boxscore')[['winner_id', 'loser_id']].astype(object)
+        found = teams.reindex(frames['games']['boxscore'])
+        home = frames['games']['home_id'].astype(object).to_numpy()
+        vis = np.where(found['winner_id'].to_numpy() == home, found['loser_id'].to_numpy(), found['winner_id'].to_numpy())
+        frames['games']['vis_id'] = pd.Categorical(vis)
+
+    ids = frames['games'].set_index('boxscore')[['home_id', 'vis_id']].astype(object)
+    for name in ('team_stats', 'drives'):
+        frame = frames[name]
+        found = ids.reindex(frame['boxscore'])
+        frame['team_id'] = pd.Categorical(np.where(frame['side'].astype(object) == 'home',
+                                                   found['home_id'].to_numpy(), found['vis_id'].to_numpy()))
+    return frames
+
+
+class BoxscoreStore:
+    """
+    Per-game, per-team, scoring play and drive tables of boxscore pages, stored as parquet
+    partitioned by season. Every table has the boxscore url as its game key.
+
+    Parameters
+    ----------
+    path : str, optional
+        Folder the tables are kept in, one sub-folder per table.
+    """
+    def __init__(self, path=BOXSCORES_PATH) -> None:
+        self.path = path
+
+    def exists(self, table='games'):
+        """Return True if any rows of table have been stored."""
+        path = os.path.join(self.path, table)
+        return os.path.isdir(path) and any(name.startswith('season=') for name in os.listdir(path))
+
+    def boxscores(self):
+        """Return the set of boxscores that are stored."""
+        if not self.exists():
+            return set()
+        return set(self.load('games', columns=['boxscore'])['boxscore'])
+
+    def append(self, frames):
+        """
+        Store the frames of boxscore_frames(), skipping boxscores that are already stored and
+        boxscores without any scoring, team stats or drive rows. Returns the number of games added.
+
+        Parameters
+        ----------
+        frames : dict of pd.DataFrame
+            Frame of each table.
+        """
+        stored = self.boxscores()
+        details = set().union(*(frames[table]['boxscore'] for table in ('scoring', 'team_stats', 'drives')))
+        games = frames['games']
+        new = games[~games['boxscore'].isin(stored) & games['boxscore'].isin(details)].drop_duplicates('boxscore')
+        keep = set(new['boxscore'])
+
+        # The games table goes last, so a game is only counted as stored once its details are
+        name = f'part-{uuid.uuid4().hex}-{{i}}.parquet'
+        for table in ('team_stats', 'scoring', 'drives', 'games'):
+            frame = frames[table]
+            frame = frame[frame['boxscore'].isin(keep) & frame['season'].notna()]
+            if not len(frame):
+                continue
+            frame = frame.astype({'season': 'int16'})
+            data = pa.Table.from_pandas(frame.reset_index(drop=True), schema=_arrow_schema(table, frame),
+                                        preserve_index=False)
+            ds.write_dataset(data, os.path.join(self.path, table), format='parquet', partitioning=PARTITIONING,
+                             basename_template=name, existing_data_behavior='overwrite_or_ignore')
+        return len(new)
+
+    def load(self, table='games', seasons=None, columns=None):
+        """
+        Load a stored table.
+
+        Parameters
+        ----------
+        table : str, optional
+            'games', 'team_stats', 'scoring' or 'drives'.
+        seasons : int or list of int, optional
+            Seasons to load. Only the folders of these seasons are read.
+        columns : list of str, optional
+            Columns to load, the key of the table is always loaded.
+        """
+        if not self.exists(table):
+            raise FileNotFoundError(f'No {table} are stored in {self.path}.')
+
+        if isinstance(seasons, (int, float)):
+            seasons = [int(seasons)]
+        predicate = None if seasons is None else ds.field('season').isin([int(season) for season in seasons])
+        if columns is not None:
+            columns = KEYS[table] + [column for column in columns if column not in KEYS[table]]
+
+        dataset = ds.dataset(os.path.join(self.path, table), format='parquet', partitioning=PARTITIONING)
+        frame = dataset.to_table(columns=columns, filter=predicate).to_pandas()
+
+        # Details written by a run that stopped before its games are written again by the next run
+        frame = frame.drop_duplicates(KEYS[table], keep='last')
+        order = [key for key in ['game_date', 'boxscore', 'side', 'play', 'drive_num'] if key in frame]
+        return frame.sort_values(order, kind='stable').reset_index(drop=True)
+
+
+def _arrow_schema(table, frame):
+    """Schema of a stored table from its declared columns, so every part has the same types."""
+    types = {'int': pa.int16(), 'float': pa.float32(), 'pct': pa.float32(), 'time': pa.float32(),
+             'category': pa.dictionary(pa.int32(), pa.string()), 'str': pa.string()}
+    fields = []
+    for column in frame.columns:
+        if column == 'season':
+            fields.append(pa.field('season', pa.int16()))
+        elif column == 'game_date':
+            fields.append(pa.field('game_date', pa.timestamp('ns')))
+        else:
+            fields.append(pa.field(column, types[SCHEMAS[table].get(column, 'str')]))
+    return pa.schema(fields)
+
+
+def iter_boxscores(urls, max_workers=4, requests_per_minute=20):
+    """Fetch and parse boxscore pages, yielding (url, rows) as each page is parsed."""
+    with Fetcher(max_workers=max_workers, requests_per_minute=requests_per_minute) as fetcher:
+        yield from fetcher.map(urls, parse=parse_boxscore)
+
+
+@timed('scrape_boxscores')
+def scrape_boxscores(games=None, store=None, max_workers=4, requests_per_minute=20, batch_size=100, limit=None):
+    """
+    Follow the boxscore link of every game and store the boxscore tables, skipping boxscores
+    that are already stored. Returns the number of games added.
+
+    Pages are written every batch_size boxscores, so a backfill that stops keeps what it has
+    and the next run only fetches the rest. Progress is printed with the page rate and the
+    time left at that rate. Pages without the boxscore tables aren't stored, so they are
+    fetched again by the next run.
+
+    Parameters
+    ----------
+    games : pd.DataFrame, optional
+        Games with boxscore, winner_id and loser_id columns. Defaults to the game archive.
+    store : BoxscoreStore, optional
+        Where the tables are stored. Defaults to data/boxscores.
+    max_workers : int, optional
+        Boxscores fetched at the same time.
+    requests_per_minute : int, float, optional
+        Request budget shared by all workers.
+    batch_size : int, optional
+        Boxscores written at a time.
+    limit : int, optional
+        Only fetch this many boxscores, e.g. to backfill in slices.
+    """
+    if games is None:
+        games = GameArchive().load(columns=['game_date', 'boxscore', 'winner_id', 'loser_id'])
+    store = BoxscoreStore() if store is None else store
+
+    # Each boxscore once, newest first, and only the ones that aren't stored
+    stored = store.boxscores()
+    urls = games.sort_values('game_date', ascending=False)['boxscore'] if 'game_date' in games else games['boxscore']
+    urls = [url for url in pd.unique(urls.dropna()) if url not in stored][:limit]
+
+    added, failed, batch = 0, 0, {}
+    start = time.perf_counter()
+    for n, (url, rows) in enumerate(iter_boxscores(urls, max_workers, requests_per_minute)):
+        failed += not rows['games']
+        for name, table in rows.items():
+            batch.setdefault(name, []).extend(table)
+        if (n + 1) % batch_size == 0 or n + 1 == len(urls):
+            with default_metrics().stage('boxscore_write'):
+                added += store.append(boxscore_frames(batch, games))
+            batch = {}
+
+        rate = (n + 1) / (time.perf_counter() - start)
+        print(f'Retrieved {n + 1} of {len(urls)} boxscores, {rate * 60:.0f}/min, '
+              f'{(len(urls) - n - 1) / rate / 60:.0f} min left', end='\r')
+    if urls:
+        print()
+
+    default_metrics().increment('boxscores_added', added)
+    default_metrics().increment('boxscores_failed', failed)
+    return added
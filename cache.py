@@ -0,0 +1,281 @@
+import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from metrics import default_metrics
+
+# Default location of the cache, relative to where the scrapers are run
+DEFAULT_CACHE_DIR = os.environ.get('NFL_HTTP_CACHE', 'data/http_cache')
+DEFAULT_MAX_BYTES = 2 * 1024**3  # 2 GB
+
+# TTLs in seconds, None means the page never expires
+CURRENT_SEASON_TTL = 6 * 60 * 60
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def default_ttl(url, fetched_at=None):
+    """
+    Return how long a cached copy of url stays fresh.
+
+    Boxscores and pages of seasons that were over when the copy was fetched never change so
+    they never expire. Pages fetched during their season get a short TTL, even once the season
+    is over, so the final version replaces them. Everything else (e.g. game score pages) is
+    kept for a day.
+
+    Parameters
+    ----------
+    url : str
+        Url of the page.
+    fetched_at : float, optional
+        Unix time the copy was fetched. Defaults to now.
+    """
+    if re.search(r'/boxscores/\d{9}[a-z]{3}\.htm', url):
+        return None
+
+    season = re.search(r'/years/(\d{4})/', url)
+    if season is not None:
+        return None if int(season.group(1)) < _current_season(fetched_at) else CURRENT_SEASON_TTL
+
+    return DEFAULT_TTL
+
+
+class HTTPCache:
+    """
+    Content-addressed on-disk cache of web pages keyed by url.
+
+    Page bodies are stored once per unique content under objects/, and an sqlite index maps each
+    url to its body along with the validators (ETag/Last-Modified) used to revalidate stale copies.
+    Least recently used pages are evicted once the bodies exceed max_bytes.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Folder the cache is kept in. Created if it does not exist.
+    max_bytes : int, optional
+        Size cap of all stored page bodies.
+    ttl : callable, optional
+        Called as ttl(url, fetched_at) with the unix time the copy was fetched and returns the
+        seconds a page stays fresh, or None if it never expires.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl=default_ttl) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                        'url TEXT PRIMARY KEY, digest TEXT, size INTEGER, fetched_at REAL, '
+                        'accessed_at REAL, etag TEXT, last_modified TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+        self.db.commit()
+
+    def get(self, url, session=None, limiter=None, timeout=30, max_age=None):
+        """
+        Return the content of url, only going to the network if the cached copy is missing or stale.
+
+        Stale copies are revalidated with If-None-Match/If-Modified-Since so an unchanged page
+        is not downloaded again.
+
+        Parameters
+        ----------
+        url : str
+            Page to get.
+        session : requests.Session, optional
+            Session used for network requests.
+        limiter : fetch.RateLimiter, optional
+            Rate limiter acquired before any network request. Cache hits do not use a token.
+        timeout : int, float, optional
+            Seconds to wait on the request.
+        max_age : int, float, optional
+            Overrides the TTL of url. Use 0 to always revalidate the cached copy.
+        """
+        metrics = default_metrics()
+        start = time.perf_counter()
+        entry = self._entry(url)
+        if entry is not None and self._is_fresh(url, entry, max_age):
+            content = self._read(entry['digest'])
+            if content is not None:
+                self._touch(url)
+                metrics.record_fetch(url, time.perf_counter() - start, len(content), 'hit')
+                return content
+            entry = None  # Body went missing, fetch again
+
+        # Add validators to revalidate a stale copy
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if session is None:
+            import requests  # Only imported once a page is requested, so reading the cache stays light
+            session = requests
+
+        page, seconds = _request(url, session, limiter, timeout, headers)
+        if page.status_code == 304 and entry is not None:
+            content = self._read(entry['digest'])
+            if content is not None:
+                self._touch(url, fetched=True)
+                metrics.record_fetch(url, seconds, len(content), 'revalidated')
+                return content
+            # Cached body is gone, request it unconditionally
+            page, more = _request(url, session, limiter, timeout)
+            seconds += more
+
+        # Only keep successful responses, errors (e.g. 429 or 404) are raised instead of parsed
+        if page.status_code == 200:
+            self.store(url, page.content, page.headers)
+        else:
+            metrics.increment(f'http_{page.status_code}')
+        metrics.record_fetch(url, seconds, len(page.content), 'miss')
+        page.raise_for_status()
+        return page.content
+
+    def lookup(self, url):
+        """Return the cached content of url if it is fresh, otherwise None."""
+        entry = self._entry(url)
+        if entry is None or not self._is_fresh(url, entry):
+            return None
+        content = self._read(entry['digest'])
+        if content is not None:
+            self._touch(url)
+        return content
+
+    def store(self, url, content, headers=None):
+        """Add (or replace) the content of url in the cache."""
+        headers = headers or {}
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+
+        # Write the body once per unique content
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+        now = time.time()
+        with self.lock:
+            old = self._entry(url)
+            self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (url, digest, len(content), now, now,
+                             headers.get('ETag'), headers.get('Last-Modified')))
+            self.db.commit()
+            if old is not None and old['digest'] != digest:
+                self._drop_object(old['digest'])
+            self.evict()
+
+    def evict(self):
+        """Remove least recently used pages until the stored bodies fit within max_bytes."""
+        with self.lock:
+            total = self._total_bytes()
+            if total <= self.max_bytes:
+                return
+
+            rows = self.db.execute('SELECT url, digest, size FROM entries ORDER BY accessed_at').fetchall()
+            for url, digest, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.db.execute('DELETE FROM entries WHERE url = ?', (url,))
+                # A body shared with other urls only frees space once its last url is dropped
+                if self._drop_object(digest):
+                    total -= size
+            self.db.commit()
+
+    def __contains__(self, url):
+        return self._entry(url) is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    ## ----------- Internal helpers ------------ ##
+    def _entry(self, url):
+        with self.lock:
+            row = self.db.execute('SELECT digest, size, fetched_at, etag, last_modified '
+                                  'FROM entries WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(['digest', 'size', 'fetched_at', 'etag', 'last_modified'], row))
+
+    def _is_fresh(self, url, entry, max_age=None):
+        ttl = self.ttl(url, entry['fetched_at']) if max_age is None else max_age
+        return ttl is None or (time.time() - entry['fetched_at']) < ttl
+
+    def _touch(self, url, fetched=False):
+        now = time.time()
+        with self.lock:
+            if fetched:
+                self.db.execute('UPDATE entries SET accessed_at = ?, fetched_at = ? WHERE url = ?', (now, now, url))
+            else:
+                self.db.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (now, url))
+            self.db.commit()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _read(self, digest):
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _drop_object(self, digest):
+        # Bodies can be shared by several urls, only delete unreferenced ones. Returns True if
+        # the body is no longer referenced
+        refs = self.db.execute('SELECT COUNT(*) FROM entries WHERE digest = ?', (digest,)).fetchone()[0]
+        if refs == 0:
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+        return refs == 0
+
+    def _total_bytes(self):
+        # Shared bodies only take up space once
+        row = self.db.execute('SELECT SUM(size) FROM (SELECT DISTINCT digest, size FROM entries)').fetchone()
+        return row[0] or 0
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Return the cache shared by all scrapers."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        return _default_cache
+
+
+def set_default_cache(cache):
+    """Replace the cache shared by all scrapers (e.g. to point it at another directory)."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
+
+
+def _request(url, session, limiter, timeout, headers=None):
+    """Request url once the rate limiter allows it. Returns the response and the seconds it took."""
+    if limiter is not None:
+        limiter.acquire()
+    start = time.perf_counter()  # Waiting for the rate limiter isn't latency
+    page = session.get(url, headers=headers or {}, timeout=timeout)
+    return page, time.perf_counter() - start
+
+
+def _current_season(at=None):
+    # Same rule as projections.get_current_season(), kept here to avoid importing selenium
+    today = datetime.date.today() if at is None else datetime.date.fromtimestamp(at)
+    return today.year - 1 if today.month < 9 else today.year
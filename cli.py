@@ -0,0 +1,288 @@
+"""
+Command line entry point of the scrapers, run from the repository root:
+
+    python cli.py sync                      Add new games to the game archive
+    python cli.py boxscores --limit 500     Follow the boxscore links of the stored games
+    python cli.py season 2020 2021          Fetch the standings, offense and defense tables of seasons
+    python cli.py export games -o games.csv Export stored games, features, aggregates or combine results
+    python cli.py aggregates                Recompute the season aggregates that are out of date
+    python cli.py reparse score             Re-derive the games from the cached score pages
+    python cli.py serve --season 2021       Serve standings, team stats and projections as JSON
+    python cli.py bench pipeline            Run a benchmark, `python cli.py bench` lists them
+    python cli.py status                    Show what is stored, without touching the network
+
+Only the modules a subcommand needs are imported, and only once it runs, so --help and status
+start without loading pandas, pyarrow or requests.
+"""
+import argparse
+import json
+import os
+import sys
+
+# Default locations of storage.py, boxscores.py, features.py, aggregates.py, combine.py and game_data.py, repeated
+# here so status doesn't have to import pandas and pyarrow to find them
+ARCHIVE_PATH = 'data/games'
+STAGE_PATH = 'data/scrape'
+BOXSCORES_PATH = 'data/boxscores'
+FEATURES_PATH = 'data/features'
+AGGREGATES_PATH = 'data/aggregates'
+COMBINE_PATH = 'data/combine'
+NEXTGEN_PATH = 'data/nextgen'
+METRICS_PATH = 'data/scrape_metrics.json'
+
+BENCHMARKS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+
+def sync(args):
+    """Add new games to the game archive."""
+    import game_data
+
+    game_data.sync(max_workers=args.workers, requests_per_minute=args.rpm, archive_path=args.archive,
+                   csv=not args.no_csv, metrics_path=args.metrics, profile=args.profile,
+                   aggregates_path=None if args.no_aggregates else AGGREGATES_PATH)
+
+
+def boxscores(args):
+    """Store the boxscore tables of the games in the archive."""
+    import boxscores
+
+    added = boxscores.scrape_boxscores(max_workers=args.workers, requests_per_minute=args.rpm,
+                                       batch_size=args.batch_size, limit=args.limit)
+    print(f'{added} boxscores added to {boxscores.BOXSCORES_PATH}')
+
+
+def season(args):
+    """Fetch the tables of seasons, print the standings or write every table to a folder."""
+    import projections
+
+    frames = projections.load_seasons(args.seasons, max_workers=args.workers, requests_per_minute=args.rpm)
+    if args.out is None:
+        for year, standings in frames['standings'].groupby(level='season'):
+            print(f'{year}\n{standings.droplevel("season").to_string()}\n')
+        return
+
+    os.makedirs(args.out, exist_ok=True)
+    for name in args.tables:
+        frame = frames[name]
+        if frame.columns.nlevels > 1:
+            frame = frame.set_axis(['.'.join(column) for column in frame.columns], axis=1)
+        path = os.path.join(args.out, f'{name}.{args.format}')
+        if args.format == 'csv':
+            frame.to_csv(path)
+        else:
+            frame.to_parquet(path)
+        print(f'{name}: {len(frame)} rows written to {path}')
+
+
+def export(args):
+    """Write stored games, features, aggregates or combine results to csv, json or parquet."""
+    if args.dataset == 'games':
+        from storage import GameArchive
+        frame = GameArchive(args.path or ARCHIVE_PATH).load(seasons=args.seasons, columns=args.columns)
+    elif args.dataset == 'features':
+        from features import FeatureStore
+        frame = FeatureStore(args.path or FEATURES_PATH).load(seasons=args.seasons, columns=args.columns)
+    elif args.dataset in ('records', 'home', 'scores'):
+        from aggregates import AggregateStore
+        frame = AggregateStore(args.path or AGGREGATES_PATH).load(args.dataset, seasons=args.seasons)
+        frame = frame if args.columns is None else frame[args.columns]
+    else:
+        from combine import YearCache
+        frame = YearCache(args.path or COMBINE_PATH).load(years=args.seasons, columns=args.columns)
+
+    out = sys.stdout if args.out in (None, '-') else args.out
+    if args.format == 'csv':
+        frame.to_csv(out, index=False)
+    elif args.format == 'json':
+        frame.to_json(out, orient='records', lines=True, date_format='iso')
+    elif out is sys.stdout:
+        raise SystemExit('parquet needs an output file, use -o')
+    else:
+        frame.to_parquet(out, index=False)
+    if out is not sys.stdout:
+        print(f'{len(frame)} rows written to {out}')
+
+
+def aggregates(args):
+    """Recompute the season aggregates that are out of date with the game archive."""
+    from aggregates import AggregateStore
+    from storage import GameArchive
+
+    store, archive = AggregateStore(args.path or AGGREGATES_PATH), GameArchive(args.archive or ARCHIVE_PATH)
+    seasons = store.build(archive) if args.rebuild else store.refresh(archive)
+    print(f'Aggregates of {len(seasons)} seasons recomputed in {store.path}' if seasons else
+          f'The aggregates in {store.path} are up to date')
+
+
+def reparse(args):
+    """Re-derive a table from the pages in the http cache."""
+    import reparse
+
+    reparse.reparse(args.name, output=args.output, processes=args.processes, chunk_size=args.chunk_size,
+                    restart=args.restart, archive_path=args.archive or ARCHIVE_PATH)
+
+
+def serve(args):
+    """Run the local query service until interrupted."""
+    import service
+
+    service.serve(args.season, host=args.host, port=args.port, archive_path=args.archive or ARCHIVE_PATH,
+                  refresh_interval=args.refresh or None)
+
+
+def bench(args):
+    """Run a benchmark script with the remaining arguments, or list them."""
+    names = benchmark_names()
+    if args.name is None:
+        print('\n'.join(names))
+        return
+    if args.name not in names:
+        raise SystemExit(f'Unknown benchmark {args.name!r}, choose from: {", ".join(names)}')
+
+    import importlib
+    module = importlib.import_module(f'benchmarks.bench_{args.name}')
+    sys.argv = [f'bench {args.name}'] + args.args
+    module.main()
+
+
+def benchmark_names():
+    """Names of the benchmarks/bench_*.py scripts."""
+    if not os.path.isdir(BENCHMARKS_PATH):
+        return []
+    return sorted(name[len('bench_'):-len('.py')] for name in os.listdir(BENCHMARKS_PATH)
+                  if name.startswith('bench_') and name.endswith('.py'))
+
+
+def status(args):
+    """Print what is stored locally. Only reads folder listings, the cache index and json files."""
+    def partitions(path, key):
+        if not os.path.isdir(path):
+            return []
+        return sorted(int(name.split('=')[1]) for name in os.listdir(path) if name.startswith(f'{key}='))
+
+    def size(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+    def describe(name, path, values):
+        span = f'{values[0]}-{values[-1]} ({len(values)})' if values else 'empty'
+        print(f'{name:<12}{span:<20}{size(path) / 1e6:>8.1f} MB  {path}')
+
+    describe('games', ARCHIVE_PATH, partitions(ARCHIVE_PATH, 'season'))
+    describe('boxscores', os.path.join(BOXSCORES_PATH, 'games'), partitions(os.path.join(BOXSCORES_PATH, 'games'), 'season'))
+    describe('features', FEATURES_PATH, partitions(FEATURES_PATH, 'season'))
+    aggregates_manifest = os.path.join(AGGREGATES_PATH, 'manifest.json')
+    if os.path.exists(aggregates_manifest):
+        with open(aggregates_manifest) as f:
+            manifest = json.load(f)
+        describe('aggregates', AGGREGATES_PATH, sorted(int(season) for season in manifest['seasons']))
+    describe('combine', COMBINE_PATH, partitions(COMBINE_PATH, 'year'))
+    if os.path.isdir(NEXTGEN_PATH):
+        for stat in sorted(os.listdir(NEXTGEN_PATH)):
+            path = os.path.join(NEXTGEN_PATH, stat)
+            describe(f'nextgen/{stat}', path, partitions(path, 'year'))
+
+    from cache import DEFAULT_CACHE_DIR, HTTPCache
+    if os.path.exists(os.path.join(DEFAULT_CACHE_DIR, 'index.sqlite')):
+        cache = HTTPCache(DEFAULT_CACHE_DIR)
+        print(f'{"http cache":<12}{f"{len(cache)} pages":<20}{cache._total_bytes() / 1e6:>8.1f} MB  {DEFAULT_CACHE_DIR}')
+
+    # An unfinished game scrape resumes from its checkpoint
+    checkpoint = os.path.join(STAGE_PATH, 'checkpoint.json')
+    if os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            links = json.load(f)['links']
+        print(f'unfinished sync: {len(links)} score pages staged in {STAGE_PATH}')
+
+    if os.path.exists(METRICS_PATH):
+        with open(METRICS_PATH) as f:
+            fetches = json.load(f)['fetch']
+        rate = fetches['cache_hit_rate']
+        print(f'last sync: {fetches["requests"]} requests, {fetches["seconds"]:.1f} s fetching, '
+              f'cache hit rate {"-" if rate is None else f"{rate:.0%}"}')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('sync', help='Add new games to the game archive')
+    command.add_argument('--workers', type=int, default=4, help='Score pages fetched at the same time')
+    command.add_argument('--rpm', type=float, default=None, help='Requests per minute (default: 30)')
+    command.add_argument('--archive', default=None, help=f'Game archive folder (default: {ARCHIVE_PATH})')
+    command.add_argument('--metrics', default=METRICS_PATH, help='File the run metrics are written to')
+    command.add_argument('--no-csv', action='store_true', help="Don't write the dated csv of every game")
+    command.add_argument('--profile', action='store_true', help='Also run cProfile and tracemalloc')
+    command.add_argument('--no-aggregates', action='store_true', help="Don't update the season aggregates")
+    command.set_defaults(func=sync)
+
+    command = commands.add_parser('boxscores', help='Follow the boxscore links of the stored games')
+    command.add_argument('--workers', type=int, default=4, help='Boxscores fetched at the same time')
+    command.add_argument('--rpm', type=float, default=20, help='Requests per minute')
+    command.add_argument('--batch-size', type=int, default=100, help='Boxscores written at a time')
+    command.add_argument('--limit', type=int, default=None, help='Only fetch this many boxscores')
+    command.set_defaults(func=boxscores)
+
+    command = commands.add_parser('season', help='Fetch the standings, offense and defense tables of seasons')
+    command.add_argument('seasons', type=int, nargs='+')
+    command.add_argument('--tables', nargs='+', default=['standings', 'offense', 'defense'],
+                         choices=['standings', 'offense', 'defense'], help='Tables written with --out')
+    command.add_argument('-o', '--out', default=None, help='Folder the tables are written to (default: print)')
+    command.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    command.add_argument('--workers', type=int, default=4, help='Pages fetched at the same time')
+    command.add_argument('--rpm', type=float, default=30, help='Requests per minute')
+    command.set_defaults(func=season)
+
+    command = commands.add_parser('export', help='Export stored games, features, aggregates or combine results')
+    command.add_argument('dataset', choices=['games', 'features', 'records', 'home', 'scores', 'combine'])
+    command.add_argument('--seasons', type=int, nargs='+', default=None, help='Seasons (or combine years)')
+    command.add_argument('--columns', nargs='+', default=None)
+    command.add_argument('--path', default=None, help='Folder the dataset is stored in')
+    command.add_argument('-o', '--out', default=None, help='Output file (default: stdout)')
+    command.add_argument('--format', choices=['csv', 'json', 'parquet'], default='csv')
+    command.set_defaults(func=export)
+
+    command = commands.add_parser('aggregates', help='Recompute the season aggregates that are out of date')
+    command.add_argument('--rebuild', action='store_true', help='Recompute every season')
+    command.add_argument('--path', default=None, help=f'Aggregates folder (default: {AGGREGATES_PATH})')
+    command.add_argument('--archive', default=None, help=f'Game archive folder (default: {ARCHIVE_PATH})')
+    command.set_defaults(func=aggregates)
+
+    command = commands.add_parser('reparse', help='Re-derive a table from the pages in the http cache')
+    command.add_argument('name', nargs='?', default='score', help='Registered parser (default: score)')
+    command.add_argument('-o', '--output', default=None, help='Where the table is written (default: data/reparse/<name>)')
+    command.add_argument('--processes', type=int, default=None, help='Worker processes (default: cpu count)')
+    command.add_argument('--chunk-size', type=int, default=32, help='Pages parsed by a worker at a time')
+    command.add_argument('--restart', action='store_true', help="Don't resume an unfinished reparse")
+    command.add_argument('--archive', default=None, help=f'Game archive folder (default: {ARCHIVE_PATH})')
+    command.set_defaults(func=reparse)
+
+    command = commands.add_parser('serve', help='Serve standings, team stats and projections as JSON')
+    command.add_argument('--season', type=int, default=None, help='Season served (default: current season)')
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=8765)
+    command.add_argument('--archive', default=None, help=f'Game archive folder (default: {ARCHIVE_PATH})')
+    command.add_argument('--refresh', type=float, default=30 * 60, help='Seconds between refreshes, 0 to never refresh')
+    command.set_defaults(func=serve)
+
+    command = commands.add_parser('bench', help='Run a benchmark from benchmarks/')
+    command.add_argument('name', nargs='?', default=None, help='e.g. pipeline for bench_pipeline.py')
+    command.add_argument('args', nargs=argparse.REMAINDER, help='Arguments of the benchmark')
+    command.set_defaults(func=bench)
+
+    command = commands.add_parser('status', help='Show what is stored, without touching the network')
+    command.set_defaults(func=status)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
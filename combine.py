@@ -0,0 +1,411 @@
+import json
+import os
+import re
+import time
+
+import lxml.html
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from fetch import Fetcher
+from metrics import default_metrics, timed
+from schemas import COMBINE, convert
+
+# Every position of a combine class is on one page, pos filters the page
+COMBINE_URL = 'https://nflcombineresults.com/nflcombinedata.php?year={year}&pos=&college='
+COMBINE_PATH = 'data/combine'
+COMBINE_YEARS = (1987, None)
+
+# JSON that the nextgenstats.nfl.com stat boards are rendered from, it is only served with a Referer
+NEXTGEN_URL = 'https://nextgenstats.nfl.com/api/statboard/{stat}?season={year}&seasonType=REG'
+NEXTGEN_HEADERS = {'Referer': 'https://nextgenstats.nfl.com/stats/'}
+NEXTGEN_PATH = 'data/nextgen'
+NEXTGEN_YEARS = (2016, None)
+
+# Per year csv files that Next Gen Stats used to be downloaded to by hand
+NEXTGEN_CSV = 'data/nflng_{year}.csv'
+
+# Seconds a year that was fetched without rows (e.g. a draft class or season that hasn't
+# happened yet) is not fetched again
+EMPTY_TTL = 24 * 60 * 60
+
+YEAR_PARTITIONING = ds.partitioning(pa.schema([('year', pa.int16())]), flavor='hive')
+
+
+class YearCache:
+    """
+    Typed parquet cache of a dataset that is published one year at a time, partitioned by year.
+
+    Each year is stored in its own year=YYYY folder, so loading a few years only reads those
+    folders and only the requested columns are read from each file. Years that were fetched
+    without any rows are recorded with the time of the fetch in _empty.json (which the parquet
+    reader skips), so they aren't fetched again until EMPTY_TTL has passed.
+
+    Parameters
+    ----------
+    path : str
+        Folder the cache is kept in.
+    """
+    def __init__(self, path) -> None:
+        self.path = path
+        self.empty_path = os.path.join(path, '_empty.json')
+
+    def years(self):
+        """Return the sorted list of cached years."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(int(name.split('=')[1]) for name in os.listdir(self.path) if name.startswith('year='))
+
+    def missing(self, years, max_age=EMPTY_TTL):
+        """
+        Return the years that are neither cached nor recently fetched without rows.
+
+        Parameters
+        ----------
+        years : list of int
+            Years that are needed.
+        max_age : int, float, optional
+            Seconds an empty fetch of a year is trusted.
+        """
+        now = time.time()
+        empty = {year for year, fetched_at in self._empty().items() if now - fetched_at < max_age}
+        return sorted(set(years) - set(self.years()) - empty)
+
+    def mark_empty(self, year):
+        """Record that year was fetched now and had no rows."""
+        empty = self._empty()
+        empty[int(year)] = time.time()
+        self._save_empty(empty)
+
+    def _empty(self):
+        if not os.path.exists(self.empty_path):
+            return {}
+        with open(self.empty_path) as f:
+            return {int(year): fetched_at for year, fetched_at in json.load(f).items()}
+
+    def _save_empty(self, empty):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self.empty_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({str(year): fetched_at for year, fetched_at in sorted(empty.items())}, f)
+        os.replace(tmp, self.empty_path)
+
+    def write(self, frame):
+        """
+        Store the rows of frame, replacing the cached rows of its years.
+
+        Parameters
+        ----------
+        frame : pd.DataFrame
+            Rows with a year column.
+        """
+        if not len(frame):
+            return
+        table = pa.Table.from_pandas(frame.reset_index(drop=True), schema=_arrow_schema(frame), preserve_index=False)
+        ds.write_dataset(table, self.path, format='parquet', partitioning=YEAR_PARTITIONING,
+                         basename_template='part-{i}.parquet', existing_data_behavior='delete_matching')
+
+        # Years that have rows now are no longer empty
+        empty, written = self._empty(), {int(year) for year in frame['year'].unique()}
+        if empty.keys() & written:
+            self._save_empty({year: at for year, at in empty.items() if year not in written})
+
+    def load(self, years=None, columns=None, filter=None):
+        """
+        Load cached rows, sorted by year.
+
+        Parameters
+        ----------
+        years : int or list of int, optional
+            Years to load. Only the folders of these years are read. Defaults to all years.
+        columns : list of str, optional
+            Columns to load, the year is always loaded. Defaults to all columns.
+        filter : pyarrow.dataset.Expression, optional
+            Extra row filter, e.g. ds.field('pos').isin(['QB']).
+        """
+        if not self.years():
+            raise FileNotFoundError(f'Nothing is cached in {self.path}.')
+
+        if isinstance(years, (int, float)):
+            years = [int(years)]
+        predicate = None if years is None else ds.field('year').isin([int(year) for year in years])
+        if filter is not None:
+            predicate = filter if predicate is None else predicate & filter
+        if columns is not None:
+            columns = ['year'] + [column for column in columns if column != 'year']
+
+        # Years are scraped separately, so later years may have columns earlier years lack
+        dataset = ds.dataset(self.path, format='parquet', partitioning=YEAR_PARTITIONING)
+        schema = pa.unify_schemas([fragment.physical_schema for fragment in dataset.get_fragments()]
+                                  + [pa.schema([('year', pa.int16())])])
+        dataset = ds.dataset(self.path, format='parquet', partitioning=YEAR_PARTITIONING, schema=schema)
+
+        frame = dataset.to_table(columns=columns, filter=predicate).to_pandas()
+        frame.insert(0, 'year', frame.pop('year'))
+        return frame.sort_values('year', kind='stable').reset_index(drop=True)
+
+
+def fetch_years(cache, urls, parse, max_workers=4, requests_per_minute=30, headers=None, max_age=None):
+    """
+    Fetch the page of every year concurrently, parse it in the worker thread and store each
+    year in the cache as soon as it is parsed. Returns the years that were stored.
+
+    Parameters
+    ----------
+    cache : YearCache
+        Cache the parsed years are stored in.
+    urls : dict
+        Url of each year.
+    parse : callable
+        Called as parse(content, year) and returns the rows of the year as a DataFrame.
+    max_workers : int, optional
+        Number of years fetched at the same time.
+    requests_per_minute : int, float, optional
+        Request budget shared by all workers.
+    headers : dict, optional
+        Headers sent with every request.
+    max_age : int, float, optional
+        Seconds a cached page may be old before it is revalidated, 0 always revalidates.
+        Defaults to the cache's TTL of each page.
+    """
+    years = {url: year for year, url in urls.items()}
+
+    def work(url, content):
+        start = time.perf_counter()
+        frame = parse(content, years[url])
+        default_metrics().record_parse(os.path.basename(cache.path), years[url], time.perf_counter() - start, len(frame))
+        return frame
+
+    stored = []
+    with Fetcher(max_workers=max_workers, requests_per_minute=requests_per_minute, max_age=max_age) as fetcher:
+        fetcher.session.headers.update(headers or {})
+        for url, frame in fetcher.map(urls.values(), parse=work):
+            if len(frame):
+                cache.write(frame)
+                stored.append(years[url])
+            else:
+                cache.mark_empty(years[url])
+                default_metrics().increment('empty_years')
+    return sorted(stored)
+
+
+## ----------- Combine ------------ ##
+@timed('get_combine')
+def get_combine(years=None, positions=('QB',), columns=None, refresh=False, max_workers=4,
+                requests_per_minute=30, path=COMBINE_PATH):
+    """
+    Return NFL Combine results, one row per player. Years that aren't cached are fetched
+    concurrently first. The data returned includes:
+        - year: Year of participation
+        - name: Player Name
+        - college: College attended
+        - pos: Player Position
+        - height: Player Height (inches)
+        - weight: Player Weight (lbs)
+        - wonderlic: Wonderlic Cognitive Ability Test Score (0-50 overall, 20 avg intelligence)
+        - 40_yard: 40 Yard Dash Time (s)
+        - bench_press: Number of 225 lb Repititions
+        - vert_leap: Standing Vertical Jump Height (inches)
+        - broad_jump: Standing Long Jump Distance (inches)
+        - shuttle: 20 Yard Shuttle Time (s)
+        - 3cone: 3-Cone Drill Time (s)
+
+    Parameters
+    ----------
+    years : int or list of int, optional
+        Draft classes to return. Defaults to every class since 1987.
+    positions : list of str, optional
+        Positions to return, None returns every position.
+    columns : list of str, optional
+        Columns to return. Only these columns are read from the cache.
+    refresh : bool, optional
+        Fetch the years again even if they are cached, e.g. for the current class. The pages
+        are revalidated with the site instead of read from the http cache.
+    max_workers : int, optional
+        Number of years fetched at the same time.
+    requests_per_minute : int, float, optional
+        Request budget shared by all workers.
+    path : str, optional
+        Folder the combine cache is kept in.
+    """
+    cache = YearCache(path)
+    years = _years(years, *COMBINE_YEARS)
+
+    missing = years if refresh else cache.missing(years)
+    if missing:
+        urls = {year: COMBINE_URL.format(year=year) for year in missing}
+        fetch_years(cache, urls, parse_combine, max_workers, requests_per_minute, max_age=0 if refresh else None)
+
+    if not cache.years():
+        return pd.DataFrame(columns=list(COMBINE))
+    position = None if positions is None else ds.field('pos').isin(list(positions))
+    return cache.load(years, columns, filter=position)
+
+
+def parse_combine(content, year=None):
+    """
+    Parse the combine table of a nflcombineresults.com page into typed columns.
+
+    Parameters
+    ----------
+    content : bytes or str
+        Page content.
+    year : int, optional
+        Year of the page, used if the table has no year column.
+    """
+    doc = lxml.html.fromstring(content)
+    tables = doc.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " sortable ")]')
+    if not tables:
+        raise LookupError('Unable to find the combine table.')
+    trs = tables[0].xpath('.//tr')
+
+    # First tr is the header row and the last one is the footer
+    header = [_combine_column(cell.text_content()) for cell in trs[0] if cell.tag in ('td', 'th')]
+    rows = [[cell.text_content().strip() for cell in tr if cell.tag in ('td', 'th')] for tr in trs[1:-1]]
+    rows = [row for row in rows if len(row) == len(header)]
+
+    columns = {name: [row[i] for row in rows] for i, name in enumerate(header)}
+    if 'year' not in columns and year is not None:
+        columns['year'] = [str(year)] * len(rows)
+    frame = pd.DataFrame({name: convert(values, COMBINE.get(name)) for name, values in columns.items()})
+    if 'year' in frame:
+        frame['year'] = frame['year'].astype('int16')
+    return frame
+
+
+def _combine_column(text):
+    """'Height (in)' -> 'height'"""
+    return text.strip().lower().replace(' (in)', '').replace(' (lbs)', '').replace(' ', '_')
+
+
+## ----------- Next Gen Stats ------------ ##
+@timed('get_nextgen')
+def get_nextgen(years=None, stat='passing', columns=None, refresh=False, max_workers=4,
+                requests_per_minute=30, path=NEXTGEN_PATH):
+    """
+    Return Next Gen Stats regular season stat boards, one row per player and year. Years that
+    aren't cached are fetched concurrently first.
+
+    Parameters
+    ----------
+    years : int or list of int, optional
+        Seasons to return. Defaults to every season since 2016.
+    stat : str, optional
+        Stat board: 'passing', 'rushing' or 'receiving'.
+    columns : list of str, optional
+        Columns to return. Only these columns are read from the cache.
+    refresh : bool, optional
+        Fetch the years again even if they are cached, e.g. for the current season. The pages
+        are revalidated with the site instead of read from the http cache.
+    max_workers : int, optional
+        Number of years fetched at the same time.
+    requests_per_minute : int, float, optional
+        Request budget shared by all workers.
+    path : str, optional
+        Folder the Next Gen Stats caches are kept in, one per stat board.
+    """
+    cache = YearCache(os.path.join(path, stat))
+    years = _years(years, *NEXTGEN_YEARS)
+
+    missing = years if refresh else cache.missing(years)
+    if missing:
+        urls = {year: NEXTGEN_URL.format(stat=stat, year=year) for year in missing}
+        fetch_years(cache, urls, parse_nextgen, max_workers, requests_per_minute, headers=NEXTGEN_HEADERS,
+                    max_age=0 if refresh else None)
+
+    if not cache.years():
+        return pd.DataFrame(columns=['year'])
+    return cache.load(years, columns)
+
+
+def parse_nextgen(content, year=None):
+    """
+    Flatten a Next Gen Stats stat board into typed columns, e.g. player.displayName becomes
+    player_display_name.
+
+    Parameters
+    ----------
+    content : bytes or str
+        JSON of the stat board.
+    year : int, optional
+        Season of the stat board, used if the rows have no season.
+    """
+    data = json.loads(content)
+    frame = pd.json_normalize(data.get('stats', []), sep='_')
+    frame.columns = [_snake_case(column) for column in frame.columns]
+    if 'year' not in frame:
+        frame.insert(0, 'year', frame.pop('season') if 'season' in frame else year)
+    return _typed_nextgen(frame)
+
+
+def import_nextgen_csv(years=None, stat='passing', pattern=NEXTGEN_CSV, path=NEXTGEN_PATH):
+    """
+    Store the hand downloaded Next Gen Stats csv files in the cache. Returns the years imported.
+
+    Parameters
+    ----------
+    years : list of int, optional
+        Years to import. Defaults to every season since 2016 that has a file.
+    stat : str, optional
+        Stat board the files are of.
+    pattern : str, optional
+        File of each year, formatted with year.
+    path : str, optional
+        Folder the Next Gen Stats caches are kept in.
+    """
+    cache = YearCache(os.path.join(path, stat))
+    imported = []
+    for year in _years(years, *NEXTGEN_YEARS):
+        name = pattern.format(year=year)
+        if not os.path.exists(name):
+            continue
+        frame = pd.read_csv(name)
+        frame.columns = [_snake_case(column.replace(' ', '_')) for column in frame.columns]
+        if 'year' not in frame:
+            frame.insert(0, 'year', year)
+        cache.write(_typed_nextgen(frame))
+        imported.append(year)
+    return imported
+
+
+def _typed_nextgen(frame):
+    """Numbers as float32, text as strings and the year as int16."""
+    for column in frame.columns:
+        if column == 'year':
+            frame[column] = frame[column].astype('int16')
+        elif pd.api.types.is_bool_dtype(frame[column]):
+            continue
+        elif pd.api.types.is_numeric_dtype(frame[column]):
+            frame[column] = frame[column].astype('float32')
+        else:
+            frame[column] = frame[column].map(lambda value: None if pd.isna(value) else str(value)).astype(object)
+    return frame
+
+
+def _snake_case(name):
+    """'player_displayName' -> 'player_display_name'"""
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])', '_', name).lower()
+
+
+def _years(years, first, last=None):
+    """List of years, defaulting to first thru the current year."""
+    if years is None:
+        last = pd.Timestamp.today().year if last is None else last
+        return list(range(first, last + 1))
+    if isinstance(years, (int, np.integer)):
+        return [int(years)]
+    return sorted({int(year) for year in years})
+
+
+def _arrow_schema(frame):
+    """Schema of frame with the year as int16 and every categorical column with the same index type."""
+    fields = []
+    for field in pa.Schema.from_pandas(frame, preserve_index=False):
+        if field.name == 'year':
+            field = pa.field('year', pa.int16())
+        elif pa.types.is_dictionary(field.type):
+            field = pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+        fields.append(field)
+    return pa.schema(fields)
@@ -0,0 +1,252 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from storage import PARTITIONING
+
+# Default location of the feature store, relative to where the scrapers are run
+FEATURES_PATH = 'data/features'
+
+# Games in each rolling window
+WINDOWS = (3, 5)
+
+# Playoff rounds come after every regular season week
+PLAYOFF_WEEKS = {'WildCard': 101, 'Division': 102, 'ConfChamp': 103, 'Champ': 103, 'SuperBowl': 104}
+
+
+def team_games(games):
+    """
+    Turn games into one row per team and game (two per game), sorted by team, season and date.
+
+    Parameters
+    ----------
+    games : pd.DataFrame
+        Games with a season column, i.e. the output of game_data.add_stats().
+    """
+    def numbers(column):
+        if column not in games:
+            return np.full(len(games), np.nan)
+        return pd.to_numeric(games[column], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    pts_win, pts_lose = numbers('pts_win'), numbers('pts_lose')
+    result = np.where(pts_win == pts_lose, 0.5, 1.0)
+
+    # home_win is 1 if the winner was home, 0 if the loser was and 0.5 for ties, where it isn't known
+    home_win = numbers('home_win')
+    winner_home = np.where(home_win == 1, 1.0, np.where(home_win == 0, 0.0, np.nan))
+
+    week = games['week_num'].astype(str).map(lambda week: PLAYOFF_WEEKS.get(week, week))
+    week = pd.to_numeric(week, errors='coerce').fillna(-1).to_numpy(dtype='int16')
+
+    both = lambda first, second: np.concatenate([first, second])
+    rows = pd.DataFrame({
+        'team': both(games['winner_id'].astype(str), games['loser_id'].astype(str)),
+        'season': both(games['season'], games['season']).astype('int16'),
+        'week': both(week, week),
+        'game_date': both(games['game_date'], games['game_date']),
+        'opponent': both(games['loser_id'].astype(str), games['winner_id'].astype(str)),
+        'home': both(winner_home, 1 - winner_home),
+        'win': both(result, 1 - result),
+        'points_for': both(pts_win, pts_lose),
+        'points_against': both(pts_lose, pts_win),
+        'yards_for': both(numbers('yards_win'), numbers('yards_lose')),
+        'yards_against': both(numbers('yards_lose'), numbers('yards_win')),
+        'turnovers': both(numbers('to_win'), numbers('to_lose')),
+    })
+    rows['margin'] = rows['points_for'] - rows['points_against']
+    return rows.sort_values(['team', 'season', 'game_date'], kind='stable').reset_index(drop=True)
+
+
+def rolling_features(games, windows=WINDOWS):
+    """
+    Compute the features of every team after each of its games.
+
+    Each row holds the team's state through that game: season-to-date averages, averages over
+    the last few games of the season, rest days before the game and home/away splits. The
+    features used to project a game are the ones of the team's previous row.
+
+    Every feature is a difference of prefix sums within the (team, season) groups, so nothing
+    is looped over per team.
+
+    Parameters
+    ----------
+    games : pd.DataFrame
+        Games with a season column, i.e. the output of game_data.add_stats().
+    windows : tuple of int, optional
+        Games in each rolling window.
+    """
+    rows = team_games(games)
+    n = len(rows)
+    index = np.arange(n)
+
+    # First row of each row's (team, season) group
+    team, season = rows['team'].to_numpy(), rows['season'].to_numpy()
+    new_group = np.r_[True, (team[1:] != team[:-1]) | (season[1:] != season[:-1])] if n else np.array([], bool)
+    start = np.maximum.accumulate(np.where(new_group, index, 0)) if n else index
+
+    features = rows[['team', 'season', 'week', 'game_date', 'opponent', 'home', 'win',
+                     'points_for', 'points_against', 'margin']].copy()
+    features['games'] = (index - start + 1).astype('int16')
+    features['wins'] = _window_sum(rows['win'].to_numpy(), start)[0]
+    features['win_pct'] = features['wins'] / features['games']
+
+    # Season-to-date averages, then rolling averages of the last few games
+    for stat in ['points_for', 'points_against', 'margin', 'yards_for', 'yards_against', 'turnovers']:
+        features[f'{stat}_avg'] = _window_mean(rows[stat].to_numpy(), start)
+    for window in windows:
+        for stat in ['points_for', 'points_against', 'margin']:
+            features[f'{stat}_last{window}'] = _window_mean(rows[stat].to_numpy(), start, window)
+
+    # Days of rest before each game, the first game of a season has none
+    dates = rows['game_date'].to_numpy()
+    rest = np.full(n, np.nan)
+    later = ~new_group
+    rest[later] = (dates[1:][later[1:]] - dates[:-1][later[1:]]) / np.timedelta64(1, 'D')
+    features['rest_days'] = rest
+
+    # Home and away splits of the margin
+    home = rows['home'].to_numpy()
+    for side, mask in [('home', home == 1), ('away', home == 0)]:
+        total, count = _window_sum(np.where(mask, rows['margin'].to_numpy(), 0.0), start, counts=mask)
+        features[f'{side}_games'] = count.astype('int16')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            features[f'{side}_margin_avg'] = np.where(count > 0, total / count, np.nan)
+
+    # Compact dtypes, the integer columns above are kept
+    floats = features.select_dtypes('float64').columns
+    features[floats] = features[floats].astype('float32')
+    features['team'] = features['team'].astype('category')
+    features['opponent'] = features['opponent'].astype('category')
+    return features
+
+
+def _window_sum(values, start, window=None, counts=None):
+    """Sum and count of the non-missing values over the window (or season) ending at each row."""
+    present = ~np.isnan(values) if counts is None else counts
+    value_sums = np.r_[0.0, np.cumsum(np.where(present, values, 0.0))]
+    count_sums = np.r_[0, np.cumsum(present)]
+
+    end = np.arange(len(values)) + 1
+    begin = start if window is None else np.maximum(start, end - window)
+    return value_sums[end] - value_sums[begin], count_sums[end] - count_sums[begin]
+
+
+def _window_mean(values, start, window=None):
+    total, count = _window_sum(values, start, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+class FeatureStore:
+    """
+    Rolling per-team features, stored as parquet partitioned by season.
+
+    Features only depend on games of the same season, so when a new week of games lands only
+    that season is recomputed and rewritten.
+
+    Parameters
+    ----------
+    path : str, optional
+        Folder the features are kept in.
+    windows : tuple of int, optional
+        Games in each rolling window.
+    """
+    def __init__(self, path=FEATURES_PATH, windows=WINDOWS) -> None:
+        self.path = path
+        self.windows = windows
+
+    def exists(self):
+        """Return True if any features have been stored."""
+        return os.path.isdir(self.path) and any(name.startswith('season=') for name in os.listdir(self.path))
+
+    def build(self, games):
+        """
+        Compute and store the features of every game, replacing the stored ones.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column, e.g. storage.GameArchive().load().
+        """
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        return self.update(games)
+
+    def update(self, games):
+        """
+        Recompute the seasons of games and replace their stored features. Returns the seasons.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Every game of the seasons to refresh, e.g. GameArchive().load(seasons=[2021]) after
+            new games were appended.
+        """
+        if not len(games):
+            return []
+        features = rolling_features(games, self.windows)
+
+        # Only the partitions of these seasons are replaced
+        table = pa.Table.from_pandas(features, preserve_index=False)
+        ds.write_dataset(table, self.path, format='parquet', partitioning=PARTITIONING,
+                         basename_template='part-{i}.parquet', existing_data_behavior='delete_matching')
+        return sorted(int(season) for season in features['season'].unique())
+
+    def load(self, seasons=None, teams=None, columns=None):
+        """
+        Load stored features, sorted by team, season and date.
+
+        Parameters
+        ----------
+        seasons : int or list of int, optional
+            Seasons to load. Only the folders of these seasons are read.
+        teams : list of str, optional
+            Team ids to load.
+        columns : list of str, optional
+            Feature columns to load, the team, season, week and game_date are always loaded.
+        """
+        if not self.exists():
+            raise FileNotFoundError(f'No features are stored in {self.path}.')
+
+        if isinstance(seasons, (int, float)):
+            seasons = [int(seasons)]
+        predicate = None
+        if seasons is not None:
+            predicate = ds.field('season').isin([int(season) for season in seasons])
+        if teams is not None:
+            team_filter = ds.field('team').isin(list(teams))
+            predicate = team_filter if predicate is None else predicate & team_filter
+        if columns is not None:
+            columns = ['team', 'season', 'week', 'game_date'] + [c for c in columns if c not in ('team', 'season', 'week', 'game_date')]
+
+        dataset = ds.dataset(self.path, format='parquet', partitioning=PARTITIONING)
+        features = dataset.to_table(columns=columns, filter=predicate).to_pandas()
+        features.insert(1, 'season', features.pop('season'))
+        return features.sort_values(['team', 'season', 'game_date'], kind='stable').reset_index(drop=True)
+
+    def slate(self, season, week, teams=None, date=None):
+        """
+        Features of each team going into a week: the team's row after its last game before week.
+
+        Parameters
+        ----------
+        season : int
+            Season of the slate.
+        week : int or str
+            Week of the slate, playoff rounds can be given by name (e.g. 'WildCard').
+        teams : list of str, optional
+            Teams of the slate. Defaults to every team that has played in the season.
+        date : str or datetime, optional
+            Date of the games, used to recompute rest_days as the days since each team's last game.
+        """
+        week = PLAYOFF_WEEKS.get(week, week)
+        features = self.load(seasons=[season], teams=teams)
+        features = features[features['week'] < int(week)]
+        latest = features.groupby('team', observed=True).tail(1).set_index('team')
+        if date is not None:
+            latest['rest_days'] = ((pd.Timestamp(date) - latest['game_date']).dt.days).astype('float32')
+        return latest
@@ -0,0 +1,202 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import default_cache
+from metrics import default_metrics
+
+
+class RateLimiter:
+    """
+    Token bucket that limits the number of requests made per minute.
+
+    Parameters
+    ----------
+    requests_per_minute : int, float, optional
+        Sustained request budget. If None, requests are not limited.
+    burst : int, optional
+        Number of requests that may be made back to back before the budget applies.
+    """
+    def __init__(self, requests_per_minute=30, burst=1) -> None:
+        self.rate = None if requests_per_minute is None else requests_per_minute / 60.0
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        if self.rate is None:
+            return
+
+        while True:
+            with self.lock:
+                # Refill the bucket based on elapsed time
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class Fetcher:
+    """
+    Concurrent, rate-limited page fetcher built on a pooled requests session.
+
+    Pages are parsed in the worker threads, which share one core for parsing. More workers only
+    help while they mostly wait on the network: against a local stub server
+    (python -m benchmarks.bench_fetch) throughput stops growing at 4 to 8 workers and falls at
+    16 (e.g. 35 to 20 pages/s) as parsing threads contend for the GIL. The default of 4 is at
+    that knee, and with the default rate limit of 30 requests a minute more workers don't fetch
+    any faster either.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        Number of pages fetched (and parsed) at the same time, see above before raising it.
+    requests_per_minute : int, float, optional
+        Request budget shared by all workers. If None, requests are not limited.
+    session : requests.Session, optional
+        Session used for all requests. A pooled session is created if not provided.
+    timeout : int, float, optional
+        Seconds to wait on each request.
+    cache : cache.HTTPCache or False, optional
+        Cache pages are read from and stored in. Defaults to the shared cache, use False to
+        always go to the network.
+    max_age : int, float, optional
+        Overrides the cache TTL of every page. Use 0 to always revalidate cached pages.
+    """
+    def __init__(self, max_workers=4, requests_per_minute=30, session=None, timeout=30, cache=None,
+                 max_age=None) -> None:
+        self.max_workers = max(1, int(max_workers))
+        self.limiter = RateLimiter(requests_per_minute)
+        self.session = session if session is not None else new_session(self.max_workers)
+        self.timeout = timeout
+        self.cache = default_cache() if cache is None else cache
+        self.max_age = max_age
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+    def get(self, url):
+        """Fetch a single url and return the page content."""
+        if self.cache is not False:
+            return self.cache.get(url, session=self.session, limiter=self.limiter, timeout=self.timeout,
+                                  max_age=self.max_age)
+
+        self.limiter.acquire()
+        start = time.perf_counter()
+        page = self.session.get(url, timeout=self.timeout)
+        default_metrics().record_fetch(url, time.perf_counter() - start, len(page.content), 'bypass')
+        page.raise_for_status()
+        return page.content
+
+    def map(self, urls, parse=None):
+        """
+        Fetch every url and yield (url, result) pairs in order of completion.
+
+        Parameters
+        ----------
+        urls : iterable of str
+            Pages to fetch.
+        parse : callable, optional
+            Called in the worker thread as parse(url, content) so parsing overlaps other
+            network waits. If None, the raw page content is yielded.
+        """
+        def work(url):
+            content = self.get(url)
+            return content if parse is None else parse(url, content)
+
+        # Only a couple of urls per worker are queued, so an error (or the caller stopping)
+        # doesn't leave the rest of the urls to be fetched and thrown away
+        urls = iter(urls)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            running = {}
+            while True:
+                for url in urls:
+                    running[pool.submit(work, url)] = url
+                    if len(running) >= 2 * self.max_workers:
+                        break
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Drop finished futures so results are only held until they are consumed
+                    yield running.pop(future), future.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def new_session(pool_size=4):
+    """Create a requests session that keeps up to pool_size connections alive per host."""
+    session = requests.Session()
+    adapter = _transport if _transport is not None else HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# Adapter mounted on new sessions instead of a pooled HTTPAdapter, see replay.py
+_transport = None
+
+
+def set_transport(adapter):
+    """
+    Send the requests of every new session thru adapter (e.g. a replay.ReplayAdapter), None
+    restores the network. The shared session of get_page() is recreated.
+    """
+    global _transport, _session
+    with _session_lock:
+        _transport = adapter
+        _session = None
+
+
+def get_page(url, cache=None, timeout=30, max_age=None):
+    """
+    Get the content of a single page thru the shared session and cache.
+
+    Parameters
+    ----------
+    url : str
+        Page to get.
+    cache : cache.HTTPCache or False, optional
+        Cache to use. Defaults to the shared cache, use False to always go to the network.
+    timeout : int, float, optional
+        Seconds to wait on the request.
+    max_age : int, float, optional
+        Overrides the cache TTL of url. Use 0 to always revalidate the cached copy.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+
+    cache = default_cache() if cache is None else cache
+    if cache is not False:
+        return cache.get(url, session=_session, timeout=timeout, max_age=max_age)
+
+    start = time.perf_counter()
+    page = _session.get(url, timeout=timeout)
+    default_metrics().record_fetch(url, time.perf_counter() - start, len(page.content), 'bypass')
+    page.raise_for_status()
+    return page.content
@@ -1,186 +1,389 @@
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
-import requests
 import re
-import time
+import contextlib
 import datetime
+import time
+import json
+import os
+
+from aggregates import AGGREGATES_PATH, AggregateStore
+from fetch import Fetcher, get_page
+from metrics import default_metrics, timed
+from storage import GameArchive, ScrapeStage, STAGE_PATH
+from tables import iter_tables, read_table
+
+GAME_SCORES_URL = 'https://www.pro-football-reference.com/boxscores/game-scores.htm'
+SCORE_MARKS_PATH = 'data/score_marks.json'
 
 
 def get_all_game_score_links(soup=None):
     """Open game scores page and retrieve appropriate links"""
     
-    # Check if soup object is provided, if not generate one
+    # Check if soup object (or page content) is provided, if not generate one
     if soup is None:
-        url = 'https://www.pro-football-reference.com/boxscores/game-scores.htm'
-
         # Get page content
-        page = requests.get(url)
-        soup = BeautifulSoup(page.content, 'html.parser')
+        soup = get_page(GAME_SCORES_URL)
     
-    # Find table and all rows
-    table = soup.find('table', attrs={'class': 'sortable stats_table'})
-    trs = table.find_all('tr')  # each tr contains a link to each score
-
-    # Use trs that have data
-    trs = trs[1:]  # trs[0] contains only header info
+    # Find table, each row contains a link to each score
+    table = _game_scores_table(soup)
 
     # Get all links
     links = []
     prefix = 'https://www.pro-football-reference.com'
-    for td in trs:
-        hrefs = [link.get('href') for link in td.find_all('a')]
-        links.append(prefix + str(hrefs[0]))
+    for i in range(len(table)):
+        link = _first_link(table, i)
+        if link is not None:
+            links.append(prefix + str(link))
 
     return links
 
 
-def get_games_per_score(url, existing=None):
+def get_game_score_marks(soup=None):
+    """Return a high-water mark for each game score link. The mark is the text of
+       the score's row on the game scores page (game count, last game, ...), so it
+       only changes when a game with that score is played."""
+
+    # Check if soup object (or page content) is provided, if not generate one
+    if soup is None:
+        soup = get_page(GAME_SCORES_URL, max_age=0)
+
+    # Find table with all rows of data
+    table = _game_scores_table(soup)
+
+    marks = {}
+    prefix = 'https://www.pro-football-reference.com'
+    td_stats = [stat for stat in table.columns if stat != 'ranker']
+    for i in range(len(table)):
+        link = _first_link(table, i)
+        if link is None: continue
+        marks[prefix + str(link)] = '|'.join(table.columns[stat][i] or '' for stat in td_stats)
+
+    return marks
+
+
+def _game_scores_table(soup):
+    """Find the table of all game scores on the game scores page."""
+    for table in iter_tables(soup):
+        if 'stats_table' in table.attrs.get('class', '').split():
+            return table.body()
+    raise LookupError('Unable to find the game scores table.')
+
+
+def _first_link(table, i):
+    """Return the first link in row i of a table."""
+    for links in table.links.values():
+        if links[i] is not None:
+            return links[i]
+    return None
+
+
+def load_score_marks(path=SCORE_MARKS_PATH):
+    """Load the score marks saved by the last get_data() run."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_score_marks(marks, path=SCORE_MARKS_PATH):
+    """Save score marks so the next get_data() run can skip unchanged score pages."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(marks, f, indent=0, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def get_games_per_score(url, existing=None, soup=None):
     """This function is meant to be iterated over each of the links returned
-       from the get_all_game_score_links() function."""
+       from the get_all_game_score_links() function. If soup (or raw page
+       content) is provided, the url is not requested."""
 
-    # Get page content
-    page = requests.get(url)
-    soup = BeautifulSoup(page.content, 'html.parser')
+    # Check if soup object is provided, if not generate one
+    if soup is None:
+        soup = get_page(url)
 
     # Find the table
-    table = soup.find('table', attrs={'id': 'games'})  
+    start = time.perf_counter()
+    table = read_table(soup, 'games', cells=('td',)).body()
 
     # Raise error if existing is wrong type
-    if not isinstance(existing, (list, type(None))):
-        raise TypeError('The existing input must be either a list or NoneType')
+    if not isinstance(existing, (list, set, frozenset, type(None))):
+        raise TypeError('The existing input must be either a list, set or NoneType')
+    if isinstance(existing, list):
+        existing = set(existing)  # Constant time lookups for every row
 
     # Get the games data
     games = {}
     site_stub = 'https://www.pro-football-reference.com'
-    for i, row in enumerate(table.find_all('tr')[1:]):
-        row_dict = {}  # re-initialize row_dict
-
-        # TODO Skip this row if boxscore is in the existing list
+    columns, links = table.columns, table.links
+    boxscores = links.get('boxscore_word', [None] * len(table))
+    for i in range(len(table)):
+        # Skip rows without any data (i.e. header rows)
+        if not any(values[i] is not None for values in columns.values()):
+            continue
+
+        # Skip this row if boxscore is in the existing set
         if existing is not None:
-            site = row.find('td', attrs={'data-stat': 'boxscore_word'}).find('a').get('href')
-            site = site_stub + site
+            if boxscores[i] is None:
+                continue
+            site = site_stub + boxscores[i]
             game_exists = site in existing
 
             if game_exists:
                 continue
 
         # Otherwise, loop thru all values
-        for col in row.find_all('td'):
-            # Set row dictionary values
-            col_name = col['data-stat']
-            
+        row_dict = {}
+        for col_name, values in columns.items():
+            value = values[i]
+            if value is None:
+                continue
+
             # Determine special columns
             if col_name=='winner':
                 # winner_id
-                try:
-                    site = col.find('a').get('href')
-                    row_dict['winner_id'] = re.search(r'/teams/([A-Za-z0-9]+)/', site).group(1)
-                except:
-                    row_dict['winner_id'] = None
+                row_dict['winner_id'] = _team_id(links[col_name][i])
             elif col_name=='loser':
                 # loser_id
-                try:
-                    site = col.find('a').get('href')
-                    row_dict['loser_id'] = re.search(r'/teams/([A-Za-z0-9]+)/', site).group(1)
-                except:
-                    row_dict['loser_id'] = None
+                row_dict['loser_id'] = _team_id(links[col_name][i])
             elif col_name=='game_location':
                 # home_win
-                row_dict['home_win'] = 0 if r'@' in col.text else 1
+                row_dict['home_win'] = 0 if r'@' in value else 1
                 continue
             elif col_name=='boxscore_word':
                 # box_score
-                try:
-                    site = col.find('a').get('href')
-                    row_dict['boxscore'] = site_stub + site
-                except:
-                    row_dict['boxscore'] = None
+                site = links[col_name][i]
+                row_dict['boxscore'] = None if site is None else site_stub + site
                 continue
             elif col_name=='game_outcome':
                 continue
 
-            row_dict[col_name] = col.text
+            row_dict[col_name] = value
 
         # Add to games dictionary
         games[i] = row_dict
 
+    default_metrics().record_parse('score_page', 'games', time.perf_counter() - start, len(games))
     return games
-    
+
+
+def _team_id(link):
+    """Extract the team id of a winner or loser link, None if there isn't one."""
+    find_id = None if link is None else re.search(r'/teams/([A-Za-z0-9]+)/', link)
+    return None if find_id is None else find_id.group(1)
+
+# Compact dtypes of the numeric game columns, nullable versions are used if values are missing
+NUMERIC_COLUMNS = {'pts_win': 'int16', 'pts_lose': 'int16', 'yards_win': 'int16', 'to_win': 'int8',
+                   'yards_lose': 'int16', 'to_lose': 'int8'}
+
+
+@timed('add_stats')
 def add_stats(games):
+    """Add the season of each game, give ties a half point home win and convert
+       columns to typed dtypes. Returns a new DataFrame sorted by game date."""
+    games = games.copy()
+
+    # Convert numeric columns to compact dtypes in one pass
+    for col, dtype in NUMERIC_COLUMNS.items():
+        if col not in games:
+            continue
+        values = _to_numeric(games[col])
+        games[col] = values.astype(dtype if values.notna().all() else dtype.capitalize())
+
     # Give a half point to ties
-    def ties(row):
-        return 0.5 if row['pts_win']==row['pts_lose'] else row['home_win']
-    games['home_win'] = games.apply(ties, axis=1)
+    tie = (games['pts_win'] == games['pts_lose']).fillna(False).to_numpy(dtype=bool)
+    games['home_win'] = np.where(tie, 0.5, pd.to_numeric(games['home_win'])).astype('float32')
 
     # Set game_date to datetime
     games['game_date'] = pd.to_datetime(games['game_date'], format='%Y-%m-%d')
 
     #------- Break into seasons -----------
-    # Get unique years to generate seasons
-    years = games['game_date'].dt.year.unique()
-    seasons = [(datetime.date(yr,8,1), datetime.date(yr+1,3,1)) for yr in years]
+    # Seasons start in August, so games before August belong to the previous year's season
+    dates = games['game_date']
+    season = (dates.dt.year - (dates.dt.month < 8)).astype('int16')
 
     # Organize games by date
+    games = games.drop(columns='season', errors='ignore')  # Games that already went thru add_stats
+    games.insert(2, 'season', season)
     games = games.sort_values('game_date')
-    games.insert(2, 'season', np.nan)  # initialize season column
-
-    # Set season and type
-    for season in seasons:
-        games.loc[games.game_date.dt.date.between(season[0], season[1]),'season'] = season[0].year
-    games['season'] = games['season'].astype('int')
     #---------------------------------------
 
     return games
 
 
-def get_data(wait_time=2, all_games=None):
+def _to_numeric(values):
+    """Convert a column to numbers, parsing each distinct string only once."""
+    if values.dtype != object:
+        return pd.to_numeric(values, errors='coerce')
+
+    # Missing values get code -1, which picks the NaN appended to the end
+    codes, uniques = pd.factorize(values)
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype='float64')
+    return pd.Series(np.append(numbers, np.nan)[codes], index=values.index)
+
+
+def iter_score_pages(links, existing=None, max_workers=4, requests_per_minute=None, max_age=None):
+    """Fetch and parse score pages, yielding (link, games) as each page is parsed.
+       games is the output of get_games_per_score()."""
+    def parse(link, content):
+        return get_games_per_score(link, existing=existing, soup=content)
+
+    with Fetcher(max_workers=max_workers, requests_per_minute=requests_per_minute, max_age=max_age) as fetcher:
+        yield from fetcher.map(links, parse=parse)
+
+
+def iter_batches(pages, batch_size=50):
+    """Group (link, games) pairs into dicts of at most batch_size score pages."""
+    batch = {}
+    for link, games in pages:
+        batch[link] = games
+        if len(batch) >= batch_size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+def _report(pages, total):
+    """Print a status update for every score page that passes thru."""
+    for n, (link, games) in enumerate(pages):
+        win, loss = re.search(r'pts_win=(\d+)\&pts_lose=(\d+)', link).groups()
+        print(f'Retrieved {win}-{loss} Score....{n+1} of {total}', end='\r')
+        yield link, games
+
+
+@timed('get_data')
+def get_data(wait_time=2, all_games=None, max_workers=4, requests_per_minute=None,
+             marks_path=SCORE_MARKS_PATH, stage_path=STAGE_PATH, batch_size=50):
     """Iterate over all links in get_all_game_score_links() function
-        to retrieve all basic NFL game data since 1920"""
+        to retrieve all basic NFL game data since 1920.
+
+        Score pages are fetched and parsed by max_workers threads. Requests are
+        limited to requests_per_minute, which defaults to one request every
+        wait_time seconds.
+
+        Parsed rows are written to disk (stage_path) every batch_size score
+        pages along with a checkpoint of the finished pages, so only a batch is
+        held in memory while scraping. If a run stops, the next run resumes
+        from the checkpoint and the stage is removed once a run finishes.
+
+        If all_games is provided, only new games are added to it. Score pages
+        whose mark (see get_game_score_marks()) is unchanged since the run that
+        saved marks_path are skipped entirely, and rows whose boxscore is already
+        in all_games are not parsed."""
 
     # If all_games is a Dataframe, this function adds to that frame, otherwise this is an initial data pull
     if isinstance(all_games, pd.DataFrame):
         data_exists = True
-        boxscore_links = list(all_games.boxscore.unique())  # this is a unique id for each row
-
-        # Prepopulate games dict with all_games
-        games = all_games.reset_index(drop=True).to_dict(orient='index')
-
+        boxscore_links = set(all_games.boxscore.dropna())  # this is a unique id for each row
+        known_marks = load_score_marks(marks_path)
     elif isinstance(all_games, type(None)):
         data_exists = False
         boxscore_links = None
+        known_marks = {}
     else:
         raise TypeError('The all_games input must be None if this is an initial data pull, '+
                         'otherwise, all_games should be a pd.DataFrame type.')
 
-    # Look thru game score links
-    links = get_all_game_score_links()
-    games = {}
-    for i, link in enumerate(links):
-        # Print Status Update
-        win, loss = re.search(r'pts_win=(\d+)\&pts_lose=(\d+)', link).groups()
-        print(f'Retrieving {win}-{loss} Score....{i+1} of {len(links)}', end='\r')
+    # Turn the fixed wait into a request budget
+    if requests_per_minute is None and wait_time:
+        requests_per_minute = 60 / wait_time
+
+    # Look thru game score links, skipping the ones that have not changed
+    soup = get_page(GAME_SCORES_URL, max_age=0 if data_exists else None)
+    links = get_all_game_score_links(soup)
+    marks = get_game_score_marks(soup)
+    changed = [link for link in links if known_marks.get(link) != marks.get(link)]
+
+    # Resume an unfinished run, pages staged with their current mark are done
+    stage = ScrapeStage(stage_path)
+    staged = stage.completed()
+    todo = [link for link in changed if link not in staged or staged[link] != marks.get(link)]
+    if len(todo) < len(changed):
+        print(f'Resuming, {len(changed) - len(todo)} of {len(changed)} score pages already retrieved')
+
+    # Fetch -> parse -> batch -> disk. Changed pages are revalidated since the cached copy is known to be out of date
+    pages = iter_score_pages(todo, existing=boxscore_links, max_workers=max_workers,
+                             requests_per_minute=requests_per_minute, max_age=0 if data_exists else None)
+    metrics = default_metrics()
+    for batch in iter_batches(_report(pages, len(todo)), batch_size):
+        with metrics.stage('stage_write'):
+            stage.add(batch, marks)
+
+    # Read the staged rows back in the order of the score links
+    with metrics.stage('stage_load'):
+        df = stage.load(changed)
+
+    # Add new games to the existing ones
+    if data_exists:
+        if 'boxscore' in df:
+            df = df[~df['boxscore'].isin(boxscore_links)]  # Rows staged by an earlier run with other games
+        df = pd.concat([all_games, df], ignore_index=True)
+
+    # Only save marks once every changed page was retrieved
+    if marks_path is not None:
+        save_score_marks(marks, marks_path)
+    stage.clear()
 
-        # Dictionary for each score
-        new_games_raw = get_games_per_score(link, existing=boxscore_links)
+    return df
 
-        # Rename keys so that no dupes exist
-        if not data_exists:
-            key_prefix = f'{i:04}'
-            new_games = {(key_prefix+str(k)): new_games_raw[k] 
-                            for k in new_games_raw.keys()}
-        # TODO: Determine how to work with indexes for both with and without all_games
+def sync(max_workers=4, requests_per_minute=None, wait_time=2, archive_path=None, csv=True,
+         metrics_path='data/scrape_metrics.json', profile=False, aggregates_path=AGGREGATES_PATH,
+         marks_path=SCORE_MARKS_PATH, stage_path=STAGE_PATH):
+    """Add new games to the game archive, or pull every game if there isn't one yet.
+        Returns the number of games added.
+
+        The season aggregates in aggregates_path (None to skip them) are brought
+        up to date with only the new games, or rebuilt if they are stale. The
+        games are also written to data/all_nfl_games{date}.csv if csv is
+        True, and where the run spent its time to metrics_path. Set profile
+        to also run cProfile and tracemalloc. marks_path and stage_path are
+        passed to get_data()."""
+    metrics = default_metrics()
+    profiling = metrics.profile('game_data') if profile else contextlib.nullcontext()
+
+    archive = GameArchive() if archive_path is None else GameArchive(archive_path)
+    aggregates = None if aggregates_path is None else AggregateStore(aggregates_path)
+    with profiling:
+        if archive.exists():
+            stored = archive.load()
+            df = get_data(wait_time, all_games=stored, max_workers=max_workers,
+                          requests_per_minute=requests_per_minute, marks_path=marks_path, stage_path=stage_path)
+            # get_data() adds the new games after the stored ones, only those are checked and written
+            new = add_stats(df.iloc[len(stored):])
+            # New games can only be added onto aggregates that were up to date before them
+            incremental = aggregates is not None and aggregates.current() and not aggregates.stale_seasons(archive)
+            with metrics.stage('archive_append'):
+                new = archive.new_games(new)
+                added = archive.append(new, dedupe=False)
+            df = pd.concat([stored, new], ignore_index=True)
+        else:
+            df = add_stats(get_data(wait_time, max_workers=max_workers, requests_per_minute=requests_per_minute,
+                                    marks_path=marks_path, stage_path=stage_path))
+            with metrics.stage('archive_write'):
+                archive.write(df)
+            new, added, incremental = df, len(df), False
+        print(f'\n{added} games added to {archive.path}')
+
+        if aggregates is not None:
+            with metrics.stage('aggregates'):
+                seasons = aggregates.update(new, archive) if incremental else aggregates.refresh(archive)
+            print(f'Aggregates of {len(seasons)} seasons updated in {aggregates.path}')
 
-        # Combine old games and new games
-        games = {**games, **new_games}
-        time.sleep(wait_time)
+    # Write to csv
+    if csv:
+        today = datetime.datetime.now()
+        df.to_csv(f'data/all_nfl_games{today.year}_{today.month}_{today.day}.csv')
 
-    df = pd.DataFrame.from_dict(games, orient='index')
-    return df
+    # Keep where the run spent its time
+    if metrics_path is not None:
+        metrics.to_json(metrics_path)
+        print(f'Run metrics written to {metrics_path}')
+    return added
 
-if __name__=='__main__':
-    df = add_stats(get_data())
 
-    # Write to csv
-    today = datetime.datetime.now()
-    df.to_csv(f'data/all_nfl_games{today.year}_{today.month}_{today.day}.csv')
+if __name__=='__main__':
+    # Set NFL_PROFILE=1 to also run cProfile and tracemalloc
+    sync(profile=bool(os.environ.get('NFL_PROFILE')))
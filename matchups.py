@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# Captions of the tables the per game stats are read from
+OFFENSE_TABLE = 'Team Offense Table'
+DEFENSE_TABLE = 'Team Defense Table'
+
+
+class MatchupGrid:
+    """
+    Expected points and spreads of every matchup, for one or many seasons at once.
+
+    A team's offense (stat per game) and every opponent's defense (stat allowed per game) are
+    aligned into (season, team) arrays, so the (season, team, team) grid is a single broadcast:
+    team i is expected to score offense[i] * defense[j] / league average against team j.
+
+    Parameters
+    ----------
+    teams : list of str
+        Team ids, the columns of offense and defense.
+    seasons : list of int
+        Seasons, the rows of offense and defense.
+    offense : np.ndarray
+        (season, team) stat per game of each offense, NaN if the team didn't play that season.
+    defense : np.ndarray
+        (season, team) stat allowed per game of each defense.
+    """
+    def __init__(self, teams, seasons, offense, defense) -> None:
+        self.teams = pd.Index(teams, name='team_id')
+        self.seasons = pd.Index(seasons, name='season')
+        self.offense = np.asarray(offense, dtype='float64').reshape(len(self.seasons), len(self.teams))
+        self.defense = np.asarray(defense, dtype='float64').reshape(len(self.seasons), len(self.teams))
+
+    @classmethod
+    def from_stat_tables(cls, offense, defense, season=0, stat='points'):
+        """
+        Build the grid of a season from GetData.team_offense_stats() and team_defense_stats().
+
+        Parameters
+        ----------
+        offense, defense : dict of pd.DataFrame
+            Stat tables by caption, with the team id in the id column.
+        season : int, optional
+            Label of the season.
+        stat : str, optional
+            Column of the team offense and defense tables that is projected.
+        """
+        off, dfn = offense[OFFENSE_TABLE], defense[DEFENSE_TABLE]
+        off = _per_game(off.set_index(off['id'].astype(str)), stat)
+        dfn = _per_game(dfn.set_index(dfn['id'].astype(str)), stat).reindex(off.index)
+        return cls(off.index, [season], off.to_numpy()[None, :], dfn.to_numpy()[None, :])
+
+    @classmethod
+    def from_seasons(cls, frames, stat='points'):
+        """
+        Build the grid of many seasons from projections.load_seasons().
+
+        Parameters
+        ----------
+        frames : dict of pd.DataFrame
+            The 'offense' and 'defense' frames, indexed by (season, team_id).
+        stat : str, optional
+            Column of the team offense and defense tables that is projected.
+        """
+        off = _per_game(frames['offense'][OFFENSE_TABLE], stat)
+        dfn = _per_game(frames['defense'][DEFENSE_TABLE], stat)
+
+        # (season, team) arrays, NaN where a team didn't exist in a season
+        off = off.unstack('team_id')
+        dfn = dfn.unstack('team_id').reindex(index=off.index, columns=off.columns)
+        return cls(off.columns, off.index, off.to_numpy(), dfn.to_numpy())
+
+    @property
+    def league_average(self):
+        """Average stat per game of each season."""
+        return np.nanmean(self.offense, axis=1)
+
+    def expected_points(self, home_field=0.0):
+        """
+        (season, team, team) array of the points team i is expected to score against team j,
+        with team i at home getting half of home_field.
+
+        Parameters
+        ----------
+        home_field : float, optional
+            Points the home team gains over the away team.
+        """
+        average = self.league_average[:, None, None]
+        return self.offense[:, :, None] * self.defense[:, None, :] / average + home_field / 2
+
+    def spread(self, home_field=0.0):
+        """
+        (season, team, team) array of the expected margin of team i at home against team j.
+
+        Parameters
+        ----------
+        home_field : float, optional
+            Points the home team gains over the away team.
+        """
+        points = self.expected_points()
+        return points - points.transpose(0, 2, 1) + home_field
+
+    def frame(self, season=None, kind='spread', home_field=0.0):
+        """
+        Labeled team by team grid of a season.
+
+        Parameters
+        ----------
+        season : int, optional
+            Season of the grid. Defaults to the last season.
+        kind : str, optional
+            'spread' or 'points'.
+        home_field : float, optional
+            Points the home team gains over the away team.
+        """
+        grid = self.spread(home_field) if kind == 'spread' else self.expected_points(home_field)
+        row = len(self.seasons) - 1 if season is None else self.seasons.get_loc(season)
+        df = pd.DataFrame(grid[row], index=self.teams, columns=self.teams)
+        df.index.name, df.columns.name = 'home', 'away'
+        return df
+
+    def matchups(self, home, away, season=None, home_field=0.0):
+        """
+        Expected points and spread of a slate of games.
+
+        Parameters
+        ----------
+        home, away : list of str
+            Team ids of each game.
+        season : int, optional
+            Season of the slate. Defaults to the last season.
+        home_field : float, optional
+            Points the home team gains over the away team.
+        """
+        row = len(self.seasons) - 1 if season is None else self.seasons.get_loc(season)
+        h, a = self.teams.get_indexer(home), self.teams.get_indexer(away)
+        if (h < 0).any() or (a < 0).any():
+            raise KeyError('Every team of the slate must be in the grid.')
+
+        points = self.expected_points()[row]
+        home_points = points[h, a] + home_field / 2
+        away_points = points[a, h] - home_field / 2
+        return pd.DataFrame({'home': home, 'away': away, 'home_points': home_points,
+                             'away_points': away_points, 'spread': home_points - away_points})
+
+
+def _per_game(table, stat):
+    """Stat per game of a stat table."""
+    values = pd.to_numeric(table[stat], errors='coerce').astype('float64')
+    if 'g' not in table:
+        return values
+    games = pd.to_numeric(table['g'], errors='coerce').astype('float64')
+    return values / games.where(games > 0)  # No games played is missing, not infinite
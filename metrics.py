@@ -0,0 +1,275 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Metrics:
+    """
+    Collects where a scrape spends its time: every page fetched (latency, bytes and whether the
+    cache answered), every table parsed (time and rows), the time of each stage and event
+    counts. The scrapers record into default_metrics(), summarize it at the end of a run with
+    summary(), to_json() or to_prometheus().
+
+    Recording is a list append under a lock, so it is always on. profile() adds cProfile and
+    tracemalloc for the runs that need them.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self.lock:
+            self.fetches = []
+            self.parses = {}
+            self.stages = {}
+            self.events = {}
+            self.profiles = []
+
+    ## ----------- Recording ------------ ##
+    def record_fetch(self, url, seconds, nbytes, cache):
+        """
+        Record a page request.
+
+        Parameters
+        ----------
+        url : str
+            Page requested.
+        seconds : float
+            Time to get the page, not counting the wait for the rate limiter.
+        nbytes : int
+            Size of the page content.
+        cache : str
+            'hit' (fresh cached copy), 'revalidated' (304 on a stale copy), 'miss' (downloaded),
+            'bypass' (no cache) or 'rendered' (selenium).
+        """
+        with self.lock:
+            self.fetches.append({'url': url, 'seconds': seconds, 'bytes': nbytes, 'cache': cache})
+
+    def record_parse(self, stage, name, seconds, rows):
+        """
+        Record the parsing of a table or page.
+
+        Parameters
+        ----------
+        stage : str
+            What was parsed, e.g. 'extract' (html to columns) or 'frame' (columns to a DataFrame).
+        name : str
+            Table id or caption.
+        seconds : float
+            Time spent parsing.
+        rows : int
+            Rows produced.
+        """
+        with self.lock:
+            total = self.parses.setdefault((stage, str(name)), [0, 0.0, 0])
+            total[0] += 1
+            total[1] += seconds
+            total[2] += rows
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block as one run of a stage, e.g. with metrics.stage('add_stats'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                total = self.stages.setdefault(name, [0, 0.0])
+                total[0] += 1
+                total[1] += elapsed
+
+    def increment(self, event, n=1):
+        """Count an event, e.g. a table without a caption."""
+        with self.lock:
+            self.events[event] = self.events.get(event, 0) + n
+
+    @contextmanager
+    def profile(self, name='run', cpu=True, memory=True, top=25):
+        """
+        Profile the block with cProfile and/or tracemalloc and keep the results in the summary.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the profiled block.
+        cpu : bool, optional
+            Run cProfile and keep the top functions by cumulative time.
+        memory : bool, optional
+            Run tracemalloc and keep the peak and the top allocation sites.
+        top : int, optional
+            Number of functions and allocation sites kept.
+        """
+        profiler = cProfile.Profile() if cpu else None
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            result = {'name': name}
+            if profiler is not None:
+                profiler.disable()
+                result['functions'] = _top_functions(profiler, top)
+            if memory:
+                snapshot = tracemalloc.take_snapshot()
+                result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                result['allocations'] = [{'site': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                                         for stat in snapshot.statistics('lineno')[:top]]
+                if tracing:
+                    tracemalloc.stop()
+            with self.lock:
+                self.profiles.append(result)
+
+    ## ----------- Summaries ------------ ##
+    def summary(self, slowest=10):
+        """
+        Return a dict of everything recorded.
+
+        Parameters
+        ----------
+        slowest : int, optional
+            Number of slowest pages listed.
+        """
+        import numpy as np  # Only needed to summarize, recording stays import-light
+
+        with self.lock:
+            fetches = list(self.fetches)
+            parses = dict(self.parses)
+            stages = dict(self.stages)
+            events = dict(self.events)
+            profiles = list(self.profiles)
+
+        by_cache = {}
+        for fetch in fetches:
+            total = by_cache.setdefault(fetch['cache'], {'requests': 0, 'bytes': 0, 'seconds': 0.0})
+            total['requests'] += 1
+            total['bytes'] += fetch['bytes']
+            total['seconds'] += fetch['seconds']
+
+        latency = np.array([fetch['seconds'] for fetch in fetches])
+        hits = sum(total['requests'] for cache, total in by_cache.items() if cache in ('hit', 'revalidated'))
+        misses = sum(total['requests'] for cache, total in by_cache.items() if cache == 'miss')
+
+        return {
+            'fetch': {
+                'requests': len(fetches),
+                'bytes': int(sum(fetch['bytes'] for fetch in fetches)),
+                'seconds': float(latency.sum()),
+                'cache_hit_rate': hits / (hits + misses) if hits + misses else None,
+                'by_cache': by_cache,
+                'latency': {f'p{q}': float(np.percentile(latency, q)) for q in (50, 90, 99)} if len(latency) else {},
+                'slowest': sorted(fetches, key=lambda fetch: fetch['seconds'], reverse=True)[:slowest],
+            },
+            'parse': [{'stage': stage, 'name': name, 'count': count, 'seconds': seconds, 'rows': rows}
+                      for (stage, name), (count, seconds, rows) in sorted(parses.items())],
+            'stages': {name: {'count': count, 'seconds': seconds} for name, (count, seconds) in stages.items()},
+            'events': events,
+            'profiles': profiles,
+        }
+
+    def to_json(self, path=None, urls=True):
+        """
+        Return the summary as JSON, and write it to path if provided.
+
+        Parameters
+        ----------
+        path : str, optional
+            File the JSON is written to.
+        urls : bool, optional
+            Include every page fetched, not just the slowest.
+        """
+        summary = self.summary()
+        if urls:
+            with self.lock:
+                summary['fetch']['urls'] = list(self.fetches)
+        text = json.dumps(summary, indent=1)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, prefix='nfl'):
+        """Return the summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, doc, samples):
+            lines.append(f'# HELP {prefix}_{name} {doc}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for suffix, labels, value in samples:
+                label = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f'{prefix}_{name}{suffix}{{{label}}} {value}' if label else f'{prefix}_{name}{suffix} {value}')
+
+        by_cache = summary['fetch']['by_cache']
+        metric('fetch_requests_total', 'counter', 'Pages requested, by cache result.',
+               [('', {'cache': cache}, total['requests']) for cache, total in by_cache.items()])
+        metric('fetch_bytes_total', 'counter', 'Bytes of page content, by cache result.',
+               [('', {'cache': cache}, total['bytes']) for cache, total in by_cache.items()])
+        metric('fetch_seconds', 'summary', 'Time to get pages, by cache result.',
+               [(suffix, {'cache': cache}, total[key]) for cache, total in by_cache.items()
+                for suffix, key in (('_sum', 'seconds'), ('_count', 'requests'))])
+        metric('parse_seconds', 'summary', 'Time spent parsing tables.',
+               [(suffix, {'stage': parse['stage'], 'table': parse['name']}, parse[key])
+                for parse in summary['parse'] for suffix, key in (('_sum', 'seconds'), ('_count', 'count'))])
+        metric('parse_rows_total', 'counter', 'Rows produced by parsing tables.',
+               [('', {'stage': parse['stage'], 'table': parse['name']}, parse['rows']) for parse in summary['parse']])
+        metric('stage_seconds', 'summary', 'Time spent in each stage.',
+               [(suffix, {'stage': name}, total[key]) for name, total in summary['stages'].items()
+                for suffix, key in (('_sum', 'seconds'), ('_count', 'count'))])
+        metric('events_total', 'counter', 'Events counted during the run.',
+               [('', {'event': event}, count) for event, count in summary['events'].items()])
+        peaks = [(profile['name'], profile['peak_bytes']) for profile in summary['profiles'] if 'peak_bytes' in profile]
+        if peaks:
+            metric('peak_memory_bytes', 'gauge', 'Peak traced memory of profiled blocks.',
+                   [('', {'block': name}, peak) for name, peak in peaks])
+
+        return '\n'.join(lines) + '\n'
+
+
+def _top_functions(profiler, top):
+    """Top functions of a cProfile run by cumulative time."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    functions = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        functions.append({'function': f'{filename}:{line}({function})', 'calls': calls,
+                          'seconds': total, 'cumulative': cumulative})
+    return sorted(functions, key=lambda f: f['cumulative'], reverse=True)[:top]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_default_metrics = Metrics()
+
+
+def default_metrics():
+    """Return the metrics the scrapers record into."""
+    return _default_metrics
+
+
+def set_default_metrics(metrics):
+    """Record into another Metrics object, e.g. a fresh one for each run."""
+    global _default_metrics
+    _default_metrics = metrics
+
+
+def timed(stage):
+    """Decorator that times every call of a function as a stage of default_metrics()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with default_metrics().stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
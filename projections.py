@@ -1,138 +1,210 @@
 import pandas as pd
 import numpy as np
-from bs4 import BeautifulSoup
-import requests
 import re
 import datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions
-from selenium.webdriver.chrome.service import Service
+import time
+from collections import OrderedDict
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from cache import default_cache
+from fetch import Fetcher, get_page
+from metrics import default_metrics, timed
+from schemas import typed_frame
+from tables import concat_tables, iter_tables, team_id
+
+# Path to chromedriver, only needed when pages are rendered with selenium
+CHROMEDRIVER = os.environ.get('CHROMEDRIVER')
+
+SITE = 'https://www.pro-football-reference.com'
 
 
 class GetData:
     """
     This class facilitates the retrieval of data necessary to perform projections.
+
+    Pages are only fetched when a method first needs them and are kept in a small LRU keyed by
+    (season, page), so creating the object is instant and asking for a season that was already
+    used doesn't fetch its pages again. year_soup, off_soup and def_soup parse the pages of the
+    default season into BeautifulSoup objects on first access, page() returns the raw content.
+
+    Parameters
+    ----------
+    season : int, optional
+        Default season of the methods. Defaults to the current season.
+    year_soup, off_soup, def_soup : bs4.BeautifulSoup, str, bytes, optional
+        Pages of the default season to use instead of fetching them.
+    browser : bool, optional
+        Render the offense and defense pages with selenium.
+    max_pages : int, optional
+        Number of pages kept in memory.
     """
-    def __init__(self, season=None, year_soup=None, off_soup=None, def_soup=None) -> None:
-        # Set season
-        self.season = get_current_season() if season is None else season
+    PAGES = ('year', 'offense', 'defense')
+
+    def __init__(self, season=None, year_soup=None, off_soup=None, def_soup=None, browser=False,
+                 max_pages=12) -> None:
+        # Set season and whether pages are rendered with selenium
+        self.season = get_current_season() if season is None else int(season)
+        self.browser = browser
 
-        # Get soups
-        self.year_soup = year_soup if year_soup is not None else self.get_year_soup()
-        self.off_soup = off_soup if off_soup is not None else self.get_offense_soup()
-        self.def_soup = def_soup if def_soup is not None else self.get_defense_soup()
+        # Pages by (season, page), most recently used last
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._soups = {}  # Parsed pages by (season, page), see _soup()
+        for page, content in zip(self.PAGES, (year_soup, off_soup, def_soup)):
+            if content is not None:
+                self._remember(self.season, page, content)
 
 
     ## ----------- Get soups ------------ ##
-    def get_year_soup(self):
+    def page(self, page, season=None):
+        """
+        Get the content of a page, fetching it only the first time it is used.
+
+        Parameters
+        ----------
+        page : str
+            'year', 'offense' or 'defense'.
+        season : str, int, float, optional
+            Season (year) of the page. Defaults to the season of the object.
+        """
+        season = self.season if season is None else int(season)
+        key = (season, page)
+        if key in self._pages:
+            self._pages.move_to_end(key)
+            return self._pages[key]
+
+        getters = {'year': self.get_year_page, 'offense': self.get_offense_page, 'defense': self.get_defense_page}
+        if page not in getters:
+            raise ValueError(f'page must be one of {self.PAGES}, not {page!r}.')
+        return self._remember(season, page, getters[page](season))
+
+    def _remember(self, season, page, content):
+        self._pages[(int(season), page)] = content
+        self._pages.move_to_end((int(season), page))
+        while len(self._pages) > self.max_pages:
+            key, _ = self._pages.popitem(last=False)
+            self._soups.pop(key, None)
+        return content
+
+    def _soup(self, page, features, season=None):
+        """Parse a page with BeautifulSoup, once per version of its content."""
+        season = self.season if season is None else int(season)
+        content = self.page(page, season)
+        if not isinstance(content, (str, bytes)):
+            return content  # Already a soup
+
+        parsed = self._soups.get((season, page))
+        if parsed is None or parsed[0] is not content:
+            from bs4 import BeautifulSoup
+            parsed = self._soups[(season, page)] = (content, BeautifulSoup(content, features))
+        return parsed[1]
+
+    @property
+    def year_soup(self):
+        """BeautifulSoup of the year page of the default season."""
+        return self._soup('year', 'html.parser')
+
+    @year_soup.setter
+    def year_soup(self, content):
+        self._remember(self.season, 'year', content)
+
+    @property
+    def off_soup(self):
+        """BeautifulSoup of the offense page of the default season."""
+        return self._soup('offense', 'lxml')
+
+    @off_soup.setter
+    def off_soup(self, content):
+        self._remember(self.season, 'offense', content)
+
+    @property
+    def def_soup(self):
+        """BeautifulSoup of the defense page of the default season."""
+        return self._soup('defense', 'lxml')
+
+    @def_soup.setter
+    def def_soup(self, content):
+        self._remember(self.season, 'defense', content)
+
+    def get_year_page(self, season=None):
+        """Get page content associated with yearly season standings."""
+        season = self.season if season is None else int(season)
+        return get_page(f'{SITE}/years/{season}/')
+
+    def get_year_soup(self, season=None):
         """Get soup associated with yearly season standings."""
-        url = f'https://www.pro-football-reference.com/years/{self.season}/'
-        page = requests.get(url)
-        return BeautifulSoup(page.content, 'html.parser')
-    
-    def get_offense_soup(self):
+        return self._soup('year', 'html.parser', season)
+
+    def get_offense_page(self, season=None):
+        """Get page content associated with yearly team offensive stats."""
+        season = self.season if season is None else int(season)
+
+        # The offense tables are on the year page, use it if it is already in memory
+        year = self._pages.get((season, 'year'))
+        if not self.browser and isinstance(year, bytes) and b'id="team_stats"' in year:
+            return year
+        return self.__get_stats_page(f'{SITE}/years/{season}/', table_id='team_stats', wait_id='div_team_stats')
+
+    def get_offense_soup(self, season=None):
         """Get soup associated with yearly team offensive stats."""
-        url = f'https://www.pro-football-reference.com/years/{self.season}/'
-
-        ## I think javascript is used to render this page, need to use selenium
-        # Initiate webdriver and get site
-        s = Service('/opt/homebrew/bin/chromedriver')
-        driver = webdriver.Chrome(service=s)
-        driver.get(url)
-
-        # Wait for the critical elements of page to load
-        try:
-            WebDriverWait(driver, 5).until(expected_conditions.visibility_of_element_located((By.ID, 'div_team_stats')))
-        except:
-            driver.quit()
-            raise LookupError('Unable to retrieve the offense stats page.')
-        
-        # Turn into soup
-        # time.sleep(0.5)
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        driver.quit()
+        return self._soup('offense', 'lxml', season)
 
-        return soup
-    
-    def get_defense_soup(self):
+    def get_defense_page(self, season=None):
+        """Get page content associated with yearly team defensive stats."""
+        season = self.season if season is None else int(season)
+        return self.__get_stats_page(f'{SITE}/years/{season}/opp.htm', table_id='team_stats', wait_id='rushing')
+
+    def get_defense_soup(self, season=None):
         """Get soup associated with yearly team defensive stats."""
-        url = f'https://www.pro-football-reference.com/years/{self.season}/opp.htm'
-
-        ## I think javascript is used to render this page, need to use selenium
-        # Initiate webdriver and get site
-        s = Service('/opt/homebrew/bin/chromedriver')
-        driver = webdriver.Chrome(service=s)
-        driver.get(url)
-
-        # Wait for the critical elements of page to load
-        try:
-            WebDriverWait(driver, 5).until(expected_conditions.visibility_of_element_located((By.ID, 'rushing')))
-            # WebDriverWait(driver, 5).until(expected_conditions.visibility_of_element_located((By.ID, 'all_passing')))
-        except:
-            driver.quit()
-            raise LookupError('Unable to retrieve the defense page.')
-        
-        # Turn into soup
-        # time.sleep(0.5)
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        driver.quit()
+        return self._soup('defense', 'lxml', season)
 
-        return soup
+    def __get_stats_page(self, url, table_id, wait_id):
+        """
+        Get a page whose tables are revealed with javascript.
+
+        The site ships these tables inside HTML comments, which tables.iter_tables() reads
+        directly, so the raw page is used unless browser=True. Selenium is only used as a
+        fallback if the raw page is missing the tables.
+        """
+        if not self.browser:
+            page = get_page(url)
+            if f'id="{table_id}"'.encode() in page:
+                return page
+            if not selenium_available():
+                raise LookupError(f'Unable to find the {table_id} table on {url}.')
+
+        return render_page(url, wait_id)
 
 
     ## ----------- Team Level Data Section ------------- ##
+    @timed('team_links')
     def team_links(self, soup=None, season=None):
         """
         Get the webpage links for all teams.
 
         Parameters
         ----------
-        soup : bs4.BeautifulSoup, optional
-            Soup object from 'https://www.pro-football-reference.com/years/{season}/' request.
+        soup : bs4.BeautifulSoup, str, bytes, optional
+            Soup object (or page content) from 'https://www.pro-football-reference.com/years/{season}/' request.
         season : str, int, float, optional
-            Season (year) that is desired to be used if soup is None. Defaults to current year.
+            Season (year) that is desired to be used if soup is None. Defaults to the season of the object.
         """
-        # Consider inputted season
-        is_season_change = False
-        if season is not None:
-            is_season_change = (int(season) == int(self.season))
-            self.season = season
-            
-        # Generate soup if not inputted
-        if soup is not None:
-            self.year_soup = soup
-        elif is_season_change:
-            self.year_soup = self.get_year_soup()
-            
-        # Save base url for creating links
-        base_url = 'https://www.pro-football-reference.com'
-
-        # Create afc and nfc tables
-        afc = self.year_soup.find('table', attrs={'id': 'AFC'})
-        nfc = self.year_soup.find('table', attrs={'id': 'NFC'})
-
-        # Look thru tables for items
+        # Use the inputted page, otherwise the (memoized) page of the season
+        if soup is None:
+            soup = self.page('year', season)
+
+        # Look thru afc and nfc tables for items
         teams = {}  # Initialize dict
-        for conf in [afc, nfc]:
-            for tr in conf.find_all('tr'):
-                # Skip line if first th='Tm'
-                try:
-                    tr_text = tr.find('th').text
-                    if tr_text=='Tm': continue
-                except:
-                    pass  # Ignore and proceed
-                
-                # Loop thru each row
-                team = ''  # Initialize team
-                for td in tr.find_all(['th', 'td'], attrs={'data-stat': 'team'}):
-                    value = td.text
-
-                    link = base_url + td.find('a')['href']  # Get team page link
-                    team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
-                    teams[team] = link
+        for conf in iter_tables(soup, ids=['AFC', 'NFC']):
+            names, links = conf.columns.get('team', []), conf.links.get('team', [])
+            for value, link in zip(names, links):
+                if link is None: continue  # Division and header rows
+
+                team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
+                teams[team] = SITE + link  # Get team page link
 
         # Make dataframe
         teams = pd.Series(teams).to_frame().rename({0: 'team_link'}, axis=1)
@@ -143,121 +215,84 @@ class GetData:
 
         return teams
     
+    @timed('team_standings')
     def team_standings(self, soup=None, season=None):
         """
         Get the nfl standings.
 
         Parameters
         ----------
-        soup : bs4.BeautifulSoup, optional
-            Soup object from 'https://www.pro-football-reference.com/years/{season}/' request. If no 
+        soup : bs4.BeautifulSoup, str, bytes, optional
+            Soup object (or page content) from 'https://www.pro-football-reference.com/years/{season}/' request. If no 
             input is entered, the soup object is created.
         season : str, int, float, optional
-            Season (year) that is desired to be used if soup is None. Defaults to current year.
+            Season (year) that is desired to be used if soup is None. Defaults to the season of the object.
         """
-        # Consider inputted season
-        is_season_change = False
-        if season is not None:
-            is_season_change = (int(season) != int(self.season))
-            self.season = season
-            
-        # Generate soup if not inputted
-        if soup is not None:
-            self.year_soup = soup
-        elif is_season_change:
-            self.year_soup = self.get_year_soup()
-
-        # Create afc and nfc tables
-        afc = self.year_soup.find('table', attrs={'id': 'AFC'})
-        nfc = self.year_soup.find('table', attrs={'id': 'NFC'})
-
-        # Look thru tables for items
-        teams = {}  # Initialize dict
+        # Use the inputted page, otherwise the (memoized) page of the season
+        if soup is None:
+            soup = self.page('year', season)
+
+        # Look thru afc and nfc tables for team rows
+        confs, teams, divisions = [], [], []
         division = ''  # Initialize division
-        for conf in [afc, nfc]:
-            for tr in conf.find_all('tr'):
-                
-                # Skip line if first th='Tm'
-                try:
-                    tr_text = tr.find('th').text
-                    if tr_text=='Tm': continue
-                except:
-                    pass  # Ignore and proceed
-                
-                # Loop thru each row
-                team = ''  # Initialize team
-                for td in tr.find_all(['th', 'td']):
-                    stat = td.get('data-stat')
-                    value = td.text
-
-                    # If 'onecell' this is division header
-                    if stat=='onecell':
-                        division = value
-                        continue
-
-                    # If team, get link, division, and set as key in teams dict
-                    if stat=='team':
-                        team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
-
-                        # Get link and extract team_id
-                        local_link = td.find('a')['href']
-                        team_id = ''
-                        if local_link is not None:
-                            find_id = re.search(r'teams/([^/]+)/', local_link)  # Get team page link
-                            if find_id is not None: team_id = find_id.groups()[0]
-                        
-                        # Set id and division
-                        teams[team] = { 'id': team_id, 'division': division}
-                        continue
-
-                    # Apply each stat to the team dict
-                    teams[team][stat] = value
-
-        return pd.DataFrame(teams).T
+        for conf in iter_tables(soup, ids=['AFC', 'NFC']):
+            rows = []
+            for i in range(len(conf)):
+                # If 'onecell' this is division header
+                if conf.columns.get('onecell', [None] * len(conf))[i] is not None:
+                    division = conf.columns['onecell'][i]
+                    continue
 
+                # Skip header rows
+                value = conf.columns['team'][i]
+                if value is None or value == 'Tm':
+                    continue
+
+                # Keep team, and its division
+                rows.append(i)
+                teams.append(re.sub(r'[^A-Za-z0-9 ]', '', str(value)))  # Strip unnecessary characters
+                divisions.append(division)
+            confs.append(conf.take(rows))
+
+        # Build typed columns of every team
+        start = time.perf_counter()
+        conf = concat_tables(confs)
+        columns = {'id': [team_id(link) for link in conf.links.get('team', [])], 'division': divisions}
+        columns.update((stat, values) for stat, values in conf.columns.items() if stat not in ('onecell', 'team'))
+
+        df = typed_frame(columns, teams, 'Standings')
+        default_metrics().record_parse('frame', 'Standings', time.perf_counter() - start, len(df))
+        return df
+
+    @timed('team_offense_stats')
     def team_offense_stats(self, soup=None, season=None):
         """
         Get the nfl team offensive stats.
 
         Parameters
         ----------
-        soup : bs4.BeautifulSoup, optional
-            Soup object from 'https://www.pro-football-reference.com/years/{season}/' request. If no 
+        soup : bs4.BeautifulSoup, str, bytes, optional
+            Soup object (or page content) from 'https://www.pro-football-reference.com/years/{season}/' request. If no 
             input is entered, the soup object is created.
         season : str, int, float, optional
-            Season (year) that is desired to be used if soup is None. Defaults to current year.
+            Season (year) that is desired to be used if soup is None. Defaults to the season of the object.
 
         Returns
         -------
         list of pd.DataFrame
             List of length=10 pertaining to the various team defensive stat categories.
         """
-        # Consider inputted season
-        is_season_change = False
-        if season is not None:
-            is_season_change = (int(season) != int(self.season))
-            self.season = season
-            
-        # Generate soup if not inputted
-        if soup is not None:
-            self.off_soup = soup
-        elif is_season_change:
-            self.off_soup = self.get_offense_soup()
-
-        # Fetch the correct div
-        div_id = ['all_team_stats', 'all_passing', 'all_rushing', 'all_returns', 'all_kicking', 'all_punting',
-                  'all_team_scoring', 'all_team_conversions', 'all_drives']
-        div_tbls = self.off_soup.find_all('div', attrs={'class': 'table_wrapper'})
+        # Use the inputted page, otherwise the (memoized) page of the season
+        if soup is None:
+            soup = self.page('offense', season)
 
-        stat_dict = {}  # Initiate dict of dataframes
-        for div_tbl in div_tbls:
-            # Skip if table not part of the list of ids
-            if div_tbl.get('id') not in div_id:
-                continue
+        # Fetch the correct tables (including the ones inside comments)
+        tbl_ids = ['team_stats', 'passing', 'rushing', 'returns', 'kicking', 'punting',
+                   'team_scoring', 'team_conversions', 'drives']
 
-            tbl = div_tbl.find('table')
-            if tbl is None: continue  # Some table are None, skip them
-            tbl_name = tbl.find('caption').text
+        stat_dict = {}  # Initiate dict of dataframes
+        for tbl in iter_tables(soup, ids=tbl_ids):
+            tbl_name = tbl.caption
 
             # Get the tables
             non_std_tables = []
@@ -268,47 +303,35 @@ class GetData:
         
         return stat_dict
 
+    @timed('team_defense_stats')
     def team_defense_stats(self, soup=None, season=None):
         """
         Get the nfl team defensive stats.
 
         Parameters
         ----------
-        soup : bs4.BeautifulSoup, optional
-            Soup object from 'https://www.pro-football-reference.com/years/{season}/' request. If no 
+        soup : bs4.BeautifulSoup, str, bytes, optional
+            Soup object (or page content) from 'https://www.pro-football-reference.com/years/{season}/' request. If no 
             input is entered, the soup object is created.
         season : str, int, float, optional
-            Season (year) that is desired to be used if soup is None. Defaults to current year.
+            Season (year) that is desired to be used if soup is None. Defaults to the season of the object.
 
         Returns
         -------
         list of pd.DataFrame
             List of length=10 pertaining to the various team defensive stat categories.
         """
-        # Consider inputted season
-        is_season_change = False
-        if season is not None:
-            is_season_change = (int(season) != int(self.season))
-            self.season = season
-            
-        # Generate soup if not inputted
-        if soup is not None:
-            self.def_soup = soup
-        elif is_season_change:
-            self.def_soup = self.get_defense_soup()
-
-        # Uses def_soup
-        div_tbls = self.def_soup.find_all('div', attrs={'class': 'table_wrapper'})
-        
+        # Use the inputted page, otherwise the (memoized) page of the season
+        if soup is None:
+            soup = self.page('defense', season)
+
+        # Uses def_soup, including the tables inside comments
         stat_dict = {}  # Initiate dict of dataframes
-        for div_tbl in div_tbls:
-            tbl = div_tbl.find('table')
-            if tbl is None: continue  # Some tables are None, skip them
-            try:
-                tbl_name = tbl.find('caption').text
-            except:
+        for tbl in iter_tables(soup):
+            tbl_name = tbl.caption
+            if tbl_name is None:
                 tbl_name = "UNKNOWN"
-                print('Excepted')
+                default_metrics().increment('tables_without_caption')
 
             # Get the tables
             non_std_tables = ['Team Advanced Defense Table']
@@ -325,44 +348,28 @@ class GetData:
         
         Params
         ------
-        tbl : html table
-            Div table that is looped thru in team_defense_stats().
+        tbl : tables.Table
+            Table that is looped thru in team_defense_stats().
         """
-        # Set name of table
-        tbl_name = tbl.find('caption').text
-
-        # Get each row
-        teams = {}
-        for td in tbl.find_all('td'):
-            stat = td.get('data-stat')
-            value = td.text
-
-            if td.name=='th': 
-                if stat != 'team':
-                    continue  # Only use th if data-stat is team
-            if stat=='team':
-                team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
-
-                # Sometimes summary rows exist, break the for loop if this is true
-                if (team == 'Avg Team') or (team == 'League Total'):
-                    break
-
-                # Get link and extract team_id
-                local_link = td.find('a')['href']
-                team_id = ''
-                if local_link is not None:
-                    find_id = re.search(r'teams/([^/]+)/', local_link)  # Get team page link
-                    if find_id is not None: team_id = find_id.groups()[0]
-                
-                # Set id and division
-                teams[team] = {'id': team_id}
-                continue
-
-            # Apply each stat to the team dict
-            teams[team][stat] = value
-
-        # Turn into dataframe
-        df = pd.DataFrame(teams).T
+        # Set name of table and drop header rows within the body
+        tbl_name = tbl.caption
+        tbl = tbl.body()
+
+        # Find the team rows, summary rows come after the teams
+        rows, teams = [], []
+        for i, value in enumerate(tbl.columns.get('team', [])):
+            if value is None or value == 'Tm':
+                continue  # Header rows
+            team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
+
+            # Sometimes summary rows exist, break the for loop if this is true
+            if (team == 'Avg Team') or (team == 'League Total'):
+                break
+            rows.append(i)
+            teams.append(team)
+
+        # Turn into dataframe, the rank is the only th cell and it isn't used
+        df = GetData.__typed_frame(tbl.take(rows), teams, tbl_name, skip=('ranker', 'team'))
         df.name = tbl_name
 
         return df
@@ -374,58 +381,217 @@ class GetData:
 
         Params
         ------
-        tbl : html table
-            Div table that is looped thru in team_defense_stats().
+        tbl : tables.Table
+            Table that is looped thru in team_defense_stats().
         """
         # Set name of table
-        tbl_name = tbl.find('caption').text
-
-        # Get each row
-        teams = {}
-        for tr in tbl.find_all('tr'):
-            row = tr.get('data-row')   # Get data row
+        tbl_name = tbl.caption
 
+        # Find the team rows
+        rows, teams = [], []
+        for i in range(len(tbl)):
             # Skip if data-row doesn't exist
-            if row is None:
+            if tbl.row_attrs[i].get('data-row') is None:
                 continue
 
-            for td in tr.find_all(['td', 'th']):
-                stat = td.get('data-stat')
-                value = td.text
-
-                # if td.name=='th': 
-                #     if stat != 'team':
-                #         continue  # Only use th if data-stat is team
-                if stat=='team':
-                    team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
-
-                    # Sometimes summary rows exist, break the for loop if this is true
-                    if (team == 'Avg Team') or (team == 'League Total'):
-                        break
-
-                    # Get link and extract team_id
-                    local_link = td.find('a')['href']
-                    team_id = ''
-                    if local_link is not None:
-                        find_id = re.search(r'teams/([^/]+)/', local_link)  # Get team page link
-                        if find_id is not None: team_id = find_id.groups()[0]
-                    
-                    # Set id and division
-                    teams[team] = {'id': team_id}
-                    continue
+            value = tbl.columns.get('team', [None] * len(tbl))[i]
+            team = re.sub(r'[^A-Za-z0-9 ]', '', str(value))  # Strip unnecessary characters
 
-                # Apply each stat to the team dict
-                teams[team][stat] = value
+            # Sometimes summary rows exist, skip the row if this is true
+            if (team == 'Avg Team') or (team == 'League Total'):
+                continue
+            rows.append(i)
+            teams.append(team)
 
         # Turn into dataframe
-        df = pd.DataFrame(teams).T
+        df = GetData.__typed_frame(tbl.take(rows), teams, tbl_name, skip=('team',))
         df.name = tbl_name
 
         return df
 
+    @staticmethod
+    def __typed_frame(tbl, teams, tbl_name, skip):
+        """Build the typed dataframe of a table's team rows, with the team id first."""
+        start = time.perf_counter()
+        columns = {'id': [team_id(link) for link in tbl.links.get('team', [None] * len(tbl))]}
+        columns.update((stat, values) for stat, values in tbl.columns.items()
+                       if stat not in skip and any(value is not None for value in values))
+        df = typed_frame(columns, teams, tbl_name)
+        default_metrics().record_parse('frame', tbl_name, time.perf_counter() - start, len(df))
+        return df
+
     ## ----------- END Team Level Data Section ------------- ##
 
 
+## ----------- Multi-season loading ------------- ##
+def iter_seasons(seasons, max_workers=4, processes=None, requests_per_minute=30, site=SITE):
+    """
+    Fetch the pages of many seasons concurrently and parse them in a process pool, yielding
+    (season, frames) as each season finishes so work on early seasons can start right away.
+
+    frames is a dict with the 'standings', 'offense' and 'defense' frames of the season, see
+    load_seasons(). Pages come from the raw html (and the http cache), selenium is never used.
+
+    Parameters
+    ----------
+    seasons : iterable of int
+        Seasons (years) to load.
+    max_workers : int, optional
+        Threads fetching pages.
+    processes : int, optional
+        Processes parsing pages. Defaults to the number of cpus.
+    requests_per_minute : float, optional
+        Rate limit shared by all fetching threads.
+    site : str, optional
+        Base url of the site, pages are fetched from {site}/years/{season}/.
+    """
+    # The year page holds both the standings and the offense tables
+    urls = {}
+    for season in seasons:
+        urls[f'{site}/years/{int(season)}/'] = (int(season), 'year')
+        urls[f'{site}/years/{int(season)}/opp.htm'] = (int(season), 'defense')
+
+    # Parsers are started by a fork server rather than forked from this process, whose fetching
+    # threads may hold the metrics, rate limiter or cache locks at the time of the fork
+    pages = {}
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('forkserver')) as pool, \
+            Fetcher(max_workers=max_workers, requests_per_minute=requests_per_minute) as fetcher:
+        # Hand a season to the parsers once both of its pages are in
+        parsing = set()
+        for url, content in fetcher.map(urls):
+            season, page = urls[url]
+            pages.setdefault(season, {})[page] = content
+            if len(pages[season]) == 2:
+                parsing.add(pool.submit(_parse_season, season, **pages.pop(season)))
+
+            # Pass on the seasons that are already parsed
+            done = {future for future in parsing if future.done()}
+            parsing -= done
+            for future in done:
+                yield future.result()
+
+        while parsing:
+            done, parsing = wait(parsing, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def load_seasons(seasons, max_workers=4, processes=None, requests_per_minute=30, site=SITE):
+    """
+    Load the standings, offense and defense stats of many seasons.
+
+    Returns a dict of three frames indexed by (season, team_id), sorted by season:
+        'standings' : one column per standings stat, plus the team name and division.
+        'offense'   : columns (table caption, stat) of every offensive table.
+        'defense'   : columns (table caption, stat) of every defensive table.
+
+    Parameters are the same as iter_seasons().
+    """
+    frames = {'standings': [], 'offense': [], 'defense': []}
+    for _, season_frames in iter_seasons(seasons, max_workers, processes, requests_per_minute, site):
+        for kind, df in season_frames.items():
+            frames[kind].append(df)
+
+    return {kind: _concat_seasons(dfs) for kind, dfs in frames.items()}
+
+
+def _parse_season(season, year, defense):
+    """Build the frames of a season from its raw pages, run in the parsing processes."""
+    data = GetData(season, year_soup=year, off_soup=year, def_soup=defense)
+
+    standings = data.team_standings()
+    standings.insert(0, 'team', standings.index.astype(str))
+    frames = {'standings': _season_index(standings, season),
+              'offense': _wide_tables(data.team_offense_stats(), season),
+              'defense': _wide_tables(data.team_defense_stats(), season)}
+    return season, frames
+
+
+def _season_index(df, season):
+    """Index the rows of a team frame by (season, team_id) instead of team name."""
+    index = pd.MultiIndex.from_arrays([np.full(len(df), season, dtype='int16'), df['id'].astype(str)],
+                                      names=['season', 'team_id'])
+    return df.drop(columns='id').set_axis(index)
+
+
+def _wide_tables(stat_dict, season):
+    """Put the tables of a page side by side, with (table caption, stat) columns."""
+    tables = {caption: _season_index(df, season) for caption, df in stat_dict.items()}
+    if not tables:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=['season', 'team_id']))
+    return pd.concat(tables, axis=1, names=['table', 'stat'])
+
+
+def _concat_seasons(dfs):
+    """Stack the frames of many seasons, keeping categorical columns categorical."""
+    if not dfs:
+        return pd.DataFrame()
+    df = pd.concat(dfs).sort_index(level='season', sort_remaining=False, kind='stable')
+    for column in df.columns:
+        if df[column].dtype == object and any(isinstance(d[column].dtype, pd.CategoricalDtype)
+                                              for d in dfs if column in d):
+            df[column] = df[column].astype('category')
+    return df
+
+## ----------- END Multi-season loading ------------- ##
+
+
+
+def selenium_available():
+    """Return True if selenium is installed."""
+    return importlib.util.find_spec('selenium') is not None
+
+
+def render_page(url, wait_id, chromedriver=CHROMEDRIVER):
+    """
+    Render a page with selenium (Chrome) and return the page source. Selenium is an optional
+    dependency that is only needed for this.
+
+    Parameters
+    ----------
+    url : str
+        Page to render.
+    wait_id : str
+        Id of an element that is visible once the page has rendered.
+    chromedriver : str, optional
+        Path to chromedriver. If None, selenium finds it.
+    """
+    # Use the rendered page if it is cached
+    cache = default_cache()
+    start = time.perf_counter()
+    rendered = cache.lookup(url + '#rendered')
+    if rendered is not None:
+        default_metrics().record_fetch(url, time.perf_counter() - start, len(rendered), 'hit')
+        return rendered
+
+    if not selenium_available():
+        raise ImportError('selenium is required to render pages with a browser.')
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.chrome.service import Service
+
+    # Initiate webdriver and get site
+    s = Service(chromedriver) if chromedriver else Service()
+    driver = webdriver.Chrome(service=s)
+    driver.get(url)
+
+    # Wait for the critical elements of page to load
+    try:
+        WebDriverWait(driver, 5).until(expected_conditions.visibility_of_element_located((By.ID, wait_id)))
+    except:
+        driver.quit()
+        raise LookupError(f'Unable to retrieve {url}.')
+
+    # Keep the rendered page
+    source = driver.page_source.encode()
+    driver.quit()
+    default_metrics().record_fetch(url, time.perf_counter() - start, len(source), 'rendered')
+    cache.store(url + '#rendered', source)
+
+    return source
+
 
 def get_current_season():
     """Return the current season that is either active or has passed."""
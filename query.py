@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+
+class GameIndex:
+    """
+    In-memory index of the game archive for head-to-head, team, season and score queries.
+
+    Games are kept in date order and every index is a sorted array of keys next to the game
+    rows of each key, so a query is a binary search and a slice instead of a mask over every
+    game. The *_rows() methods return the row positions, the other methods the games.
+
+    Parameters
+    ----------
+    games : pd.DataFrame
+        Games with a season column, i.e. the output of game_data.add_stats() or
+        storage.GameArchive().load().
+    """
+    def __init__(self, games) -> None:
+        self.teams = pd.Index([], dtype=object)
+        self.games = games.iloc[:0]
+        self._build(games)
+
+    def __len__(self):
+        return len(self.games)
+
+    ## ----------- Queries ------------ ##
+    def team_rows(self, team, start=None, end=None):
+        """
+        Rows of a team's games, optionally between two dates (inclusive).
+
+        Parameters
+        ----------
+        team : str
+            Team id.
+        start, end : str, datetime, optional
+            First and last game date.
+        """
+        rows = self._team.find(self._code(team))
+        if start is None and end is None:
+            return rows
+
+        # A team's rows are in date order, so the date range is a slice of them
+        dates = self._dates[rows]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = len(rows) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side='right')
+        return rows[lo:hi]
+
+    def pair_rows(self, team_a, team_b):
+        """Rows of the games between two teams, whoever won."""
+        a, b = self._code(team_a), self._code(team_b)
+        if a < 0 or b < 0:
+            return np.array([], dtype='int64')
+        return self._pair.find(self._pair_key(a, b))
+
+    def season_rows(self, season):
+        """Rows of the games of a season."""
+        return self._season.find(int(season))
+
+    def score_rows(self, pts_win, pts_lose):
+        """Rows of the games that ended pts_win to pts_lose."""
+        return self._score.find(int(pts_win) * 1024 + int(pts_lose))
+
+    def team(self, team, start=None, end=None):
+        """Games of a team, optionally between two dates (inclusive)."""
+        return self.games.iloc[self.team_rows(team, start, end)]
+
+    def head_to_head(self, team_a, team_b):
+        """Games between two teams, whoever won."""
+        return self.games.iloc[self.pair_rows(team_a, team_b)]
+
+    def season(self, season):
+        """Games of a season."""
+        return self.games.iloc[self.season_rows(season)]
+
+    def score(self, pts_win, pts_lose):
+        """Games that ended pts_win to pts_lose."""
+        return self.games.iloc[self.score_rows(pts_win, pts_lose)]
+
+    ## ----------- Updates ------------ ##
+    def extend(self, games):
+        """
+        Add new games to the index. Games whose boxscore is already indexed are skipped.
+
+        Games played on or after the last indexed date are merged into the existing indexes.
+        Older games change the date order, so the indexes are rebuilt.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            New games, with the same columns as the indexed games.
+        """
+        if 'boxscore' in games and len(self.games):
+            games = games[~games['boxscore'].isin(set(self.games['boxscore'].dropna()))]
+        if not len(games):
+            return 0
+
+        games = games.sort_values('game_date', kind='stable')
+        if len(self.games) and games['game_date'].iloc[0] < self.games['game_date'].iloc[-1]:
+            self._build(pd.concat([self.games, games]))
+            return len(games)
+
+        # New rows come after every existing row, so they go at the end of each key's rows
+        first = len(self.games)
+        self.games = pd.concat([self.games, games.reset_index(drop=True)], ignore_index=True)
+        self._dates = self.games['game_date'].to_numpy()
+        self._index(games, first)
+        return len(games)
+
+    def _build(self, games):
+        self.teams = pd.Index([], dtype=object)
+        self.games = games.sort_values('game_date', kind='stable').reset_index(drop=True)
+        self._dates = self.games['game_date'].to_numpy()
+        self._team, self._pair, self._season, self._score = (_SortedKeys() for _ in range(4))
+        self._index(self.games, 0)
+
+    def _index(self, games, first):
+        """Add games, which are rows first, first + 1, ... of self.games, to every index."""
+        winner, loser = games['winner_id'].astype(str), games['loser_id'].astype(str)
+        new = pd.Index(pd.concat([winner, loser]).unique()).difference(self.teams, sort=False)
+        self.teams = self.teams.append(new)
+        w, l = self.teams.get_indexer(winner), self.teams.get_indexer(loser)
+        rows = np.arange(first, first + len(games))
+
+        other = w != l  # A game is only listed once for a team
+        self._team.extend(np.concatenate([w, l[other]]), np.concatenate([rows, rows[other]]))
+        self._pair.extend(self._pair_key(w, l), rows)
+        self._season.extend(games['season'].to_numpy(dtype='int64'), rows)
+        self._score.extend(_score_key(games['pts_win'], games['pts_lose']), rows)
+
+    def _code(self, team):
+        return self.teams.get_loc(team) if team in self.teams else -1
+
+    def _pair_key(self, a, b):
+        return np.minimum(a, b) * 4096 + np.maximum(a, b)
+
+
+class _SortedKeys:
+    """Sorted keys with the row of each key, rows of the same key stay in the order they were added."""
+    def __init__(self) -> None:
+        self.keys = np.array([], dtype='int64')
+        self.rows = np.array([], dtype='int64')
+
+    def find(self, key):
+        lo, hi = np.searchsorted(self.keys, key, side='left'), np.searchsorted(self.keys, key, side='right')
+        return self.rows[lo:hi]
+
+    def extend(self, keys, rows):
+        keys, rows = np.asarray(keys, dtype='int64'), np.asarray(rows, dtype='int64')
+        order = np.lexsort((rows, keys))
+        keys, rows = keys[order], rows[order]
+
+        # Merge into the existing keys, after any equal keys
+        at = np.searchsorted(self.keys, keys, side='right')
+        self.keys = np.insert(self.keys, at, keys)
+        self.rows = np.insert(self.rows, at, rows)
+
+
+def _score_key(pts_win, pts_lose):
+    """Single integer key of a score, missing points get key -1."""
+    pts_win = pd.to_numeric(pts_win, errors='coerce')
+    pts_lose = pd.to_numeric(pts_lose, errors='coerce')
+    key = np.asarray(pts_win, dtype='float64') * 1024 + np.asarray(pts_lose, dtype='float64')
+    return np.nan_to_num(key, nan=-1).astype('int64')
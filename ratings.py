@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+
+class Elo:
+    """
+    Elo ratings of every team over the game history, optionally adjusted for margin of victory.
+
+    Teams are mapped to integer codes and ratings are kept in a numpy array. A team plays at
+    most once per day, so all games of a day are rated together from the ratings before that
+    day and only the days are looped over.
+
+    Parameters
+    ----------
+    k : float, optional
+        Rating points moved by a game with an expected result of 50%.
+    home_field : float, optional
+        Rating points added to the home team when predicting a game.
+    revert : float, optional
+        Share of the way each rating moves back to the mean at the start of a season.
+    mean : float, optional
+        Rating of new teams and the mean ratings revert to.
+    mov : bool, optional
+        Scale rating changes by the margin of victory (the multiplier used by FiveThirtyEight).
+    """
+    def __init__(self, k=20, home_field=65, revert=1/3, mean=1500, mov=True) -> None:
+        self.k = k
+        self.home_field = home_field
+        self.revert = revert
+        self.mean = mean
+        self.mov = mov
+
+        # Rating of each team code, teams[i] is the team id of code i
+        self.teams = pd.Index([], dtype=object)
+        self.elo = np.array([], dtype='float64')
+        self.season = None
+        self.last_date = None
+        self.last_day = None  # Games rated on last_date and the state before them, see update()
+        self.history = pd.DataFrame()
+
+    @property
+    def ratings(self):
+        """Current rating of every team, highest first."""
+        return pd.Series(self.elo, index=self.teams, name='elo').sort_values(ascending=False)
+
+    def fit(self, games):
+        """
+        Rate every game from scratch.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column, i.e. the output of game_data.add_stats().
+        """
+        self.teams = pd.Index([], dtype=object)
+        self.elo = np.array([], dtype='float64')
+        self.season = None
+        self.last_date = None
+        self.last_day = None  # Games rated on last_date and the state before them, see update()
+        self.history = pd.DataFrame()
+        return self.update(games)
+
+    def update(self, games):
+        """
+        Rate games played after the last rated game, continuing from the current ratings.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column. Games before the last rated date and games of that date
+            that were already rated (by boxscore) are skipped, so the whole archive can be passed
+            after new games are appended to it. A late game of the last rated day rolls the
+            ratings back to before that day and rates the whole day again, as fit() would.
+        """
+        _check_games(games)
+        if self.last_date is not None:
+            dates = games['game_date']
+            day_games, elo, season = self.last_day
+            late = (dates == self.last_date).to_numpy()
+            late[late] = ~_game_keys(games[late]).isin(set(_game_keys(day_games))).to_numpy()
+            games = games[(dates > self.last_date).to_numpy() | late]
+            if late.any():
+                # Roll back to before the last day
+                self.elo = np.concatenate([elo, np.full(len(self.teams) - len(elo), float(self.mean))])
+                self.season = season
+                self.history = self.history.iloc[:len(self.history) - len(day_games)]
+                games = pd.concat([day_games, games])
+        games = games.sort_values('game_date', kind='stable')
+        if not len(games):
+            return self
+
+        # Integer codes of the teams, new teams start at the mean
+        ids = pd.Index(pd.concat([games['winner_id'], games['loser_id']]).astype(str).unique())
+        teams = self.teams.append(ids.difference(self.teams, sort=False))
+        self.elo = np.concatenate([self.elo, np.full(len(teams) - len(self.teams), float(self.mean))])
+        self.teams = teams
+        winner = teams.get_indexer(games['winner_id'].astype(str))
+        loser = teams.get_indexer(games['loser_id'].astype(str))
+
+        # Result of the winner (ties are half a win) and home field of the winner.
+        # home_win is 0.5 for ties, where it isn't known who was home, so they are played as neutral
+        pts_win = games['pts_win'].to_numpy(dtype='float64', na_value=np.nan)
+        pts_lose = games['pts_lose'].to_numpy(dtype='float64', na_value=np.nan)
+        tie = pts_win == pts_lose
+        result = np.where(tie, 0.5, 1.0)
+        home_win = games['home_win'].to_numpy(dtype='float64', na_value=0.5)
+        home = np.select([home_win == 1, home_win == 0], [self.home_field, -self.home_field], 0.0)
+
+        # Margin of victory multiplier k * ln(margin + 1) * 2.2 / (diff * 0.001 + 2.2), split into the
+        # part known up front and the rating difference coefficient. Ties aren't scaled (ln(1) is 0)
+        if self.mov:
+            margin = np.nan_to_num(np.abs(pts_win - pts_lose), nan=0.0)
+            scale = np.where(tie, self.k, self.k * np.log(margin + 1) * 2.2)
+            autocorr = np.where(tie, 0.0, 0.001)
+            base = np.where(tie, 1.0, 2.2)
+        else:
+            scale = np.full(len(games), float(self.k))
+            autocorr = np.zeros(len(games))
+            base = np.ones(len(games))
+
+        seasons = games['season'].to_numpy()
+        dates = games['game_date'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        ends = np.r_[starts[1:], len(games)]
+
+        elo_win = np.empty(len(games))
+        elo_lose = np.empty(len(games))
+        elo = self.elo
+        for start, end in zip(starts, ends):
+            if start == starts[-1]:
+                day_start = elo.copy(), self.season
+
+            # Move ratings toward the mean when a new season starts
+            if seasons[start] != self.season:
+                if self.season is not None:
+                    elo += self.revert * (self.mean - elo)
+                self.season = seasons[start]
+
+            # All games of the day are rated from the ratings before the day
+            day = slice(start, end)
+            w, l = winner[day], loser[day]
+            rating_win = elo_win[day] = elo[w]
+            rating_lose = elo_lose[day] = elo[l]
+            diff = rating_win - rating_lose + home[day]
+            change = scale[day] * (result[day] - 1 / (1 + 10 ** (-diff / 400))) / (diff * autocorr[day] + base[day])
+            np.add.at(elo, w, change)
+            np.add.at(elo, l, -change)
+
+        # Keep the games of the last day and the ratings before it, more games of the day may come in later
+        self.last_day = (games[dates == dates[-1]],) + day_start
+        self.last_date = dates[-1]
+        history = pd.DataFrame({'winner_elo': elo_win, 'loser_elo': elo_lose,
+                                'winner_prob': self._probability(elo_win - elo_lose + home)}, index=games.index)
+        self.history = pd.concat([self.history, history]) if len(self.history) else history
+        return self
+
+    def predict(self, home, away, neutral=False):
+        """
+        Probability that the home team beats the away team.
+
+        Parameters
+        ----------
+        home, away : str or array-like of str
+            Team ids.
+        neutral : bool, optional
+            Leave out home field, e.g. for the Super Bowl.
+        """
+        diff = self._rating(home) - self._rating(away) + (0 if neutral else self.home_field)
+        return self._probability(diff)
+
+    def _rating(self, team):
+        # Unknown teams get code -1, which picks the mean appended to the end
+        codes = self.teams.get_indexer(np.atleast_1d(team).astype(str))
+        rating = np.append(self.elo, float(self.mean))[codes]
+        return rating if np.ndim(team) else rating[0]
+
+    @staticmethod
+    def _probability(diff):
+        return 1 / (1 + 10 ** (-np.asarray(diff) / 400))
+
+
+def _game_keys(games):
+    """Key of each game: its boxscore, or the teams and date of games without one."""
+    keys = games['game_date'].astype(str) + '|' + games['winner_id'].astype(str) + '|' + games['loser_id'].astype(str)
+    if 'boxscore' in games:
+        keys = games['boxscore'].astype(object).where(games['boxscore'].notna(), keys)
+    return keys
+
+
+def _check_games(games):
+    missing = {'season', 'game_date', 'winner_id', 'loser_id', 'pts_win', 'pts_lose', 'home_win'} - set(games)
+    if missing:
+        raise ValueError(f'games is missing the columns {sorted(missing)}, use game_data.add_stats() first.')
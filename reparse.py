@@ -0,0 +1,220 @@
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from boxscores import BoxscoreStore, boxscore_frames, parse_boxscore
+from cache import default_cache
+from game_data import GAME_SCORES_URL, add_stats, get_all_game_score_links, get_games_per_score
+from metrics import default_metrics, timed
+from storage import ARCHIVE_PATH, GameArchive, ScrapeStage
+
+# Default location of reparsed tables and of the stage of an unfinished reparse
+REPARSE_PATH = 'data/reparse'
+
+# Parsers of cached pages by name, see register_parser()
+PARSERS = {}
+
+
+def register_parser(name, pattern, parse, write, order=None):
+    """
+    Register how the cached pages whose url matches pattern are reparsed.
+
+    Parameters
+    ----------
+    name : str
+        Name of the parser, e.g. 'score'.
+    pattern : str
+        Regular expression searched for in the url of every cached page.
+    parse : callable
+        Called as parse(url, content) in a worker process and returns the rows of the page as
+        a dict of row dicts, like game_data.get_games_per_score(). Must be a module level function.
+    write : callable
+        Called as write(rows, path, archive_path) with the DataFrame of every page's rows and
+        stores it, returning the number of rows stored. archive_path is the game archive the
+        rows may be joined with.
+    order : callable, optional
+        Called as order(urls, cache) and returns the urls in the order their rows are stacked.
+        Defaults to sorted urls.
+    """
+    PARSERS[name] = {'pattern': re.compile(pattern), 'parse': parse, 'write': write, 'order': order}
+
+
+def cached_pages(name, cache=None):
+    """Return {url: digest} of every cached page the parser name applies to."""
+    cache = default_cache() if cache is None else cache
+    pattern = PARSERS[name]['pattern']
+    with cache.lock:
+        rows = cache.db.execute('SELECT url, digest FROM entries').fetchall()
+    return {url: digest for url, digest in rows if pattern.search(url)}
+
+
+@timed('reparse')
+def reparse(name='score', output=None, cache=None, processes=None, chunk_size=32, stage_path=None,
+            restart=False, archive_path=ARCHIVE_PATH):
+    """
+    Re-derive a table from the raw pages in the http cache instead of scraping them again,
+    e.g. after changing what get_games_per_score() extracts. Returns a dict of throughput stats.
+
+    Pages are parsed in chunks of chunk_size across a process pool. Each finished chunk is
+    written to a stage with a checkpoint of the pages in it (keyed by the digest of the page
+    content), so a reparse that stops resumes with the pages that are left. The stage is
+    removed once the output table is written.
+
+    Parameters
+    ----------
+    name : str, optional
+        Registered parser to run, see PARSERS.
+    output : str, optional
+        Where the table is written. Defaults to data/reparse/<name>.
+    cache : cache.HTTPCache, optional
+        Cache the pages are read from. Defaults to the shared cache.
+    processes : int, optional
+        Worker processes. Defaults to the number of cpus.
+    chunk_size : int, optional
+        Pages parsed by a worker at a time.
+    stage_path : str, optional
+        Folder of the stage. Defaults to data/reparse/<name>_stage.
+    restart : bool, optional
+        Drop the stage of an unfinished reparse instead of resuming it, e.g. when the parser
+        changed since it ran.
+    archive_path : str, optional
+        Folder of the game archive, e.g. where boxscores look up the team ids of the visitors.
+    """
+    cache = default_cache() if cache is None else cache
+    parser = PARSERS[name]
+    output = os.path.join(REPARSE_PATH, name) if output is None else output
+    stage = ScrapeStage(os.path.join(REPARSE_PATH, f'{name}_stage') if stage_path is None else stage_path)
+    if restart:
+        stage.clear()
+
+    pages = cached_pages(name, cache)
+    order = parser['order'] or (lambda urls, cache: sorted(urls))
+    urls = order(list(pages), cache)
+
+    # Pages staged with the same content by an earlier run are done
+    staged = stage.completed()
+    todo = [(url, cache._path(pages[url])) for url in urls if staged.get(url) != pages[url]]
+    if len(todo) < len(urls):
+        print(f'Resuming, {len(urls) - len(todo)} of {len(urls)} pages already reparsed')
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    stats = {'pages': 0, 'missing': 0, 'rows': 0, 'bytes': 0}
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(processes) as pool:
+        # Keep a few chunks per worker queued so results stream into the stage as they finish
+        queued = iter(chunks)
+        running = set()
+        limit = 2 * processes
+        while True:
+            for chunk in queued:
+                running.add(pool.submit(_parse_chunk, parser['parse'], chunk))
+                if len(running) >= limit:
+                    break
+            if not running:
+                break
+
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows, missing, nbytes = future.result()
+                stage.add(rows, pages)
+                stats['pages'] += len(rows)
+                stats['missing'] += missing
+                stats['rows'] += sum(len(games) for games in rows.values())
+                stats['bytes'] += nbytes
+            _progress(stats, len(todo), time.perf_counter() - start)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['pages_per_second'] = stats['pages'] / stats['seconds'] if stats['seconds'] else None
+    stats['mb_per_second'] = stats['bytes'] / 1e6 / stats['seconds'] if stats['seconds'] else None
+    print()
+
+    # Stack the rows of every page and write the table
+    with default_metrics().stage('reparse_write'):
+        rows = stage.load(urls)
+        stats['written'] = parser['write'](rows, output, archive_path) if len(rows) else 0
+    stage.clear()
+
+    default_metrics().increment(f'reparse_{name}_pages', stats['pages'])
+    print(f'{stats["pages"]} pages ({stats["bytes"] / 1e6:.1f} MB) reparsed in {stats["seconds"]:.1f} s, '
+          f'{stats["written"]} rows written to {output}')
+    return stats
+
+
+def _parse_chunk(parse, chunk):
+    """Parse a chunk of (url, body path) in a worker. Returns ({url: rows}, missing pages, bytes read)."""
+    rows, missing, nbytes = {}, 0, 0
+    for url, path in chunk:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            missing += 1  # Evicted since the index was read
+            continue
+        nbytes += len(content)
+        rows[url] = parse(url, content)
+    return rows, missing, nbytes
+
+
+def _progress(stats, total, seconds):
+    rate = stats['pages'] / seconds if seconds else 0
+    print(f'Reparsed {stats["pages"]} of {total} pages, {rate:.0f} pages/s, '
+          f'{stats["bytes"] / 1e6 / seconds if seconds else 0:.1f} MB/s', end='\r')
+
+
+## ----------- Score pages ------------ ##
+def _parse_score_page(url, content):
+    return get_games_per_score(url, soup=content)
+
+
+def _write_games(rows, path, archive_path):
+    games = add_stats(rows)
+    GameArchive(path).write(games)
+    return len(games)
+
+
+def _score_order(urls, cache):
+    """Score pages in the order of the game scores page, like game_data.get_data()."""
+    entry = cache._entry(GAME_SCORES_URL)  # A stale copy still has the order
+    content = None if entry is None else cache._read(entry['digest'])
+    links = get_all_game_score_links(content) if content is not None else []
+    rank = {link: i for i, link in enumerate(links)}
+    return sorted(urls, key=lambda url: (rank.get(url, len(rank)), url))
+
+
+register_parser('score', r'/boxscores/game_scores_find\.cgi\?', _parse_score_page, _write_games, _score_order)
+
+
+## ----------- Boxscore pages ------------ ##
+def _parse_boxscore_rows(url, content):
+    """The rows of every boxscore table as one dict of rows, each with the table it belongs to."""
+    rows = {}
+    for table, table_rows in parse_boxscore(url, content).items():
+        for row in table_rows:
+            rows[len(rows)] = {'table': table, **row}
+    return rows
+
+
+def _write_boxscores(rows, path, archive_path):
+    rows = rows.astype(object).where(rows.notna(), None)
+    tables = {}
+    for row in rows.to_dict('records'):
+        table = row.pop('table')
+        tables.setdefault(table, []).append({column: value for column, value in row.items() if value is not None})
+
+    # Visitor team ids come from the game archive
+    archive = GameArchive(archive_path)
+    games = archive.load(columns=['boxscore', 'winner_id', 'loser_id']) if archive.exists() else None
+    known = set() if games is None else set(games['boxscore'].dropna())
+    unknown = {row['boxscore'] for row in tables.get('games', [])} - known
+    if unknown:
+        print(f'{len(unknown)} boxscores are not in the game archive in {archive.path}, '
+              f'they are stored without the team id of the visitors')
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    return BoxscoreStore(path).append(boxscore_frames(tables, games))
+
+
+register_parser('boxscore', r'/boxscores/\d{9}[a-z0-9]{3}\.htm', _parse_boxscore_rows, _write_boxscores)
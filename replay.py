@@ -0,0 +1,231 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import fetch
+from cache import HTTPCache, default_cache, set_default_cache
+
+# Format of the corpus folder, bumped when the layout changes
+CORPUS_VERSION = 1
+
+# Default location of recorded corpora, relative to where the scrapers are run
+FIXTURES_PATH = 'fixtures'
+
+# Response headers kept with each recorded page
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class Corpus:
+    """
+    Folder of recorded responses that can be replayed offline.
+
+    manifest.json maps each url to its status, headers and body file. Bodies are gzipped and
+    named by the hash of their content, so pages recorded twice are only stored once.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the corpus.
+    """
+    def __init__(self, path) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self.manifest = {'version': CORPUS_VERSION, 'recorded': None, 'responses': {}}
+
+        manifest_path = os.path.join(path, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+            if self.manifest.get('version') != CORPUS_VERSION:
+                raise ValueError(f'{path} is a version {self.manifest.get("version")} corpus, '
+                                 f'version {CORPUS_VERSION} is required.')
+
+    def __contains__(self, url):
+        return url in self.manifest['responses']
+
+    def __len__(self):
+        return len(self.manifest['responses'])
+
+    def urls(self):
+        """Return the recorded urls."""
+        return list(self.manifest['responses'])
+
+    def add(self, url, content, status=200, headers=None):
+        """
+        Record the response of url.
+
+        Parameters
+        ----------
+        url : str
+            Url that was requested.
+        content : bytes
+            Body of the response.
+        status : int, optional
+            Status code of the response.
+        headers : dict, optional
+            Response headers, only KEPT_HEADERS are stored.
+        """
+        headers = {key: value for key, value in (headers or {}).items() if key in KEPT_HEADERS}
+        name = hashlib.sha256(content).hexdigest() + '.gz'
+        body_path = os.path.join(self.path, 'bodies', name)
+
+        with self.lock:
+            if not os.path.exists(body_path):
+                os.makedirs(os.path.dirname(body_path), exist_ok=True)
+                with gzip.open(body_path + '.tmp', 'wb') as f:
+                    f.write(content)
+                os.replace(body_path + '.tmp', body_path)
+            self.manifest['responses'][url] = {'status': status, 'headers': headers, 'body': name}
+
+    def get(self, url):
+        """Return (status, headers, content) recorded for url, or None if it wasn't recorded."""
+        entry = self.manifest['responses'].get(url)
+        if entry is None:
+            return None
+        with gzip.open(os.path.join(self.path, 'bodies', entry['body']), 'rb') as f:
+            content = f.read()
+        return entry['status'], entry['headers'], content
+
+    def save(self):
+        """Write the manifest."""
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            self.manifest['recorded'] = datetime.datetime.now().isoformat(timespec='seconds')
+            tmp = os.path.join(self.path, 'manifest.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, os.path.join(self.path, 'manifest.json'))
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport that sends requests to the network and records every response into a corpus."""
+    def __init__(self, corpus, pool_size=16) -> None:
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.corpus = corpus
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code != 304:
+            self.corpus.add(request.url, response.content, response.status_code, response.headers)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport that answers requests from a corpus without touching the network."""
+    def __init__(self, corpus) -> None:
+        super().__init__()
+        self.corpus = corpus
+
+    def send(self, request, **kwargs):
+        recorded = self.corpus.get(request.url)
+        if recorded is None:
+            raise requests.ConnectionError(f'{request.url} is not in the corpus at {self.corpus.path}.',
+                                           request=request)
+        status, headers, content = recorded
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = content
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if status == 200 else ''
+        return response
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def record(path):
+    """
+    Record every page the scrapers request inside the block into the corpus at path.
+
+    Pages are requested thru an empty cache so every page used is recorded, the regular cache
+    is left untouched.
+    """
+    corpus = Corpus(path)
+    with _transport(RecordingAdapter(corpus)):
+        try:
+            yield corpus
+        finally:
+            corpus.save()
+
+
+@contextmanager
+def replay(path):
+    """Serve every page the scrapers request inside the block from the corpus at path."""
+    corpus = Corpus(path)
+    if not len(corpus):
+        raise FileNotFoundError(f'No responses are recorded in {path}.')
+    with _transport(ReplayAdapter(corpus)):
+        yield corpus
+
+
+@contextmanager
+def _transport(adapter):
+    """Swap the transport of new sessions and use a throwaway cache inside the block."""
+    previous = default_cache()
+    directory = tempfile.mkdtemp(prefix='nfl_replay_')
+    set_default_cache(HTTPCache(directory))
+    fetch.set_transport(adapter)
+    try:
+        yield
+    finally:
+        fetch.set_transport(None)
+        set_default_cache(previous)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def record_corpus(path, seasons=None, score_pages=20):
+    """
+    Record the pages used by the scrapers: the game scores page, the first score_pages score
+    pages and the year, offense and defense pages of each season.
+
+    Parameters
+    ----------
+    path : str
+        Folder of the corpus.
+    seasons : list of int, optional
+        Seasons whose pages are recorded. Defaults to the current season.
+    score_pages : int, optional
+        Number of score pages recorded, None records all of them.
+    """
+    import game_data
+    import projections
+
+    seasons = [projections.get_current_season()] if seasons is None else seasons
+    with record(path) as corpus:
+        links = game_data.get_all_game_score_links()
+        for link in links[:score_pages]:
+            game_data.get_games_per_score(link)
+
+        for season in seasons:
+            data = projections.GetData(season)
+            data.team_standings()
+            data.team_offense_stats()
+            data.team_defense_stats()
+    return corpus
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Record pro-football-reference pages into a fixture corpus.')
+    parser.add_argument('path', nargs='?', default=os.path.join(FIXTURES_PATH, f'v{CORPUS_VERSION}'))
+    parser.add_argument('--seasons', type=int, nargs='+', default=None, help='Seasons to record')
+    parser.add_argument('--score-pages', type=int, default=20, help='Score pages to record')
+    args = parser.parse_args()
+
+    corpus = record_corpus(args.path, args.seasons, args.score_pages)
+    print(f'{len(corpus)} responses recorded in {args.path}')
@@ -0,0 +1,151 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Kinds of stat columns and the dtype they are stored as:
+#   'int'      -> int16 (Int16 if values are missing)
+#   'float'    -> float32
+#   'pct'      -> float32, '45.2%' -> 45.2
+#   'time'     -> float32 seconds, '2:51' -> 171.0
+#   'category' -> pandas categorical
+#   'str'      -> python strings
+TEAM_COLUMNS = {'id': 'category', 'division': 'category'}
+
+STANDINGS = {'wins': 'int', 'losses': 'int', 'ties': 'int', 'win_loss_perc': 'float', 'points': 'int',
+             'points_opp': 'int', 'points_diff': 'int', 'mov': 'float', 'sos_total': 'float',
+             'srs_total': 'float', 'srs_offense': 'float', 'srs_defense': 'float'}
+
+TEAM_STATS = {'g': 'int', 'points': 'int', 'total_yards': 'int', 'plays_offense': 'int',
+              'yds_per_play_offense': 'float', 'turnovers': 'int', 'fumbles_lost': 'int', 'first_down': 'int',
+              'pass_cmp': 'int', 'pass_att': 'int', 'pass_yds': 'int', 'pass_td': 'int', 'pass_int': 'int',
+              'pass_net_yds_per_att': 'float', 'pass_fd': 'int', 'rush_att': 'int', 'rush_yds': 'int',
+              'rush_td': 'int', 'rush_yds_per_att': 'float', 'rush_fd': 'int', 'penalties': 'int',
+              'penalties_yds': 'int', 'pen_fd': 'int', 'score_pct': 'pct', 'turnover_pct': 'pct',
+              'exp_pts_tot': 'float'}
+
+CONVERSIONS = {'g': 'int', 'third_down_att': 'int', 'third_down_success': 'int', 'third_down_pct': 'pct',
+               'fourth_down_att': 'int', 'fourth_down_success': 'int', 'fourth_down_pct': 'pct',
+               'red_zone_att': 'int', 'red_zone_scores': 'int', 'red_zone_pct': 'pct'}
+
+DRIVES = {'g': 'int', 'drives': 'int', 'play_count_tip': 'float', 'time_avg': 'time', 'yds_per_drive': 'float',
+          'start_avg': 'str', 'points_avg': 'float', 'score_pct': 'pct', 'turnover_pct': 'pct'}
+
+# Columns of the nflcombineresults.com combine table, see combine.py
+COMBINE = {'year': 'int', 'name': 'str', 'college': 'category', 'pos': 'category', 'height': 'float',
+           'weight': 'int', 'wonderlic': 'int', '40_yard': 'float', 'bench_press': 'int', 'vert_leap': 'float',
+           'broad_jump': 'float', 'shuttle': 'float', '3cone': 'float', '60yd_shuttle': 'float'}
+
+# Columns of the boxscore tables, see boxscores.py
+BOXSCORE_GAMES = {'home_id': 'category', 'vis_id': 'category', 'won_toss': 'str', 'roof': 'category',
+                  'surface': 'category', 'duration_minutes': 'time', 'attendance': 'float', 'weather': 'str',
+                  'vegas_line': 'str', 'favorite': 'str', 'spread': 'float', 'over_under': 'float',
+                  'over_under_result': 'category'}
+
+BOXSCORE_TEAM_STATS = {'side': 'category', 'team_id': 'category', 'first_downs': 'int', 'rush_att': 'int',
+                       'rush_yds': 'int', 'rush_td': 'int', 'pass_cmp': 'int', 'pass_att': 'int', 'pass_yds': 'int',
+                       'pass_td': 'int', 'pass_int': 'int', 'sacked': 'int', 'sacked_yds': 'int',
+                       'net_pass_yds': 'int', 'total_yds': 'int', 'fumbles': 'int', 'fumbles_lost': 'int',
+                       'turnovers': 'int', 'penalties': 'int', 'penalties_yds': 'int', 'third_down_conv': 'int',
+                       'third_down_att': 'int', 'fourth_down_conv': 'int', 'fourth_down_att': 'int',
+                       'possession': 'time'}
+
+BOXSCORE_SCORING = {'play': 'int', 'quarter': 'category', 'time_remaining': 'time', 'team': 'category',
+                    'description': 'str', 'vis_score': 'int', 'home_score': 'int'}
+
+BOXSCORE_DRIVES = {'side': 'category', 'team_id': 'category', 'drive_num': 'int', 'quarter': 'category',
+                   'time_start': 'time', 'start_at': 'str', 'plays': 'int', 'duration': 'time', 'net_yds': 'int',
+                   'result': 'category'}
+
+# Declared schema of each table, by caption. Columns that are not declared are inferred.
+TABLE_SCHEMAS = {
+    'Standings': STANDINGS,
+    'Team Offense Table': TEAM_STATS,
+    'Team Defense Table': TEAM_STATS,
+    'Team Conversions Table': CONVERSIONS,
+    'Team Conversions Defense Table': CONVERSIONS,
+    'Team Drives Table': DRIVES,
+    'Team Drives Defense Table': DRIVES,
+}
+
+_TIME = re.compile(r'^\d+:\d{2}$')
+
+
+def typed_frame(columns, index, caption=None):
+    """
+    Build a DataFrame straight from column arrays, converting each column to its declared type.
+
+    Parameters
+    ----------
+    columns : dict of list
+        Cell text of each column (None for missing cells).
+    index : list
+        Row labels (team names).
+    caption : str, optional
+        Table caption, used to look up the declared schema in TABLE_SCHEMAS.
+    """
+    schema = {**TEAM_COLUMNS, **TABLE_SCHEMAS.get(caption, {})}
+    data = {stat: convert(values, schema.get(stat)) for stat, values in columns.items()}
+    return pd.DataFrame(data, index=pd.Index(index))
+
+
+def convert(values, kind=None):
+    """Convert a list of cell text to the array of a column kind, inferring the kind if it is None."""
+    if kind is None:
+        kind = infer_kind(values)
+
+    if kind == 'category':
+        return pd.Categorical(values)
+    if kind == 'str':
+        return np.array(values, dtype=object)
+
+    # Tables are small (one row per team) so plain python parsing beats vectorized string ops
+    parse = _PARSERS.get(kind, _parse_number)
+    numbers = np.array([parse(value) for value in values], dtype='float64')
+
+    if kind == 'int':
+        if np.isnan(numbers).any():
+            return pd.array(numbers, dtype='Float64').astype('Int16')
+        return numbers.astype('int16')
+    return numbers.astype('float32')
+
+
+def infer_kind(values):
+    """Guess the kind of a column that has no declared type."""
+    present = [value.strip() for value in values if value is not None and value.strip()]
+    if not present:
+        return 'str'
+    if all(value.endswith('%') for value in present):
+        return 'pct'
+    if all(_TIME.match(value) for value in present):
+        return 'time'
+    if any(np.isnan(_parse_number(value)) for value in present):
+        return 'str'
+    if any('.' in value for value in present):
+        return 'float'
+    return 'int'
+
+
+def _parse_number(text):
+    """'1,234' -> 1234.0, missing or blank cells are NaN."""
+    try:
+        return float(text.replace(',', ''))
+    except (AttributeError, ValueError):
+        return np.nan
+
+
+def _parse_pct(text):
+    """'45.2%' -> 45.2"""
+    return _parse_number(text.strip().rstrip('%')) if text is not None else np.nan
+
+
+def _parse_time(text):
+    """'2:51' -> 171.0 seconds"""
+    try:
+        minutes, seconds = text.split(':')
+        return int(minutes) * 60 + int(seconds)
+    except (AttributeError, ValueError):
+        return np.nan
+
+
+_PARSERS = {'pct': _parse_pct, 'time': _parse_time}
@@ -0,0 +1,414 @@
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from matchups import MatchupGrid
+from metrics import default_metrics
+from projections import GetData
+from query import GameIndex
+from ratings import Elo
+from storage import ARCHIVE_PATH, GameArchive
+
+# Default address of the service, only reachable from this machine
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Seconds between background refreshes. Pages of the current season are cached for a few hours,
+# so most refreshes only re-read the cache and the game archive
+REFRESH_INTERVAL = 30 * 60
+
+# Request latencies kept for the percentiles of /health
+LATENCY_SAMPLES = 10_000
+
+# Columns of the games returned by /head-to-head
+GAME_COLUMNS = ['season', 'week_num', 'game_date', 'winner_id', 'loser_id', 'pts_win', 'pts_lose', 'home_win', 'boxscore']
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+class Snapshot:
+    """
+    Everything the service answers from, built once per refresh and never changed afterwards, so
+    requests read it without locks while the next one is built.
+
+    Standings and team stats are encoded to JSON up front. Head-to-head answers are a binary
+    search into a GameIndex over games already converted to dicts, encoded the first time a
+    pair is asked for, and projections are lookups into grids of the expected points and Elo
+    win probability of every matchup.
+
+    Parameters
+    ----------
+    season : int
+        Season of the standings and stat tables.
+    standings : pd.DataFrame
+        Output of GetData.team_standings().
+    offense, defense : dict of pd.DataFrame
+        Output of GetData.team_offense_stats() and team_defense_stats().
+    games : pd.DataFrame, optional
+        Game archive, i.e. storage.GameArchive().load(). Head-to-head and win probabilities
+        are only answered with it.
+    """
+    def __init__(self, season, standings, offense, defense, games=None) -> None:
+        self.season = int(season)
+        self.loaded_at = time.time()
+
+        # Standings and the row of every team in every stat table, as JSON
+        standings = _records(standings.rename_axis('team').reset_index())
+        self.standings = _encode({'season': self.season, 'standings': standings})
+        teams = {row['id']: {'team': row['id'], 'season': self.season, 'standings': row, 'offense': {}, 'defense': {}}
+                 for row in standings}
+        for side, tables in (('offense', offense), ('defense', defense)):
+            for caption, table in tables.items():
+                if 'id' not in table:
+                    continue
+                for row in _records(table):
+                    team = teams.setdefault(row['id'], {'team': row['id'], 'season': self.season, 'standings': None,
+                                                        'offense': {}, 'defense': {}})
+                    team[side][caption] = row
+        self.teams = {team: _encode(body) for team, body in teams.items()}
+
+        # Expected points of every matchup of the season
+        self.grid = MatchupGrid.from_stat_tables(offense, defense, self.season)
+        self.points = self.grid.expected_points()[0]
+        self.codes = {team: i for i, team in enumerate(self.grid.teams)}
+
+        # Game history, with the games of every head-to-head pair encoded the first time it is asked for
+        self.games = 0 if games is None else len(games)
+        self.index = GameIndex(games) if self.games else None
+        self.results = _records(self.index.games[[c for c in GAME_COLUMNS if c in games]]) if self.games else []
+        self._head_to_head = {}
+
+        # Elo win probability of every matchup of the grid, at home and on neutral ground
+        self.probability = self.neutral_probability = None
+        if self.games:
+            elo = Elo().fit(games)
+            home, away = np.repeat(self.grid.teams, len(self.grid.teams)), np.tile(self.grid.teams, len(self.grid.teams))
+            shape = (len(self.grid.teams), len(self.grid.teams))
+            self.probability = elo.predict(home, away).reshape(shape)
+            self.neutral_probability = elo.predict(home, away, neutral=True).reshape(shape)
+
+    def head_to_head(self, team_a, team_b):
+        """JSON of the games between two teams, newest first, or None if either team never played."""
+        key = (team_a, team_b)
+        if key in self._head_to_head:
+            return self._head_to_head[key]
+        if self.index is None or team_a not in self.index.teams or team_b not in self.index.teams:
+            return None
+
+        results = [self.results[row] for row in self.index.pair_rows(team_a, team_b)[::-1]]
+        wins = {team_a: 0, team_b: 0}
+        ties = 0
+        for game in results:
+            if game['pts_win'] == game['pts_lose']:
+                ties += 1
+            else:
+                wins[game['winner_id']] += 1
+        body = _encode({'teams': [team_a, team_b], 'games': len(results), 'wins': wins, 'ties': ties,
+                        'results': results})
+        # Only pairs of known teams are kept, so this holds at most every pair once
+        self._head_to_head[key] = body
+        return body
+
+    def projection(self, home, away, neutral=False, home_field=0.0):
+        """
+        Expected points, spread and Elo win probability of home against away, or None if
+        either team isn't in the season's stat tables.
+
+        Parameters
+        ----------
+        home, away : str
+            Team ids.
+        neutral : bool, optional
+            Leave out the Elo home field, e.g. for the Super Bowl.
+        home_field : float, optional
+            Points the home team gains over the away team.
+        """
+        h, a = self.codes.get(home), self.codes.get(away)
+        if h is None or a is None:
+            return None
+
+        home_points = float(self.points[h, a]) + home_field / 2
+        away_points = float(self.points[a, h]) - home_field / 2
+        probabilities = self.neutral_probability if neutral else self.probability
+        probability = None if probabilities is None else float(probabilities[h, a])
+        return _encode({'season': self.season, 'home': home, 'away': away,
+                        'home_points': _number(home_points), 'away_points': _number(away_points),
+                        'spread': _number(home_points - away_points), 'home_win_probability': probability})
+
+
+def load_snapshot(season=None, archive_path=ARCHIVE_PATH):
+    """
+    Build a Snapshot from the pages of a season and the game archive.
+
+    Pages are read thru the http cache, so a refresh only goes to the network once the cached
+    pages of the season expire, and the offense tables come out of the raw year page instead
+    of a browser.
+
+    Parameters
+    ----------
+    season : int, optional
+        Season of the standings and stat tables. Defaults to the current season.
+    archive_path : str, optional
+        Folder of the game archive.
+    """
+    with default_metrics().stage('service_refresh'):
+        data = GetData(season)
+        standings = data.team_standings()
+        offense, defense = data.team_offense_stats(), data.team_defense_stats()
+        archive = GameArchive(archive_path)
+        games = archive.load() if archive.exists() else None
+        return Snapshot(data.season, standings, offense, defense, games)
+
+
+class QueryService:
+    """
+    Long-lived local JSON service over the standings, team stats, game archive and projections.
+
+    The data is kept in memory as a Snapshot and rebuilt in a worker thread every
+    refresh_interval seconds, swapping in the new snapshot once it is complete, so requests
+    never wait on a refresh. A refresh that fails keeps the previous snapshot.
+
+    Endpoints (GET):
+        /health                     Season, age of the data and request latency percentiles
+        /standings                  Standings of the season
+        /teams/<team>               Standings row and every offense and defense table row of a team
+        /head-to-head/<team>/<team> Record and games between two teams
+        /projection/<home>/<away>   Expected points, spread and win probability (?neutral=1, ?home_field=)
+
+    handle() answers a request without a socket, so the service can be tested against a replay
+    corpus with refresh() and handle() alone.
+
+    Parameters
+    ----------
+    season : int, optional
+        Season served. Defaults to the current season.
+    archive_path : str, optional
+        Folder of the game archive.
+    refresh_interval : float, optional
+        Seconds between background refreshes, None to never refresh.
+    """
+    def __init__(self, season=None, archive_path=ARCHIVE_PATH, refresh_interval=REFRESH_INTERVAL) -> None:
+        self.season = season
+        self.archive_path = archive_path
+        self.refresh_interval = refresh_interval
+        self.snapshot = None
+        self.last_error = None
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.server = None
+        self.port = None
+        self._refresher = None
+
+    ## ----------- Data ------------ ##
+    def refresh(self):
+        """Rebuild the snapshot and swap it in. Returns the new snapshot."""
+        snapshot = load_snapshot(self.season, self.archive_path)
+        self.snapshot = snapshot
+        self.last_error = None
+        return snapshot
+
+    async def _refresh_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:  # Keep serving the previous snapshot
+                self.last_error = f'{type(e).__name__}: {e}'
+                default_metrics().increment('service_refresh_errors')
+
+    ## ----------- Requests ------------ ##
+    def handle(self, method, target):
+        """
+        Answer a request. Returns (status, content type, body).
+
+        Parameters
+        ----------
+        method : str
+            HTTP method, only GET is served.
+        target : str
+            Path and query string, e.g. '/projection/kan/buf?neutral=1'.
+        """
+        start = time.perf_counter()
+        try:
+            if method != 'GET':
+                return _error(405, f'{method} is not allowed, use GET.')
+            url = urlsplit(target)
+            parts = [unquote(part) for part in url.path.split('/') if part]
+            return self._route(parts, parse_qs(url.query))
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def _route(self, parts, query):
+        if parts == ['health']:
+            return 200, 'application/json', self._health()
+
+        snapshot = self.snapshot
+        if snapshot is None:
+            return _error(503, 'The data is still loading.')
+
+        if parts == ['standings']:
+            return 200, 'application/json', snapshot.standings
+        if len(parts) == 2 and parts[0] == 'teams':
+            body = snapshot.teams.get(parts[1])
+            return (200, 'application/json', body) if body is not None else _error(404, f'Unknown team {parts[1]!r}.')
+        if len(parts) == 3 and parts[0] == 'head-to-head':
+            if snapshot.index is None:
+                return _error(503, f'No games are stored in {self.archive_path}.')
+            body = snapshot.head_to_head(parts[1], parts[2])
+            return (200, 'application/json', body) if body is not None else _error(404, 'Unknown team.')
+        if len(parts) == 3 and parts[0] == 'projection':
+            try:
+                neutral = query.get('neutral', ['0'])[-1] not in ('0', 'false', '')
+                home_field = float(query.get('home_field', ['0'])[-1])
+            except ValueError:
+                return _error(400, 'home_field must be a number.')
+            body = snapshot.projection(parts[1], parts[2], neutral, home_field)
+            return (200, 'application/json', body) if body is not None else _error(404, 'Unknown team.')
+        return _error(404, f'No endpoint at /{"/".join(parts)}.')
+
+    def _health(self):
+        snapshot = self.snapshot
+        latencies = np.array(self.latencies) * 1000
+        return _encode({
+            'status': 'ok' if snapshot is not None else 'loading',
+            'season': None if snapshot is None else snapshot.season,
+            'games': None if snapshot is None else snapshot.games,
+            'age_seconds': None if snapshot is None else round(time.time() - snapshot.loaded_at, 1),
+            'last_error': self.last_error,
+            'requests': len(latencies),
+            'latency_ms': {f'p{q}': round(float(np.percentile(latencies, q)), 3) if len(latencies) else None
+                           for q in (50, 99)},
+        })
+
+    ## ----------- Server ------------ ##
+    async def start(self, host=HOST, port=PORT):
+        """
+        Load the data if it isn't loaded yet, start listening and schedule the refreshes.
+
+        Parameters
+        ----------
+        host : str, optional
+            Address to listen on.
+        port : int, optional
+            Port to listen on, 0 picks a free port (see self.port).
+        """
+        if self.snapshot is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.refresh)
+        self.server = await asyncio.start_server(self._client, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.refresh_interval:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop listening and refreshing."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def _client(self, reader, writer):
+        """Serve the requests of a connection, keeping it open between requests."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                length = headers.get('content-length') or '0'
+                if length.isdigit() and int(length):
+                    await reader.readexactly(int(length))  # Bodies are ignored
+
+                # Anything that goes wrong still gets an answer, and the connection is closed after it
+                request = line.decode('latin-1').split()
+                keep_alive = False
+                if not length.isdigit():
+                    status, content_type, body = _error(400, 'Malformed Content-Length header.')
+                elif len(request) != 3:
+                    status, content_type, body = _error(400, 'Malformed request line.')
+                else:
+                    method, target, version = request
+                    try:
+                        status, content_type, body = self.handle(method, target)
+                    except Exception as e:
+                        default_metrics().increment('service_errors')
+                        status, content_type, body = _error(500, f'{type(e).__name__}: {e}')
+                    else:
+                        connection = headers.get('connection', '')
+                        keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+
+                writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n'
+                             f'Content-Length: {len(body)}\r\nConnection: {"keep-alive" if keep_alive else "close"}'
+                             f'\r\n\r\n'.encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def serve(season=None, host=HOST, port=PORT, archive_path=ARCHIVE_PATH, refresh_interval=REFRESH_INTERVAL):
+    """
+    Run a QueryService until interrupted.
+
+    Parameters
+    ----------
+    season : int, optional
+        Season served. Defaults to the current season.
+    host : str, optional
+        Address to listen on.
+    port : int, optional
+        Port to listen on.
+    archive_path : str, optional
+        Folder of the game archive.
+    refresh_interval : float, optional
+        Seconds between background refreshes, None to never refresh.
+    """
+    service = QueryService(season, archive_path, refresh_interval)
+
+    async def run():
+        start = time.perf_counter()
+        await service.start(host, port)
+        print(f'Serving season {service.snapshot.season} on http://{host}:{service.port} '
+              f'(loaded in {time.perf_counter() - start:.1f} s)')
+        try:
+            await service.server.serve_forever()
+        finally:
+            await service.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+def _records(df):
+    """Rows of a frame as JSON-ready dicts: missing values become null and dates ISO strings."""
+    return json.loads(df.to_json(orient='records', date_format='iso', double_precision=6))
+
+
+def _encode(body):
+    return json.dumps(body, separators=(',', ':')).encode()
+
+
+def _number(value):
+    return None if np.isnan(value) else round(value, 2)
+
+
+def _error(status, message):
+    return status, 'application/json', _encode({'error': message})
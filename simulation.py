@@ -0,0 +1,148 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+class SeasonSimulator:
+    """
+    Monte Carlo simulation of the rest of a season.
+
+    Each remaining game is won by the home team with the Elo probability of the rating
+    difference (plus home field). A batch of simulations is played at once as a matrix of game
+    results, and batches are spread over a process pool with seeds spawned from one
+    np.random.SeedSequence, so a seed gives the same result with any number of processes.
+
+    Division winners are seeded first in each conference, then the best remaining records get
+    the wild cards. Teams with the same record are ordered at random instead of by the NFL
+    tiebreakers.
+
+    Parameters
+    ----------
+    standings : pd.DataFrame
+        Current standings from projections.GetData.team_standings(), with the id, division,
+        wins, losses and ties of every team.
+    ratings : pd.Series
+        Rating of each team id in Elo points, e.g. ratings.Elo().fit(games).ratings. Teams
+        without a rating get the mean rating.
+    schedule : pd.DataFrame
+        Remaining games with home_id and away_id columns, and optionally a boolean neutral column.
+    home_field : float, optional
+        Rating points added to the home team.
+    playoff_teams : int, optional
+        Playoff teams of each conference.
+    """
+    def __init__(self, standings, ratings, schedule, home_field=65, playoff_teams=7) -> None:
+        self.teams = pd.Index(standings['id'].astype(str))
+        self.names = standings.index.to_numpy()
+        self.playoff_teams = playoff_teams
+
+        # Team codes of the remaining games
+        self.home = self.teams.get_indexer(schedule['home_id'].astype(str))
+        self.away = self.teams.get_indexer(schedule['away_id'].astype(str))
+        if (self.home < 0).any() or (self.away < 0).any():
+            raise ValueError('The schedule has teams that are not in the standings.')
+
+        # Probability that the home team wins each game
+        strength = ratings.reindex(self.teams).fillna(ratings.mean()).to_numpy(dtype='float64')
+        neutral = schedule['neutral'].to_numpy(dtype=bool) if 'neutral' in schedule else np.zeros(len(schedule), bool)
+        diff = strength[self.home] - strength[self.away] + np.where(neutral, 0, home_field)
+        self.p_home = 1 / (1 + 10 ** (-diff / 400))
+
+        # Current records, and the games left for each team
+        self.wins = standings['wins'].to_numpy(dtype='float64')
+        self.ties = standings['ties'].fillna(0).to_numpy(dtype='float64') if 'ties' in standings else 0.0
+        remaining = np.bincount(self.home, minlength=len(self.teams)) + np.bincount(self.away, minlength=len(self.teams))
+        self.games = self.wins + standings['losses'].to_numpy(dtype='float64') + self.ties + remaining
+
+        # Divisions and conferences ('AFC East' is in the AFC)
+        division = standings['division'].astype(str)
+        self.divisions = [np.flatnonzero(division.to_numpy() == name) for name in division.unique()]
+        conference = division.str.split().str[0].to_numpy()
+        self.conferences = [np.flatnonzero(conference == name) for name in pd.unique(conference)]
+
+    def run(self, n_sims=100_000, batch_size=10_000, processes=None, seed=None):
+        """
+        Simulate the season n_sims times and return the probabilities of every team.
+
+        The returned frame is indexed by team id with the team name, the mean projected wins
+        and the probability of winning the division, making the playoffs and of each seed.
+
+        Parameters
+        ----------
+        n_sims : int, optional
+            Number of simulated seasons.
+        batch_size : int, optional
+            Seasons simulated at once by a worker.
+        processes : int, optional
+            Worker processes. Defaults to the number of cpus, 1 runs in this process.
+        seed : int, optional
+            Seed of the simulations.
+        """
+        sizes = [batch_size] * (n_sims // batch_size) + ([n_sims % batch_size] if n_sims % batch_size else [])
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+        if processes == 1:
+            results = map(self.simulate, sizes, seeds)
+            counts = _sum_counts(results)
+        else:
+            with ProcessPoolExecutor(processes) as pool:
+                counts = _sum_counts(pool.map(self.simulate, sizes, seeds))
+
+        probs = pd.DataFrame({'team': self.names, 'wins': counts['wins'] / n_sims,
+                              'division': counts['division'] / n_sims,
+                              'playoffs': counts['seeds'].sum(axis=1) / n_sims}, index=self.teams)
+        for seed_num in range(self.playoff_teams):
+            probs[f'seed_{seed_num + 1}'] = counts['seeds'][:, seed_num] / n_sims
+        probs.index.name = 'team_id'
+        return probs.sort_values(['playoffs', 'wins'], ascending=False)
+
+    def simulate(self, n_sims, seed=None):
+        """
+        Simulate one batch of seasons and return the counts of each outcome per team.
+
+        Parameters
+        ----------
+        n_sims : int
+            Number of simulated seasons.
+        seed : int or np.random.SeedSequence, optional
+            Seed of the batch.
+        """
+        rng = np.random.default_rng(seed)
+        n_teams = len(self.teams)
+
+        # Results of every game in every simulation, then the wins they add to each team
+        home_won = (rng.random((n_sims, len(self.p_home))) < self.p_home).astype('float32')
+        wins = self.wins + home_won @ _one_hot(self.home, n_teams) + (1 - home_won) @ _one_hot(self.away, n_teams)
+
+        # Order teams by win percentage, tiny noise breaks ties at random
+        score = (wins + 0.5 * self.ties) / np.maximum(self.games, 1) + rng.random((n_sims, n_teams)) * 1e-6
+
+        rows = np.arange(n_sims)
+        division_won = np.zeros((n_sims, n_teams), dtype=bool)
+        for teams in self.divisions:
+            division_won[rows, teams[np.argmax(score[:, teams], axis=1)]] = True
+
+        # Division winners take the first seeds, the wild cards go to the best other records
+        seeds = np.zeros((n_teams, self.playoff_teams), dtype='int64')
+        for teams in self.conferences:
+            key = score[:, teams] + 10 * division_won[:, teams]
+            order = np.argsort(-key, axis=1)[:, :self.playoff_teams]
+            for seed_num in range(order.shape[1]):
+                seeds[:, seed_num] += np.bincount(teams[order[:, seed_num]], minlength=n_teams)
+
+        return {'wins': wins.sum(axis=0), 'division': division_won.sum(axis=0), 'seeds': seeds}
+
+
+def _one_hot(codes, n_teams):
+    """(games, teams) matrix with a 1 in the column of each game's team."""
+    matrix = np.zeros((len(codes), n_teams), dtype='float32')
+    matrix[np.arange(len(codes)), codes] = 1
+    return matrix
+
+
+def _sum_counts(results):
+    total = None
+    for counts in results:
+        total = counts if total is None else {key: total[key] + value for key, value in counts.items()}
+    return total
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Default location of the game archive, relative to where the scrapers are run
+ARCHIVE_PATH = 'data/games'
+
+# Default location of the rows of an unfinished game scrape
+STAGE_PATH = 'data/scrape'
+
+# Explicit types of the game columns, other columns keep the types pyarrow infers
+TEAM = pa.dictionary(pa.int16(), pa.string())
+GAMES_SCHEMA = pa.schema([
+    ('week_num', pa.string()),
+    ('game_day_of_week', pa.dictionary(pa.int8(), pa.string())),
+    ('game_date', pa.timestamp('ns')),
+    ('season', pa.int16()),
+    ('winner', TEAM),
+    ('winner_id', TEAM),
+    ('home_win', pa.float32()),
+    ('loser', TEAM),
+    ('loser_id', TEAM),
+    ('boxscore', pa.string()),
+    ('pts_win', pa.int16()),
+    ('pts_lose', pa.int16()),
+    ('yards_win', pa.int16()),
+    ('to_win', pa.int8()),
+    ('yards_lose', pa.int16()),
+    ('to_lose', pa.int8()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('season', pa.int16())]), flavor='hive')
+
+
+class GameArchive:
+    """
+    Parquet archive of the games table partitioned by season.
+
+    Each season is stored in its own season=YYYY folder, so loading a few seasons only reads
+    those folders and only the requested columns are read from each file.
+
+    Parameters
+    ----------
+    path : str, optional
+        Folder the archive is kept in.
+    """
+    def __init__(self, path=ARCHIVE_PATH) -> None:
+        self.path = path
+
+    def exists(self):
+        """Return True if any games have been stored."""
+        return len(self.seasons()) > 0
+
+    def seasons(self):
+        """Return the sorted list of seasons in the archive."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(int(name.split('=')[1]) for name in os.listdir(self.path) if name.startswith('season='))
+
+    def write(self, games):
+        """
+        Replace the archive with games.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column, i.e. the output of game_data.add_stats().
+        """
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        self._write(games)
+
+    def append(self, games, dedupe=True):
+        """
+        Add games to the archive, writing new files only to the seasons they belong to. Games that
+        are already stored are skipped (see new_games()). Returns the number of games added.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column, i.e. the output of game_data.add_stats().
+        dedupe : bool, optional
+            Skip games that are already stored. Pass False for games that are known to be new,
+            e.g. the output of new_games(), so the stored boxscores aren't read again.
+        """
+        if dedupe:
+            games = self.new_games(games)
+        else:
+            _check_games(games)
+        if len(games):
+            self._write(games)
+        return len(games)
+
+    def new_games(self, games):
+        """
+        Return the games that aren't stored yet, each game once. Games are matched by boxscore,
+        and games without a boxscore by their date and teams.
+
+        Parameters
+        ----------
+        games : pd.DataFrame
+            Games with a season column, i.e. the output of game_data.add_stats().
+        """
+        _check_games(games)
+        keys = _game_keys(games)
+        games, keys = games[~keys.duplicated()], keys[~keys.duplicated()]
+
+        # Only the keys of the affected seasons are read
+        if self.exists() and len(games):
+            columns = ['game_date', 'winner_id', 'loser_id'] + (['boxscore'] if 'boxscore' in games else [])
+            stored = self.load(seasons=sorted(games['season'].unique()), columns=columns)
+            games = games[~keys.isin(set(_game_keys(stored)))]
+        return games
+
+    def fingerprints(self, seasons=None):
+        """
+        Return {season: fingerprint} of the files stored for each season. Every write gets new
+        file names, so the fingerprint of a season changes whenever games are written to it.
+
+        Parameters
+        ----------
+        seasons : list of int, optional
+            Seasons to fingerprint. Defaults to all seasons. Seasons without games are left out.
+        """
+        fingerprints = {}
+        for season in self.seasons() if seasons is None else sorted(int(s) for s in seasons):
+            folder = os.path.join(self.path, f'season={season}')
+            if os.path.isdir(folder):
+                names = sorted(name for name in os.listdir(folder) if name.endswith('.parquet'))
+                fingerprints[season] = hashlib.sha1('\n'.join(names).encode()).hexdigest()[:16]
+        return fingerprints
+
+    def load(self, seasons=None, columns=None):
+        """
+        Load games from the archive.
+
+        Parameters
+        ----------
+        seasons : int or list of int, optional
+            Seasons to load. Only the folders of these seasons are read. Defaults to all seasons.
+        columns : list of str, optional
+            Columns to load. Defaults to all columns.
+        """
+        if not self.exists():
+            raise FileNotFoundError(f'No games are stored in {self.path}.')
+
+        if isinstance(seasons, (int, float)):
+            seasons = [int(seasons)]
+        predicate = None if seasons is None else ds.field('season').isin([int(s) for s in seasons])
+
+        dataset = ds.dataset(self.path, format='parquet', partitioning=PARTITIONING)
+        table = dataset.to_table(columns=columns, filter=predicate)
+
+        # Return games in date order with season as the third column, like add_stats()
+        games = table.to_pandas()
+        if 'season' in games and len(games.columns) > 2:
+            games.insert(2, 'season', games.pop('season'))
+        if 'game_date' in games:
+            games = games.sort_values('game_date', kind='stable')
+        return games.reset_index(drop=True)
+
+    def _write(self, games):
+        _check_games(games)
+        table = pa.Table.from_pandas(games.reset_index(drop=True), schema=_schema(games), preserve_index=False)
+
+        # Every write gets its own file names so earlier files in a season are kept
+        ds.write_dataset(table, self.path, format='parquet', partitioning=PARTITIONING,
+                         basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                         existing_data_behavior='overwrite_or_ignore')
+
+
+class ScrapeStage:
+    """
+    On-disk sink of a game scrape that is in progress.
+
+    Parsed rows are written in batches to parquet part files and a checkpoint records which
+    score pages (and their marks) are in which part, so a scrape that stops halfway can resume
+    without fetching the finished pages again.
+
+    Parameters
+    ----------
+    path : str, optional
+        Folder the parts and checkpoint are kept in.
+    """
+    def __init__(self, path=STAGE_PATH) -> None:
+        self.path = path
+        self.checkpoint_path = os.path.join(path, 'checkpoint.json')
+        self._checkpoint = None
+
+    @property
+    def checkpoint(self):
+        """Dict of the number of parts written and the {'mark', 'part'} of every finished link."""
+        if self._checkpoint is None:
+            self._checkpoint = {'parts': 0, 'links': {}}
+            if os.path.exists(self.checkpoint_path):
+                with open(self.checkpoint_path) as f:
+                    self._checkpoint = json.load(f)
+        return self._checkpoint
+
+    def completed(self):
+        """Return the mark of every score link whose rows are staged."""
+        return {link: done['mark'] for link, done in self.checkpoint['links'].items()}
+
+    def add(self, pages, marks=None):
+        """
+        Write the rows of a batch of score pages and mark the pages as finished.
+
+        Parameters
+        ----------
+        pages : dict
+            Rows of each score link, as returned by game_data.get_games_per_score().
+        marks : dict, optional
+            Mark of each score link, see game_data.get_game_score_marks().
+        """
+        marks = marks or {}
+        part = self.checkpoint['parts']
+
+        # Rows keep their score link and position so the scrape order can be rebuilt
+        rows = [{'score_link': link, 'row': int(i), **row} for link, games in pages.items() for i, row in games.items()]
+        if rows:
+            os.makedirs(self.path, exist_ok=True)
+            name = os.path.join(self.path, f'part-{part:05}.parquet')
+            pq.write_table(pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False), name + '.tmp')
+            os.replace(name + '.tmp', name)
+
+        # The checkpoint is only updated once the part is on disk
+        self.checkpoint['parts'] = part + 1
+        for link in pages:
+            self.checkpoint['links'][link] = {'mark': marks.get(link), 'part': part if rows else None}
+        self._save_checkpoint()
+
+    def load(self, links):
+        """
+        Load the staged rows of links, in the order of links and of the rows on each page.
+
+        Parameters
+        ----------
+        links : list of str
+            Score links to load, usually every link on the game scores page.
+        """
+        done = self.checkpoint['links']
+        parts = sorted({done[link]['part'] for link in links if link in done and done[link]['part'] is not None})
+
+        frames = []
+        for part in parts:
+            df = pd.read_parquet(os.path.join(self.path, f'part-{part:05}.parquet'))
+
+            # Only keep the rows of links whose latest rows are in this part
+            keep = [link for link in links if done.get(link, {}).get('part') == part]
+            frames.append(df[df['score_link'].isin(keep)])
+
+        if not frames:
+            return pd.DataFrame()
+        order = {link: i for i, link in enumerate(links)}
+        df = pd.concat(frames, ignore_index=True)
+        df = df.iloc[np.lexsort((df['row'].to_numpy(), df['score_link'].map(order).to_numpy()))]
+        return df.drop(columns=['score_link', 'row']).reset_index(drop=True)
+
+    def clear(self):
+        """Remove the staged rows and checkpoint once the scrape is finished."""
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        self._checkpoint = None
+
+    def _save_checkpoint(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp, self.checkpoint_path)
+
+
+def _schema(games):
+    """Return the schema of games, using GAMES_SCHEMA for the known columns."""
+    inferred = pa.Schema.from_pandas(games, preserve_index=False)
+    fields = []
+    for field in inferred:
+        index = GAMES_SCHEMA.get_field_index(field.name)
+        fields.append(GAMES_SCHEMA.field(index) if index >= 0 else field)
+    return pa.schema(fields)
+
+
+def _check_games(games):
+    if 'season' not in games:
+        raise ValueError('games must have a season column, use game_data.add_stats() first.')
+
+
+def _game_keys(games):
+    """Key of each game: its boxscore, or its date and teams if it has no boxscore."""
+    keys = (pd.to_datetime(games['game_date']).dt.strftime('%Y-%m-%d') + '|' + games['winner_id'].astype(str)
+            + '|' + games['loser_id'].astype(str))
+    if 'boxscore' in games:
+        keys = games['boxscore'].astype(object).where(games['boxscore'].notna(), keys)
+    return keys
@@ -0,0 +1,211 @@
+import io
+import re
+import time
+
+import pandas as pd
+from lxml import etree
+
+from metrics import default_metrics
+
+
+class Table:
+    """
+    Column-major contents of a pro-football-reference stats table.
+
+    Every cell with a data-stat attribute becomes a column named after it. Rows that are missing
+    a column hold None in that column.
+
+    Attributes
+    ----------
+    id : str
+        The table id attribute.
+    caption : str
+        Text of the table caption, None if the table has no caption.
+    attrs : dict
+        Attributes of the table element (class, ...).
+    columns : dict of list
+        Cell text of each data-stat column.
+    links : dict of list
+        The href of the first link in each cell, None if the cell has no link.
+    row_attrs : list of dict
+        Attributes of each row (class, data-row, ...).
+    """
+    def __init__(self, id=None, caption=None) -> None:
+        self.id = id
+        self.caption = caption
+        self.attrs = {}
+        self.columns = {}
+        self.links = {}
+        self.row_attrs = []
+
+    def __len__(self):
+        return len(self.row_attrs)
+
+    def __repr__(self):
+        return f'Table(id={self.id!r}, caption={self.caption!r}, rows={len(self)}, columns={len(self.columns)})'
+
+    def add_row(self, tr, cells=('th', 'td')):
+        """Append the cells of a tr element to the columns, only using cells with the given tags."""
+        n = len(self.row_attrs)
+        for cell in tr:
+            if cell.tag not in cells:
+                continue  # Other tags, comments and processing instructions
+            stat = cell.get('data-stat')
+            if stat is None:
+                continue
+
+            # New columns are back filled for the rows before them
+            if stat not in self.columns:
+                self.columns[stat] = [None] * n
+                self.links[stat] = [None] * n
+
+            link = next(cell.iter('a'), None)
+            self.columns[stat].append(''.join(cell.itertext()))
+            self.links[stat].append(None if link is None else link.get('href'))
+
+        self.row_attrs.append(dict(tr.attrib))
+
+        # Pad columns this row did not have
+        for stat, values in self.columns.items():
+            if len(values) == n:
+                values.append(None)
+                self.links[stat].append(None)
+
+    def body(self):
+        """Return a copy of the table without the header rows repeated within the body."""
+        keep = [i for i, attrs in enumerate(self.row_attrs) if 'thead' not in attrs.get('class', '').split()]
+        return self.take(keep)
+
+    def take(self, rows):
+        """Return a copy of the table with only the given row positions."""
+        table = Table(self.id, self.caption)
+        table.attrs = self.attrs
+        table.columns = {stat: [values[i] for i in rows] for stat, values in self.columns.items()}
+        table.links = {stat: [values[i] for i in rows] for stat, values in self.links.items()}
+        table.row_attrs = [self.row_attrs[i] for i in rows]
+        return table
+
+    def rows(self):
+        """Yield each row as a dict of the data-stat columns it has."""
+        stats = list(self.columns)
+        for i in range(len(self)):
+            yield {stat: self.columns[stat][i] for stat in stats if self.columns[stat][i] is not None}
+
+    def to_frame(self):
+        """Return the cell text as a DataFrame."""
+        return pd.DataFrame(self.columns)
+
+
+def concat_tables(tables):
+    """Stack the rows of several tables into one Table, padding columns that some tables lack."""
+    combined = Table()
+    for table in tables:
+        n, rows = len(combined), len(table)
+        for stat in table.columns:
+            if stat not in combined.columns:
+                combined.columns[stat] = [None] * n
+                combined.links[stat] = [None] * n
+        for stat in combined.columns:
+            combined.columns[stat].extend(table.columns.get(stat, [None] * rows))
+            combined.links[stat].extend(table.links.get(stat, [None] * rows))
+        combined.row_attrs.extend(table.row_attrs)
+    return combined
+
+
+def page_source(markup):
+    """Return raw page bytes from bytes, str or a BeautifulSoup object."""
+    if isinstance(markup, bytes):
+        return markup
+    return str(markup).encode('utf-8')
+
+
+def iter_tables(markup, ids=None, cells=('th', 'td'), comments=True):
+    """
+    Stream the tables of a page, yielding a Table as soon as each one is parsed.
+
+    pro-football-reference ships most tables inside HTML comments and reveals them with
+    javascript. Those tables are parsed straight out of the comments, in page order, so no
+    browser is needed.
+
+    Parameters
+    ----------
+    markup : bytes, str or bs4.BeautifulSoup
+        Page content.
+    ids : iterable of str, optional
+        Only extract tables with these ids.
+    cells : tuple of str, optional
+        Tags of the cells that are extracted.
+    comments : bool, optional
+        Also extract tables that are inside HTML comments.
+    """
+    ids = None if ids is None else set(ids)
+    source = io.BytesIO(page_source(markup))
+
+    table = None
+    for event, elem in etree.iterparse(source, events=('start', 'end', 'comment'),
+                                       tag=('table', 'tr', etree.Comment), html=True,
+                                       encoding='utf-8', recover=True):
+        if event == 'comment':
+            # Parse tables hidden in comments
+            if comments and elem.text and '<table' in elem.text:
+                yield from iter_tables(elem.text.encode('utf-8'), ids=ids, cells=cells, comments=False)
+            continue
+
+        if elem.tag == 'table':
+            if event == 'start':
+                # Start collecting a new table, or skip it if it isn't wanted
+                table = None
+                if ids is None or elem.get('id') in ids:
+                    table = Table(elem.get('id'))
+                    table.attrs = dict(elem.attrib)
+                    started = time.perf_counter()
+                continue
+
+            if table is not None:
+                caption = elem.find('caption')
+                table.caption = None if caption is None else ''.join(caption.itertext())
+                default_metrics().record_parse('extract', table.id, time.perf_counter() - started, len(table))
+                yield table
+            table = None
+
+            # Free everything parsed so far
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+        elif event == 'end':
+            # Rows are added as soon as they are parsed, then freed
+            if table is not None and elem.getparent().tag != 'thead':
+                table.add_row(elem, cells)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+def read_table(markup, table_id=None, cells=('th', 'td'), comments=True):
+    """
+    Return the first table of a page (with table_id if provided) or None if there isn't one.
+
+    Parameters
+    ----------
+    markup : bytes, str or bs4.BeautifulSoup
+        Page content.
+    table_id : str, optional
+        The id of the table.
+    cells : tuple of str, optional
+        Tags of the cells that are extracted.
+    comments : bool, optional
+        Also look for the table inside HTML comments.
+    """
+    ids = None if table_id is None else [table_id]
+    for table in iter_tables(markup, ids=ids, cells=cells, comments=comments):
+        return table
+    return None
+
+
+def team_id(link):
+    """Extract the team id from a '/teams/{id}/...' link, '' if there isn't one."""
+    if link is None:
+        return ''
+    find_id = re.search(r'teams/([^/]+)/', link)
+    return '' if find_id is None else find_id.group(1)